@@ -0,0 +1,226 @@
+"""Dashboard counts by request type x status x department (model.RequestStatusCount).
+
+Every flush that adds, changes or deletes a request, or moves an employee to
+another department, becomes +/- deltas on the affected buckets, written in the
+same transaction. Bulk paths that bypass the ORM call count_changes() themselves.
+
+    python aggregates.py rebuild    # recompute the table from scratch
+"""
+import sys
+from collections import Counter
+
+from sqlalchemy import delete, event, func, inspect, insert, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from database import dialect_insert
+from model import REQUEST_TYPES, Employee, RequestStatusCount
+
+TYPE_OF_MODEL = {model: request_type for request_type, model in REQUEST_TYPES}
+
+
+def bucket(request_type, status, department):
+    return (request_type, status or "", department or "")
+
+
+def apply_deltas(conn, deltas):
+    """Add {(request_type, status, department): n} to the stored counts."""
+    rows = [
+        {"request_type": t, "status": s, "department": d, "count": n}
+        for (t, s, d), n in sorted(deltas.items())
+        if n
+    ]
+    if not rows:
+        return
+    stmt = dialect_insert(conn, RequestStatusCount)
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["request_type", "status", "department"],
+            set_={"count": RequestStatusCount.count + stmt.excluded["count"]},
+        ),
+        rows,
+    )
+
+
+def departments(conn, employee_ids):
+    ids = {id_ for id_ in employee_ids if id_ is not None}
+    if not ids:
+        return {}
+    return dict(
+        conn.execute(select(Employee.id, Employee.department).where(Employee.id.in_(ids))).all()
+    )
+
+
+def count_changes(conn, model, changes):
+    """Apply (sign, status, employee_id) changes to rows of one request table."""
+    request_type = TYPE_OF_MODEL[model]
+    department_of = departments(conn, [employee_id for _, _, employee_id in changes])
+    deltas = Counter()
+    for sign, status, employee_id in changes:
+        deltas[bucket(request_type, status, department_of.get(employee_id))] += sign
+    apply_deltas(conn, deltas)
+
+
+def summary(db: Session):
+    return db.execute(
+        select(RequestStatusCount)
+        .where(RequestStatusCount.count > 0)
+        .order_by(
+            RequestStatusCount.request_type,
+            RequestStatusCount.status,
+            RequestStatusCount.department,
+        )
+    ).scalars().all()
+
+
+def rebuild(db: Session):
+    """Recompute every bucket from the request tables in one transaction."""
+    db.execute(delete(RequestStatusCount))
+    grouped = union_all(
+        *(
+            select(
+                literal(request_type),
+                func.coalesce(model.status, ""),
+                func.coalesce(Employee.department, ""),
+                func.count(),
+            )
+            .select_from(model)
+            .outerjoin(Employee, model.employee_id == Employee.id)
+            .group_by(model.status, Employee.department)
+            for request_type, model in REQUEST_TYPES
+        )
+    )
+    db.execute(
+        insert(RequestStatusCount).from_select(
+            ["request_type", "status", "department", "count"], grouped
+        )
+    )
+    db.commit()
+
+
+def request_counts_query(employee_ids):
+    """(request_type, employee_id, status, count) of the requests of `employee_ids`."""
+    return union_all(
+        *(
+            select(literal(request_type), model.employee_id, model.status, func.count())
+            .where(model.employee_id.in_(employee_ids))
+            .group_by(model.employee_id, model.status)
+            for request_type, model in REQUEST_TYPES
+        )
+    )
+
+
+def previous_values_query(model, ids):
+    """The stored values the deltas start from, for rows about to be flushed.
+
+    The rows are locked (FOR UPDATE, as in bulk_update_status) so that two
+    transactions changing the same row cannot both start from the same old
+    value and move it twice; the second waits and reads the first's result.
+    """
+    columns = (model.department,) if model is Employee else (model.status, model.employee_id)
+    return select(model.id, *columns).where(model.id.in_(ids)).with_for_update()
+
+
+# Values from before the flush are read from the database in before_flush (the
+# objects may have been expired by an earlier commit), then compared with the
+# flushed values in after_flush.
+@event.listens_for(Session, "before_flush")
+def _remember_previous_values(session, flush_context, instances):
+    touched = {}
+    for obj in list(session.dirty) + list(session.deleted):
+        state = inspect(obj)
+        if state.key is None:
+            continue
+        if type(obj) in TYPE_OF_MODEL:
+            if obj in session.deleted or session.is_modified(obj):
+                touched.setdefault(type(obj), set()).add(state.identity[0])
+        elif isinstance(obj, Employee):
+            if obj in session.deleted or state.attrs.department.history.has_changes():
+                touched.setdefault(Employee, set()).add(state.identity[0])
+    if not touched:
+        return
+    conn = session.connection()
+    previous = session.info.setdefault("aggregate_previous", {})
+    for model, ids in touched.items():
+        for id_, *values in conn.execute(previous_values_query(model, sorted(ids))):
+            previous[(model, id_)] = tuple(values)
+    # The flush sets the employee_id of a deleted employee's requests to NULL,
+    # so they can only be counted now, while they still point at the employee
+    deleted = sorted(
+        inspect(obj).identity[0]
+        for obj in session.deleted
+        if isinstance(obj, Employee) and inspect(obj).key is not None
+    )
+    if deleted:
+        session.info.setdefault("aggregate_orphaned", []).extend(
+            conn.execute(request_counts_query(deleted)).all()
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def _count_flushed_changes(session, flush_context):
+    previous = session.info.pop("aggregate_previous", {})
+    orphaned = session.info.pop("aggregate_orphaned", [])
+
+    # employee id -> (old department, new department)
+    moved = {}
+    # (sign, request_type, status, employee_id)
+    changes = []
+    for obj in session.new:
+        if type(obj) in TYPE_OF_MODEL:
+            changes.append((1, TYPE_OF_MODEL[type(obj)], obj.status, obj.employee_id))
+    for (model, id_), values in previous.items():
+        obj = session.identity_map.get((model, (id_,), None))
+        deleted = obj is None or obj in session.deleted
+        if model is Employee:
+            new = None if deleted else obj.department
+            if (values[0] or "") != (new or ""):
+                moved[id_] = (values[0], new)
+            continue
+        current = None if deleted else (obj.status, obj.employee_id)
+        if current == values:
+            continue
+        request_type = TYPE_OF_MODEL[model]
+        changes.append((-1, request_type, *values))
+        if current is not None:
+            changes.append((1, request_type, *current))
+    if not moved and not changes:
+        return
+
+    conn = session.connection()
+    # Request deltas use each employee's department from before this flush; the
+    # employee moves below then carry every current row to the new department
+    department_of = departments(conn, [employee_id for *_, employee_id in changes])
+    department_of.update({id_: old for id_, (old, _) in moved.items()})
+    deltas = Counter()
+    for sign, request_type, status, employee_id in changes:
+        deltas[bucket(request_type, status, department_of.get(employee_id))] += sign
+    if moved:
+        # A deleted employee's requests were counted before the flush (they no
+        # longer point at the employee) and now belong to no department
+        orphaned = [row for row in orphaned if row[1] in moved]
+        remaining = sorted(set(moved) - {employee_id for _, employee_id, *_ in orphaned})
+        rows = list(orphaned)
+        if remaining:
+            rows += conn.execute(request_counts_query(remaining)).all()
+        for request_type, employee_id, status, n in rows:
+            old, new = moved[employee_id]
+            deltas[bucket(request_type, status, old)] -= n
+            deltas[bucket(request_type, status, new)] += n
+    apply_deltas(conn, deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_previous_values(session):
+    session.info.pop("aggregate_previous", None)
+    session.info.pop("aggregate_orphaned", None)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python aggregates.py rebuild")
+    from database import SessionLocal, create_schema, get_engine
+
+    create_schema(get_engine())
+    with SessionLocal() as db:
+        rebuild(db)
+    print("request_status_counts rebuilt")
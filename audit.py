@@ -0,0 +1,271 @@
+"""Write-behind audit log of request status changes (model.AuditLog).
+
+Session hooks note every request a transaction creates, moves to another
+status or deletes, with the caller get_current_user recorded on the session.
+Once the transaction commits, the entries go on a bounded in-memory queue and
+a worker thread writes them in batches of AUDIT_BATCH_SIZE, at least every
+AUDIT_FLUSH_SECONDS, on its own connection; a rollback discards them. Writes
+never wait for the audit insert. When the queue is full a committing request
+waits up to AUDIT_ENQUEUE_TIMEOUT_SECONDS for room, after which its entries
+are dropped, logged and counted; a commit made on the event loop thread
+(DB_MODE=async) never waits, so its entries are dropped at once instead. The
+app flushes the queue on shutdown.
+
+Bulk paths that bypass the ORM call record_changes() themselves; bulk imports
+are not audited row by row.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+from sqlalchemy import event, insert, inspect
+from sqlalchemy.orm import Session
+
+from model import REQUEST_TYPES, AuditLog
+
+load_dotenv(".env.custom")
+
+logger = logging.getLogger(__name__)
+
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", "1.0"))
+AUDIT_ENQUEUE_TIMEOUT_SECONDS = float(os.getenv("AUDIT_ENQUEUE_TIMEOUT_SECONDS", "0.5"))
+AUDIT_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("AUDIT_SHUTDOWN_TIMEOUT_SECONDS", "10"))
+
+TYPE_OF_MODEL = {model: request_type for request_type, model in REQUEST_TYPES}
+
+
+class AuditWriter:
+    """Bounded queue of audit rows, inserted in batches by a worker thread."""
+
+    def __init__(
+        self,
+        max_size: int = AUDIT_QUEUE_SIZE,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        interval: float = AUDIT_FLUSH_SECONDS,
+        enqueue_timeout: float = AUDIT_ENQUEUE_TIMEOUT_SECONDS,
+    ):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self.enqueue_timeout = enqueue_timeout
+        # (bind, row) in commit order
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._flush_waiters = 0
+        # Bumped by clear(), so a batch that was being written is not requeued
+        self._generation = 0
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+
+    def enqueue(self, bind, rows):
+        dropped = 0
+        # Waiting for room would stall every request on the event loop
+        timeout = 0 if _on_event_loop() else self.enqueue_timeout
+        with self._cond:
+            deadline = time.monotonic() + timeout
+            for row in rows:
+                while len(self._pending) >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.notify_all()
+                    self._cond.wait(remaining)
+                if len(self._pending) >= self.max_size:
+                    dropped += 1
+                    continue
+                self._pending.append((bind, row))
+                self.enqueued += 1
+            self.dropped += dropped
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+        if dropped:
+            logger.error("Audit queue full: dropped %d entries", dropped)
+
+    def flush(self, timeout=None) -> bool:
+        """Wait until everything queued so far is written; False on timeout."""
+        with self._cond:
+            target = self.enqueued
+            self._flush_waiters += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(lambda: self.written >= target, timeout)
+            finally:
+                self._flush_waiters -= 1
+
+    def shutdown(self, timeout: float = AUDIT_SHUTDOWN_TIMEOUT_SECONDS):
+        """Flush the queue and stop the worker; it restarts on the next enqueue."""
+        if not self.flush(timeout):
+            logger.error("Audit log not flushed on shutdown: %d entries lost", len(self._pending))
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+        with self._cond:
+            self._stopping = False
+            self._pending.clear()
+
+    def clear(self):
+        """Drop everything queued and reset the counters."""
+        with self._cond:
+            self._pending.clear()
+            self._generation += 1
+            self.enqueued = self.written = self.dropped = self.failed_batches = 0
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "queued": len(self._pending),
+                "max_size": self.max_size,
+                "batch_size": self.batch_size,
+                "flush_seconds": self.interval,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed_batches": self.failed_batches,
+            }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.interval
+                while (
+                    not self._stopping
+                    and not self._flush_waiters
+                    and len(self._pending) < self.batch_size
+                ):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._stopping:
+                    return
+                if not self._pending:
+                    continue
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                generation = self._generation
+            try:
+                self._write(batch)
+            except Exception:
+                logger.exception("Audit batch of %d entries failed; retrying", len(batch))
+                with self._cond:
+                    self.failed_batches += 1
+                    if generation == self._generation:
+                        self._pending.extendleft(reversed(batch))
+                    self._cond.notify_all()
+                    self._cond.wait(self.interval)
+                continue
+            with self._cond:
+                if generation == self._generation:
+                    self.written += len(batch)
+                self._cond.notify_all()
+
+    def _write(self, batch):
+        by_bind = {}
+        for bind, row in batch:
+            by_bind.setdefault(bind, []).append(row)
+        for bind, rows in by_bind.items():
+            with bind.begin() as conn:
+                conn.execute(insert(AuditLog), rows)
+
+
+audit_writer = AuditWriter()
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _actor(session):
+    principal = session.info.get("principal")
+    if principal is None:
+        return {"changed_by": None, "changed_by_username": None}
+    return {"changed_by": principal.id, "changed_by_username": principal.username}
+
+
+def record_changes(session: Session, model, changes):
+    """Queue (request_id, employee_id, old_status, new_status) changes made with
+    Core statements, to be written once the session commits."""
+    actor = _actor(session)
+    changed_at = datetime.now(timezone.utc)
+    session.info.setdefault("audit_rows", []).extend(
+        {
+            "request_type": TYPE_OF_MODEL[model],
+            "request_id": request_id,
+            "employee_id": employee_id,
+            "old_status": old_status,
+            "new_status": new_status,
+            "changed_at": changed_at,
+            **actor,
+        }
+        for request_id, employee_id, old_status, new_status in changes
+        if old_status != new_status
+    )
+
+
+def _writer_bind(session):
+    bind = session.get_bind()
+    if bind.dialect.is_async:
+        # The worker thread cannot drive an async driver; use the sync engine
+        from database import get_engine
+
+        return get_engine()
+    return bind
+
+
+# The status values are compared in after_flush, while attribute history still
+# holds what each flushed object was loaded with
+@event.listens_for(Session, "after_flush")
+def _collect_status_changes(session, flush_context):
+    changes = {}
+    for obj in session.new:
+        if type(obj) in TYPE_OF_MODEL:
+            changes.setdefault(type(obj), []).append((obj.id, obj.employee_id, None, obj.status))
+    for obj in session.dirty:
+        if type(obj) not in TYPE_OF_MODEL:
+            continue
+        history = inspect(obj).attrs.status.history
+        if history.added or history.deleted:
+            old = history.deleted[0] if history.deleted else None
+            changes.setdefault(type(obj), []).append((obj.id, obj.employee_id, old, obj.status))
+    for obj in session.deleted:
+        if type(obj) in TYPE_OF_MODEL:
+            # Read without a refresh: the row is already gone
+            values = inspect(obj).dict
+            changes.setdefault(type(obj), []).append(
+                (inspect(obj).identity[0], values.get("employee_id"), values.get("status"), None)
+            )
+    for model, model_changes in changes.items():
+        record_changes(session, model, model_changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _queue_audit_rows(session):
+    rows = session.info.pop("audit_rows", None)
+    if rows:
+        audit_writer.enqueue(_writer_bind(session), rows)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_audit_rows(session):
+    session.info.pop("audit_rows", None)
@@ -1,13 +1,15 @@
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from model import User
 from database import get_db
-from functions_crud import get_user_by_username
+from functions_crud import get_user_by_username, get_user_with_role
+from auth.hashing import HashingOverloaded, password_hasher
 from schemas import TokenData
+from auth.identity_cache import Principal, token_revocations
 import os
 from dotenv import load_dotenv
 
@@ -19,9 +21,6 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # OAuth2 bearer token setup
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/login")
 
@@ -30,14 +29,28 @@ def verify_password(plain_password, hashed_password):
     if not hashed_password:
         return False
     try:
-        return pwd_context.verify(plain_password, hashed_password)
+        return password_hasher.verify(plain_password, hashed_password)
+    except HashingOverloaded:
+        raise
+    except Exception as e:
+        print(f"[Password Error] {e}")
+        return False
+
+# Non-blocking variant for async routes: bcrypt runs in the hashing pool
+async def verify_password_async(plain_password, hashed_password):
+    if not hashed_password:
+        return False
+    try:
+        return await password_hasher.verify_async(plain_password, hashed_password)
+    except HashingOverloaded:
+        raise
     except Exception as e:
         print(f"[Password Error] {e}")
         return False
 
 # Hashing function
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 #Secure user authentication
 def authenticate_user(db: Session, username: str, password: str):
@@ -48,18 +61,58 @@ def authenticate_user(db: Session, username: str, password: str):
         return False
     return user
 
+# Authentication for async routes: the lookup runs in the threadpool, bcrypt in the hashing pool
+async def authenticate_user_async(db: Session, username: str, password: str):
+    user = await run_in_threadpool(get_user_with_role, db, username)
+    if not user or not user.password_hash:
+        return False
+    if not await verify_password_async(password, user.password_hash):
+        return False
+    return user
+
 # Token creation
 def create_access_token(
     data: dict, expires_delta: timedelta | None = None, scopes: list[str] = None
 ):
     to_encode = data.copy()
-    expire = datetime.utcnow() + (
+    issued_at = datetime.utcnow()
+    expire = issued_at + (
         expires_delta if expires_delta else timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
-    to_encode.update({"exp": expire})
+    to_encode.update({"iat": issued_at, "exp": expire})
+    if scopes:
+        to_encode["scopes"] = scopes
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Role claims signed into the token so requests can be authorised without the database
+def principal_claims(user) -> dict:
+    role = user.role
+    return {
+        "uid": user.id,
+        "role_id": user.role_id,
+        "is_hr": bool(role and role.is_hr),
+        "is_admin": bool(role and role.is_admin),
+        "is_employee": bool(role and role.is_employee),
+    }
+
+# Rebuild the caller from token claims; None if the token has none or they went stale
+def principal_from_claims(payload: dict) -> Principal | None:
+    if "uid" not in payload:
+        return None
+    if token_revocations.is_revoked(
+        payload["uid"], payload.get("role_id"), payload.get("iat", 0)
+    ):
+        return None
+    return Principal(
+        id=payload["uid"],
+        username=payload["sub"],
+        role_id=payload.get("role_id"),
+        is_hr=payload.get("is_hr", False),
+        is_admin=payload.get("is_admin", False),
+        is_employee=payload.get("is_employee", False),
+    )
+
 # User existence checker
 def check_user_exists(db: Session, username: str) -> dict:
     user = get_user_by_username(db, username)
@@ -1,49 +1,132 @@
+import time
+from typing import Optional
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.requests import HTTPConnection
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 
-from database import get_db
-from model import User
+from database import get_db, get_async_db
 from schemas import TokenData
-from auth.auth import SECRET_KEY, ALGORITHM
-from functions_crud import get_user_by_username
+from auth.auth import SECRET_KEY, ALGORITHM, principal_from_claims
+from auth.identity_cache import Principal, identity_cache, load_principal, token_revocations
+from metrics import timed
 
 security = HTTPBearer()  # Automatically expects 'Authorization: Bearer <token>'
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    token = credentials.credentials  # Extract raw token from Authorization header
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _decode_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
+            raise _credentials_exception()
         token_data = TokenData(username=username)
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    return payload, token_data
+
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> Principal:
+    with timed("auth"):
+        principal = _resolve_principal(credentials.credentials, db)
+        # The request's session knows its caller, for the audit log (audit.py)
+        db.info["principal"] = principal
+        return principal
+
+
+def _resolve_principal(token: str, db):
+    payload, token_data = _decode_token(token)
+    if "uid" in payload:
+        # Picks up revocations committed through other workers, at most every few seconds
+        token_revocations.refresh(db)
+    principal = principal_from_claims(payload)
+    if principal is not None:
+        return principal
 
-    user = get_user_by_username(db, token_data.username)
-    if user is None:
-        raise credentials_exception
-    return user
+    # Legacy or stale token: resolve the caller from the cache/database
+    principal = identity_cache.get(token_data.username)
+    if principal is None:
+        principal = load_principal(db, token_data.username)
+        if principal is None:
+            raise _credentials_exception()
+        identity_cache.put(principal)
+    return principal
 
 
-def require_hr(current_user: User = Depends(get_current_user)):
-    if not current_user.role or not current_user.role.is_hr:
+def bearer_token(connection: HTTPConnection) -> Optional[str]:
+    """The token in a streaming connection's Authorization header, if any. Clients
+    that cannot set headers use a stream ticket instead (auth/stream_tickets.py)."""
+    scheme, _, token = connection.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return token
+    return None
+
+
+def principal_for_token(token: Optional[str], db: Session) -> Principal:
+    """get_current_user for a token obtained outside the HTTPBearer dependency."""
+    if not token:
+        raise _credentials_exception()
+    return _resolve_principal(token, db)
+
+
+def token_lifetime(token: str):
+    """(authorised_at, expires_at) for a token principal_for_token accepted: since
+    when its caller is known good (its iat if its claims were trusted, else now,
+    when the caller was loaded) and its exp claim, as Unix times."""
+    payload, _ = _decode_token(token)
+    trusted = principal_from_claims(payload) is not None
+    return (payload.get("iat", 0) if trusted else time.time()), payload["exp"]
+
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db=Depends(get_async_db),
+) -> Principal:
+    """get_current_user for async routes: no threadpool hop, AsyncSession fallback."""
+    with timed("auth"):
+        payload, token_data = _decode_token(credentials.credentials)
+        if "uid" in payload and token_revocations.needs_refresh():
+            await db.run_sync(token_revocations.refresh)
+        principal = principal_from_claims(payload)
+        if principal is None:
+            principal = identity_cache.get(token_data.username)
+            if principal is None:
+                principal = await db.run_sync(load_principal, token_data.username)
+                if principal is None:
+                    raise _credentials_exception()
+                identity_cache.put(principal)
+        db.info["principal"] = principal
+        return principal
+
+
+def require_hr(current_user: Principal = Depends(get_current_user)):
+    if not current_user.is_hr:
         raise HTTPException(status_code=403, detail="HR role required")
     return current_user
 
 
-def require_admin(current_user: User = Depends(get_current_user)):
-    if not current_user.role or not current_user.role.is_admin:
+def require_admin(current_user: Principal = Depends(get_current_user)):
+    if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin role required")
     return current_user
+
+
+async def require_hr_async(current_user: Principal = Depends(get_current_user_async)):
+    return require_hr(current_user)
+
+
+async def require_admin_async(current_user: Principal = Depends(get_current_user_async)):
+    return require_admin(current_user)
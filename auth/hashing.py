@@ -0,0 +1,127 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from passlib.context import CryptContext
+
+load_dotenv(".env.custom")
+
+# Number of hashes that may run at once (defaults to one per core)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+# Hashes allowed to wait for a free worker before new ones are rejected
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+# "process" spreads bcrypt over every core; "thread" skips the worker start-up cost
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "process")
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class HashingOverloaded(Exception):
+    """Raised when the hashing queue is full; callers should answer 503."""
+
+
+# Executed inside the worker; returns the hashing time so waits can be told apart
+def _timed(operation, *args):
+    start = time.perf_counter()
+    result = getattr(pwd_context, operation)(*args)
+    return result, time.perf_counter() - start
+
+
+class PasswordHasher:
+    """Bounded executor for bcrypt so CPU-bound hashing never runs on request threads."""
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_queue: int = PASSWORD_HASH_MAX_QUEUE,
+        kind: str = PASSWORD_HASH_EXECUTOR,
+    ):
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.kind = kind
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.hash_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                # spawn rather than fork: the server process is multi-threaded
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    def _submit(self, operation, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HashingOverloaded()
+            self._pending += 1
+            executor = self._get_executor()
+        submitted = time.perf_counter()
+        future = executor.submit(_timed, operation, *args)
+        future.add_done_callback(lambda f: self._record(f, submitted))
+        return future
+
+    def _record(self, future, submitted):
+        elapsed = time.perf_counter() - submitted
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                return
+            hash_time = future.result()[1]
+            self.completed += 1
+            self.hash_seconds += hash_time
+            wait = max(0.0, elapsed - hash_time)
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def hash(self, password: str) -> str:
+        return self._submit("hash", password).result()[0]
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self._submit("verify", password, hashed).result()[0]
+
+    async def hash_async(self, password: str) -> str:
+        return (await asyncio.wrap_future(self._submit("hash", password)))[0]
+
+    async def verify_async(self, password: str, hashed: str) -> bool:
+        return (await asyncio.wrap_future(self._submit("verify", password, hashed)))[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "executor": self.kind,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_hash_ms": 1000 * self.hash_seconds / self.completed if self.completed else 0.0,
+                "avg_wait_ms": 1000 * self.wait_seconds / self.completed if self.completed else 0.0,
+                "max_wait_ms": 1000 * self.max_wait_seconds,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+password_hasher = PasswordHasher()
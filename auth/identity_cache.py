@@ -0,0 +1,233 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from model import Role, User
+from auth.revocation import TokenRevocations
+
+load_dotenv(".env.custom")
+
+IDENTITY_CACHE_TTL_SECONDS = float(os.getenv("IDENTITY_CACHE_TTL_SECONDS", "60"))
+IDENTITY_CACHE_MAX_SIZE = int(os.getenv("IDENTITY_CACHE_MAX_SIZE", "1024"))
+ROLE_CACHE_TTL_SECONDS = float(os.getenv("ROLE_CACHE_TTL_SECONDS", "300"))
+# Must cover the longest access-token lifetime (auth.auth.ACCESS_TOKEN_EXPIRE_MINUTES)
+TOKEN_REVOCATION_MAX_AGE_SECONDS = float(
+    os.getenv("TOKEN_REVOCATION_MAX_AGE_SECONDS", "3600")
+)
+# How stale a worker's copy of the revocation marks may get: a demotion made
+# through another worker is honoured within this many seconds
+TOKEN_REVOCATION_REFRESH_SECONDS = float(
+    os.getenv("TOKEN_REVOCATION_REFRESH_SECONDS", "5")
+)
+
+
+@dataclass(frozen=True)
+class RoleFlags:
+    id: int
+    role_name: str
+    is_hr: bool
+    is_admin: bool
+    is_employee: bool
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated caller: just enough to authorise a request."""
+
+    id: int
+    username: str
+    role_id: Optional[int]
+    is_hr: bool = False
+    is_admin: bool = False
+    is_employee: bool = False
+
+
+class RoleCache:
+    """All rows of the (tiny) roles table, loaded with one query and kept in memory."""
+
+    def __init__(self, ttl_seconds: float = ROLE_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._roles = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, role_id: Optional[int]) -> Optional[RoleFlags]:
+        if role_id is None:
+            return None
+        with self._lock:
+            roles = self._roles
+            if roles is None or time.monotonic() - self._loaded_at > self.ttl_seconds:
+                roles = {
+                    role.id: RoleFlags(
+                        id=role.id,
+                        role_name=role.role_name,
+                        is_hr=bool(role.is_hr),
+                        is_admin=bool(role.is_admin),
+                        is_employee=bool(role.is_employee),
+                    )
+                    for role in db.query(Role).all()
+                }
+                self._roles = roles
+                self._loaded_at = time.monotonic()
+        return roles.get(role_id)
+
+    def clear(self):
+        with self._lock:
+            self._roles = None
+
+
+class IdentityCache:
+    """Thread-safe LRU of username -> Principal with a per-entry TTL."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = IDENTITY_CACHE_TTL_SECONDS,
+        max_size: int = IDENTITY_CACHE_MAX_SIZE,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, username: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[username]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, principal: Principal):
+        with self._lock:
+            self._entries[principal.username] = (
+                time.monotonic() + self.ttl_seconds,
+                principal,
+            )
+            self._entries.move_to_end(principal.username)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_users(self, user_ids):
+        with self._lock:
+            stale = [
+                username
+                for username, (_, principal) in self._entries.items()
+                if principal.id in user_ids
+            ]
+            for username in stale:
+                del self._entries[username]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def _forget_revoked(user_ids, role_ids):
+    """Drop what this worker cached about users and roles changed through another."""
+    if role_ids:
+        role_cache.clear()
+        identity_cache.clear()
+    elif user_ids:
+        identity_cache.invalidate_users(user_ids)
+
+
+role_cache = RoleCache()
+identity_cache = IdentityCache()
+token_revocations = TokenRevocations(
+    TOKEN_REVOCATION_MAX_AGE_SECONDS, TOKEN_REVOCATION_REFRESH_SECONDS, _forget_revoked
+)
+
+
+def load_principal(db: Session, username: str) -> Optional[Principal]:
+    """Build a Principal from a single users query plus the in-memory role table."""
+    row = (
+        db.query(User.id, User.username, User.role_id)
+        .filter(User.username == username)
+        .first()
+    )
+    if row is None:
+        return None
+    role = role_cache.get(db, row.role_id)
+    return Principal(
+        id=row.id,
+        username=row.username,
+        role_id=row.role_id,
+        is_hr=role.is_hr if role else False,
+        is_admin=role.is_admin if role else False,
+        is_employee=role.is_employee if role else False,
+    )
+
+
+# Invalidation: remember which users/roles a transaction touched and drop the
+# cached entries once it commits (a rollback leaves the cache untouched). The
+# token revocation marks are written in the same transaction, so other
+# workers see them too.
+@event.listens_for(Session, "after_flush")
+def _collect_identity_changes(session, flush_context):
+    changes = session.info.setdefault(
+        "identity_changes",
+        {"users": set(), "roles": set(), "new_roles": False, "revoked_at": 0.0},
+    )
+    users, roles = set(), set()
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            users.add(obj.id)
+        elif isinstance(obj, Role):
+            roles.add(obj.id)
+    if any(isinstance(obj, Role) for obj in session.new):
+        changes["new_roles"] = True
+    if users or roles:
+        changes["revoked_at"] = time.time()
+        token_revocations.write(session.connection(), users, roles, changes["revoked_at"])
+        changes["users"] |= users
+        changes["roles"] |= roles
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_identity_changes(session):
+    changes = session.info.pop("identity_changes", None)
+    if not changes:
+        return
+    if changes["roles"] or changes["new_roles"]:
+        role_cache.clear()
+    if changes["roles"]:
+        identity_cache.clear()
+        token_revocations.revoke_roles(changes["roles"], changes["revoked_at"])
+    if changes["users"]:
+        identity_cache.invalidate_users(changes["users"])
+        token_revocations.revoke_users(changes["users"], changes["revoked_at"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_identity_changes(session):
+    session.info.pop("identity_changes", None)
@@ -0,0 +1,129 @@
+import threading
+import time
+
+from sqlalchemy import delete, select
+
+from database import dialect_insert
+from model import TokenRevocation
+
+USER, ROLE = "user", "role"
+
+
+class TokenRevocations:
+    """"Not before" marks for access tokens whose role claims went stale.
+
+    When a user's account or a role changes, the transaction making the change
+    also writes a mark to the token_revocations table; tokens issued before
+    that moment are no longer trusted for their claims and the caller is
+    re-resolved from the database instead. Each worker keeps the marks of the
+    last token lifetime in memory and reloads them with one query at most every
+    `refresh_seconds`, so a change committed through another worker is honoured
+    within that interval, and its own changes at once; a reload that finds a
+    newer mark also drops what the worker cached about that user or role. Marks older than a
+    token's lifetime can no longer match anything and are pruned.
+    """
+
+    def __init__(self, max_age_seconds: float, refresh_seconds: float, on_revoked=None):
+        self.max_age_seconds = max_age_seconds
+        self.refresh_seconds = refresh_seconds
+        # Called with (user_ids, role_ids) whose marks a refresh() moved on, so
+        # that what was cached about them can be dropped
+        self.on_revoked = on_revoked
+        self._users = {}
+        self._roles = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def write(self, conn, user_ids=(), role_ids=(), revoked_at=None):
+        """Store marks for `user_ids` and `role_ids` in the caller's transaction."""
+        revoked_at = time.time() if revoked_at is None else revoked_at
+        rows = [
+            {"kind": kind, "subject_id": id_, "revoked_at": revoked_at}
+            for kind, ids in ((USER, user_ids), (ROLE, role_ids))
+            for id_ in sorted(ids)
+        ]
+        if not rows:
+            return
+        stmt = dialect_insert(conn, TokenRevocation)
+        conn.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["kind", "subject_id"],
+                set_={"revoked_at": stmt.excluded.revoked_at},
+            ),
+            rows,
+        )
+        conn.execute(
+            delete(TokenRevocation).where(
+                TokenRevocation.revoked_at < revoked_at - self.max_age_seconds
+            )
+        )
+
+    def revoke_users(self, user_ids, revoked_at=None):
+        self._mark(self._users, user_ids, revoked_at)
+
+    def revoke_roles(self, role_ids, revoked_at=None):
+        self._mark(self._roles, role_ids, revoked_at)
+
+    def needs_refresh(self) -> bool:
+        loaded_at = self._loaded_at
+        return loaded_at is None or time.monotonic() - loaded_at >= self.refresh_seconds
+
+    def refresh(self, session):
+        """Reload the stored marks if the in-memory copy is older than refresh_seconds."""
+        if not self.needs_refresh():
+            return
+        rows = session.execute(
+            select(TokenRevocation.kind, TokenRevocation.subject_id, TokenRevocation.revoked_at).where(
+                TokenRevocation.revoked_at >= time.time() - self.max_age_seconds
+            )
+        ).all()
+        users = {id_: at for kind, id_, at in rows if kind == USER}
+        roles = {id_: at for kind, id_, at in rows if kind == ROLE}
+        raised = (set(), set())
+        with self._lock:
+            # Keep marks from this worker's commits that the read did not see yet
+            for marks, loaded, ids in ((self._users, users, raised[0]), (self._roles, roles, raised[1])):
+                for id_, at in loaded.items():
+                    if at > marks.get(id_, 0.0):
+                        marks[id_] = at
+                        ids.add(id_)
+            self._loaded_at = time.monotonic()
+            self.loads += 1
+        if self.on_revoked is not None and (raised[0] or raised[1]):
+            self.on_revoked(*raised)
+
+    def is_revoked(self, user_id, role_id, issued_at) -> bool:
+        with self._lock:
+            revoked_at = max(
+                self._users.get(user_id, 0.0), self._roles.get(role_id, 0.0)
+            )
+        # iat only has one-second resolution, so a token from the same second is stale too
+        return issued_at <= revoked_at
+
+    def clear(self):
+        """Forget the in-memory marks; the next check reloads them."""
+        with self._lock:
+            self._users.clear()
+            self._roles.clear()
+            self._loaded_at = None
+            self.loads = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "roles": len(self._roles),
+                "refresh_seconds": self.refresh_seconds,
+                "loads": self.loads,
+            }
+
+    def _mark(self, marks, ids, revoked_at):
+        now = time.time()
+        revoked_at = now if revoked_at is None else revoked_at
+        with self._lock:
+            for id_ in ids:
+                marks[id_] = max(revoked_at, marks.get(id_, 0.0))
+            cutoff = now - self.max_age_seconds
+            for id_ in [id_ for id_, at in marks.items() if at < cutoff]:
+                del marks[id_]
@@ -0,0 +1,69 @@
+"""Short-lived, single-use tickets for opening an event stream.
+
+EventSource and browser WebSockets cannot set an Authorization header, and an
+access token passed in the URL would sit in proxy and access logs for its
+whole lifetime. Instead the client exchanges its token for a ticket
+(POST /events/ticket) and connects with ?ticket=. A ticket opens one stream,
+within STREAM_TICKET_SECONDS of being issued; it is stored, hashed, in the
+stream_tickets table so that any worker can redeem it, and redeeming deletes it.
+
+The ticket carries the caller's audience and the expiry of the token it was
+issued for: the stream is closed when that token expires, or when the
+caller's account or role changes (auth/revocation.py).
+"""
+import hashlib
+import os
+import secrets
+import time
+from typing import NamedTuple, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import Session
+
+from model import StreamTicket
+
+load_dotenv(".env.custom")
+
+STREAM_TICKET_SECONDS = float(os.getenv("STREAM_TICKET_SECONDS", "30"))
+
+
+class StreamGrant(NamedTuple):
+    """What a stream may see, and until when."""
+
+    user_id: int
+    role_id: Optional[int]
+    employee_id: Optional[int]
+    everything: bool
+    # Marks from auth/revocation.py after this moment end the stream
+    authorised_at: float
+    token_expires_at: float
+
+
+def _hash(ticket: str) -> str:
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+
+def issue_ticket(db: Session, grant: StreamGrant) -> str:
+    """Store a new ticket for `grant` and commit; returns the ticket."""
+    ticket = secrets.token_urlsafe(32)
+    now = time.time()
+    db.execute(delete(StreamTicket).where(StreamTicket.expires_at < now))
+    db.execute(
+        insert(StreamTicket).values(
+            ticket_hash=_hash(ticket), expires_at=now + STREAM_TICKET_SECONDS, **grant._asdict()
+        )
+    )
+    db.commit()
+    return ticket
+
+
+def redeem_ticket(db: Session, ticket: str) -> Optional[StreamGrant]:
+    """The grant of an unexpired ticket, which can then not be used again."""
+    row = db.execute(
+        delete(StreamTicket)
+        .where(StreamTicket.ticket_hash == _hash(ticket), StreamTicket.expires_at >= time.time())
+        .returning(*(getattr(StreamTicket, field) for field in StreamGrant._fields))
+    ).first()
+    db.commit()
+    return None if row is None else StreamGrant(*row)
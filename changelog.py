@@ -0,0 +1,118 @@
+"""Revisions for delta sync of employees and requests (model.ChangeLog).
+
+Every transaction that creates, updates or deletes an employee or request
+stamps its revision, in the same transaction, on one change_log row per
+written row: (type, id, revision, deleted). Rows are upserted, so the table
+holds the latest revision of every row that ever existed, deletes included as
+tombstones, and `revision > n` finds exactly what changed since revision n,
+provided a reader never sees revision n before a smaller one that is still to
+commit.
+
+On PostgreSQL the revision is the transaction id, assigned by the server
+without locking anything. Transaction ids do not commit in order, so readers
+only see revisions below pg_snapshot_xmin(), the oldest transaction still
+running (visible_revisions): every transaction below it has finished, so no
+change numbered lower can appear later. A long-running writer holds later
+revisions back until it ends. Elsewhere (SQLite, which runs one writer at a
+time) the revision comes from the "change_log" counter in table_versions,
+bumped by the transaction's first write.
+
+Bulk paths that bypass the ORM call log_changes() themselves.
+"""
+from sqlalchemy import BigInteger, Text, cast, event, func, inspect, select, true
+from sqlalchemy.orm import Session
+
+from database import dialect_insert
+from model import REQUEST_TYPES, ChangeLog, Employee, TableVersion
+
+ENTITY_TYPES = {Employee: "employee", **{model: request_type for request_type, model in REQUEST_TYPES}}
+MODEL_OF_TYPE = {entity_type: model for model, entity_type in ENTITY_TYPES.items()}
+
+
+def _as_bigint(xid8):
+    return cast(cast(xid8, Text), BigInteger)
+
+
+def current_revision(session: Session) -> int:
+    """The transaction's revision, taken on first use."""
+    revision = session.info.get("change_revision")
+    if revision is None:
+        conn = session.connection()
+        if conn.dialect.name == "postgresql":
+            revision = conn.scalar(select(_as_bigint(func.pg_current_xact_id())))
+        else:
+            stmt = dialect_insert(conn, TableVersion).values(
+                table_name=ChangeLog.__tablename__, version=1
+            )
+            # Bumped and read in one statement, like versions.bump_versions otherwise
+            revision = conn.scalar(
+                stmt.on_conflict_do_update(
+                    index_elements=["table_name"], set_={"version": TableVersion.version + 1}
+                ).returning(TableVersion.version)
+            )
+        session.info["change_revision"] = revision
+    return revision
+
+
+def visible_revisions(db: Session):
+    """Filter for the change_log rows no still-running transaction can precede."""
+    if db.get_bind().dialect.name == "postgresql":
+        return ChangeLog.revision < _as_bigint(func.pg_snapshot_xmin(func.pg_current_snapshot()))
+    return true()
+
+
+def latest_revision_query(db: Session):
+    return select(func.max(ChangeLog.revision)).where(visible_revisions(db))
+
+
+def _upsert(stmt):
+    return stmt.on_conflict_do_update(
+        index_elements=["entity_type", "entity_id"],
+        set_={"revision": stmt.excluded.revision, "deleted": stmt.excluded.deleted},
+    )
+
+
+def log_changes(session: Session, model, ids, deleted=False):
+    """Stamp the transaction's revision on rows of `model` written with Core statements."""
+    ids = sorted(set(ids))
+    if not ids:
+        return
+    revision = current_revision(session)
+    conn = session.connection()
+    stmt = dialect_insert(conn, ChangeLog)
+    conn.execute(
+        _upsert(stmt),
+        [
+            {
+                "entity_type": ENTITY_TYPES[model],
+                "entity_id": id_,
+                "revision": revision,
+                "deleted": deleted,
+            }
+            for id_ in ids
+        ],
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _log_flushed_changes(session, flush_context):
+    written, deleted = {}, {}
+    for obj in session.new:
+        if type(obj) in ENTITY_TYPES:
+            written.setdefault(type(obj), []).append(obj.id)
+    for obj in session.dirty:
+        if type(obj) in ENTITY_TYPES and session.is_modified(obj):
+            written.setdefault(type(obj), []).append(inspect(obj).identity[0])
+    for obj in session.deleted:
+        if type(obj) in ENTITY_TYPES:
+            deleted.setdefault(type(obj), []).append(inspect(obj).identity[0])
+    for model, ids in written.items():
+        log_changes(session, model, ids)
+    for model, ids in deleted.items():
+        log_changes(session, model, ids, deleted=True)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _reset_revision(session):
+    session.info.pop("change_revision", None)
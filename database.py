@@ -1,20 +1,248 @@
 import os
+import threading
+import time
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
 
 load_dotenv('.env.custom')
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
+# "sync" (default) or "async": which router implementations main.py serves
+DB_MODE = os.getenv("DB_MODE", "sync")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Every sync route and sync dependency runs in Starlette's threadpool, but
+# only the threads inside a database call hold a connection, so the pool stays
+# at SQLAlchemy's default of 5 (+10 overflow) per worker. Each worker process
+# has its own pool: keep workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) below the
+# server's max_connections (100 by default on PostgreSQL) before raising it.
+THREADPOOL_LIMIT = int(os.getenv("THREADPOOL_LIMIT", "40"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class PoolWaitStats:
+    """How long checkouts waited for a free connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, waited, timed_out=False):
+        with self._lock:
+            self.checkouts += not timed_out
+            self.timeouts += timed_out
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": 1000 * self.wait_seconds / waits if waits else 0.0,
+                "max_wait_ms": 1000 * self.max_wait_seconds,
+            }
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection.
+
+    Only the public connect() is timed, from the call until the pool's
+    "checkout" event hands the connection over; new connections are counted
+    from the "connect" event, and a checkout that gives up after pool_timeout
+    is counted as a timeout.
+    """
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            pool_wait_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        # Set by the checkout event below, so a failed connect is not counted
+        checked_out = connection.info.pop("checked_out_at", None)
+        if checked_out is not None:
+            pool_wait_stats.record(checked_out - start)
+        return connection
+
+
+@event.listens_for(TimedQueuePool, "checkout")
+def _mark_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_proxy.info["checked_out_at"] = time.perf_counter()
+
+
+@event.listens_for(TimedQueuePool, "connect")
+def _count_connect(dbapi_connection, connection_record):
+    pool_wait_stats.record_connect()
+
+
+def pool_options(url, poolclass=TimedQueuePool):
+    url = make_url(url)
+    # In-memory SQLite keeps one connection per thread; a queue pool would
+    # hand out connections to different (empty) databases.
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    options = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if poolclass is not None:
+        options["poolclass"] = poolclass
+    return options
+
+
+# The write hooks (aggregates, versions, changelog, token revocations) and the
+# bootstrap rely on INSERT ... ON CONFLICT, which only these dialects offer
+SUPPORTED_BACKENDS = ("postgresql", "sqlite")
+
+
+def check_backend(url):
+    """Refuse a DATABASE_URL whose dialect the app cannot write to."""
+    backend = make_url(url).get_backend_name()
+    if backend not in SUPPORTED_BACKENDS:
+        raise RuntimeError(
+            f"Unsupported database {backend!r} in DATABASE_URL: "
+            f"use one of {', '.join(SUPPORTED_BACKENDS)}"
+        )
+
+
+# The engine is created on first use so importing the app needs no database;
+# SessionLocal is bound to it at that point.
+engine = None
+_engine_lock = threading.Lock()
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+
+def get_engine():
+    global engine
+    if engine is None:
+        with _engine_lock:
+            if engine is None:
+                if not SQLALCHEMY_DATABASE_URL:
+                    raise RuntimeError("DATABASE_URL is not set")
+                check_backend(SQLALCHEMY_DATABASE_URL)
+                engine = create_engine(
+                    SQLALCHEMY_DATABASE_URL, **pool_options(SQLALCHEMY_DATABASE_URL)
+                )
+                SessionLocal.configure(bind=engine)
+    return engine
 
 Base = declarative_base()
 
+
+def create_schema(bind):
+    """Create missing tables, then any indexes added to existing tables since."""
+    Base.metadata.create_all(bind=bind)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+def dialect_insert(bind, model):
+    """insert() for the bind's dialect, so callers can use on_conflict_do_nothing()."""
+    name = bind.dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        # get_engine() refuses these up front (check_backend)
+        raise NotImplementedError(f"No upsert support for {name}")
+    return insert(model)
+
 def get_db():
+    get_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+# Async engine (asyncpg for Postgres, aiosqlite for SQLite), created on first use
+# so the async drivers are only needed when DB_MODE=async
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+async_engine = None
+AsyncSessionLocal = None
+
+
+def async_database_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def get_async_engine():
+    global async_engine, AsyncSessionLocal
+    if async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        check_backend(SQLALCHEMY_DATABASE_URL)
+        async_engine = create_async_engine(
+            async_database_url(SQLALCHEMY_DATABASE_URL),
+            **pool_options(SQLALCHEMY_DATABASE_URL, poolclass=None),
+        )
+        AsyncSessionLocal = async_sessionmaker(
+            async_engine, autoflush=False, expire_on_commit=False
+        )
+    return async_engine
+
+
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def configure_threadpool():
+    """Apply THREADPOOL_LIMIT to the event loop's default thread limiter (call on startup)."""
+    from anyio import to_thread
+
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_LIMIT
+
+
+async def pool_status() -> dict:
+    """Live connection-pool and threadpool gauges (must run on the event loop)."""
+    from anyio import to_thread
+
+    pool = get_engine().pool
+    limiter = to_thread.current_default_thread_limiter()
+    status = {
+        "pool": {"class": type(pool).__name__, **pool_wait_stats.snapshot()},
+        "threadpool": {
+            "limit": limiter.total_tokens,
+            "busy": limiter.borrowed_tokens,
+            "waiting": limiter.statistics().tasks_waiting,
+        },
+    }
+    if isinstance(pool, QueuePool):
+        status["pool"].update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+            max_overflow=DB_MAX_OVERFLOW,
+        )
+    return status
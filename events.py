@@ -0,0 +1,243 @@
+"""Push compact change events for employees and requests to connected clients.
+
+Session hooks turn every committed create, update or delete of an employee or
+request into an event such as
+
+    {"type": "bank_request", "op": "updated", "id": 12, "employee_id": 5, "status": "Approved"}
+
+and hand the transaction's events to the in-process ChangeBroker as one batch.
+The broker numbers each batch and delivers it to every subscriber on the event
+loop: HR and admins get every event; other users only those about their own
+employee record and its requests. Each batch is encoded once per audience, not
+once per subscriber, so a commit costs one JSON dump plus a queue put per
+connected client. A client that falls EVENTS_QUEUE_SIZE batches behind gets a
+single {"op": "resync"} instead of the backlog and should reload its lists.
+The last EVENTS_REPLAY_SIZE batches are kept so a client reconnecting with
+Last-Event-ID misses nothing.
+
+Commits made by other workers are not seen here; with several workers, each
+client is told about the writes of the worker it is connected to.
+"""
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from model import REQUEST_TYPES, Employee
+
+load_dotenv(".env.custom")
+
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+EVENTS_REPLAY_SIZE = int(os.getenv("EVENTS_REPLAY_SIZE", "1000"))
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "1000"))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+EVENT_TYPES = {Employee: "employee", **{model: request_type for request_type, model in REQUEST_TYPES}}
+RESYNC = {"op": "resync"}
+
+
+class Subscriber:
+    """One connected client: its audience and its queue of encoded batches."""
+
+    def __init__(self, employee_id: Optional[int], everything: bool, max_size: int):
+        self.employee_id = employee_id
+        self.everything = everything
+        self.queue = asyncio.Queue(max_size)
+        # Last batch delivered, so a replay and a live delivery never overlap
+        self.seq = 0
+
+    def audience(self):
+        return "*" if self.everything else self.employee_id
+
+
+class ChangeBroker:
+    def __init__(
+        self,
+        queue_size: int = EVENTS_QUEUE_SIZE,
+        replay_size: int = EVENTS_REPLAY_SIZE,
+        max_subscribers: int = EVENTS_MAX_SUBSCRIBERS,
+    ):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        # (seq, events) for Last-Event-ID replays
+        self._recent = deque(maxlen=replay_size)
+        self._seq = 0
+        self._loop = None
+        self._lock = threading.Lock()
+        self.published = 0
+        self.resyncs = 0
+
+    def subscribe(self, employee_id: Optional[int], everything: bool, last_event_id=None):
+        """Register a client (on the event loop). Returns None when the broker is full."""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._loop = asyncio.get_running_loop()
+            subscriber = Subscriber(employee_id, everything, self.queue_size)
+            self._subscribers.add(subscriber)
+            if last_event_id is not None:
+                self._replay(subscriber, last_event_id)
+            subscriber.seq = self._seq
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, events):
+        """Queue one committed transaction's events; callable from any thread."""
+        with self._lock:
+            self._seq += 1
+            batch = (self._seq, events)
+            self._recent.append(batch)
+            self.published += 1
+            loop = self._loop if self._subscribers else None
+            # Scheduled under the lock, so the loop runs deliveries in seq
+            # order: _deliver skips a batch older than one already delivered
+            if loop is not None and not loop.is_closed():
+                loop.call_soon_threadsafe(self._deliver, batch)
+
+    def close(self):
+        """End every subscriber's stream (app shutdown)."""
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, set()
+            loop = self._loop
+        if loop is not None and not loop.is_closed():
+            for subscriber in subscribers:
+                loop.call_soon_threadsafe(self._end, subscriber)
+
+    def clear(self):
+        with self._lock:
+            self._subscribers.clear()
+            self._recent.clear()
+            self._seq = 0
+            self.published = self.resyncs = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "max_subscribers": self.max_subscribers,
+                "last_event_id": self._seq,
+                "published": self.published,
+                "resyncs": self.resyncs,
+            }
+
+    def _deliver(self, batch):
+        seq, events = batch
+        with self._lock:
+            subscribers = list(self._subscribers)
+        encoded = {}
+        for subscriber in subscribers:
+            if seq <= subscriber.seq:
+                continue
+            subscriber.seq = seq
+            audience = subscriber.audience()
+            if audience not in encoded:
+                encoded[audience] = encode(seq, visible(events, audience))
+            if encoded[audience] is not None:
+                self._put(subscriber, encoded[audience])
+
+    def _replay(self, subscriber: Subscriber, last_event_id: int):
+        oldest = self._recent[0][0] if self._recent else self._seq + 1
+        if not oldest - 1 <= last_event_id <= self._seq:
+            # Older than anything kept, or numbered by another worker
+            self._put(subscriber, encode(self._seq, [RESYNC]))
+            return
+        for seq, events in self._recent:
+            if seq > last_event_id:
+                message = encode(seq, visible(events, subscriber.audience()))
+                if message is not None:
+                    self._put(subscriber, message)
+
+    def _put(self, subscriber: Subscriber, message):
+        try:
+            subscriber.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too far behind: swap the backlog for one resync
+            self._drain(subscriber)
+            subscriber.queue.put_nowait(encode(self._seq, [RESYNC]))
+            self.resyncs += 1
+
+    def _end(self, subscriber: Subscriber):
+        self._drain(subscriber)
+        subscriber.queue.put_nowait(None)
+
+    @staticmethod
+    def _drain(subscriber: Subscriber):
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+
+
+def visible(events, audience):
+    if audience == "*":
+        return events
+    if audience is None:
+        return []
+    return [event for event in events if event.get("employee_id") == audience]
+
+
+def encode(seq, events):
+    """(id, JSON) for one batch, or None when nothing in it is visible."""
+    if not events:
+        return None
+    return seq, json.dumps({"events": events}, separators=(",", ":"))
+
+
+change_broker = ChangeBroker()
+
+
+def change_event(model, op, id_, employee_id, status=None):
+    change = {"type": EVENT_TYPES[model], "op": op, "id": id_, "employee_id": employee_id}
+    if model is not Employee and op != "deleted":
+        change["status"] = status
+    return change
+
+
+def publish_on_commit(session: Session, events):
+    """Queue events for writes the session hooks cannot see (bulk Core statements)."""
+    session.info.setdefault("change_events", []).extend(events)
+
+
+def _event(obj, op):
+    # From the loaded state only: no refresh, and deleted rows are already gone
+    state = inspect(obj)
+    values = state.dict
+    id_ = state.identity[0] if state.identity else values.get("id")
+    employee_id = id_ if isinstance(obj, Employee) else values.get("employee_id")
+    return change_event(type(obj), op, id_, employee_id, values.get("status"))
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_change_events(session, flush_context):
+    events = []
+    for obj in session.new:
+        if type(obj) in EVENT_TYPES:
+            events.append(_event(obj, "created"))
+    for obj in session.dirty:
+        if type(obj) in EVENT_TYPES and session.is_modified(obj):
+            events.append(_event(obj, "updated"))
+    for obj in session.deleted:
+        if type(obj) in EVENT_TYPES:
+            events.append(_event(obj, "deleted"))
+    if events:
+        publish_on_commit(session, events)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_change_events(session):
+    events = session.info.pop("change_events", None)
+    if events:
+        change_broker.publish(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_change_events(session):
+    session.info.pop("change_events", None)
@@ -1,15 +1,38 @@
-from sqlalchemy.orm import Session
-from model import User, Role, Employee, BankRequests, HomeOfficeRequests, DBSChecks
-from schemas import (
-    UserCreate,
-    EmployeeCreate,
-    BankRequestCreate,
-    HomeOfficeRequestCreate,
-    DBSCheckCreate,
+import csv
+import io
+import json
+import os
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import (
+    and_,
+    false,
+    insert,
+    literal,
+    literal_column,
+    or_,
+    select,
+    true,
+    union_all,
+    update,
 )
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from sqlalchemy.orm import Session, joinedload
+from model import (
+    REQUEST_TYPES,
+    User,
+    Employee,
+    BankRequests,
+    HomeOfficeRequests,
+    DBSChecks,
+)
+from schemas import UserCreate, EmployeeCreate
+from aggregates import count_changes
+from audit import record_changes
+from changelog import log_changes
+from events import EVENT_TYPES, change_event, publish_on_commit
+from versions import bump_on_commit
+from auth.hashing import password_hasher
+from auth.identity_cache import role_cache
 
 
 # User
@@ -17,9 +40,18 @@ def get_user_by_username(db: Session, username: str):
     return db.query(User).filter(User.username == username).first()
 
 
+def get_user_with_role(db: Session, username: str):
+    return (
+        db.query(User)
+        .options(joinedload(User.role))
+        .filter(User.username == username)
+        .first()
+    )
+
+
 def create_user(db: Session, user: UserCreate):
     # Hash the password
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = password_hasher.hash(user.password)
 
     # Create and add the user
     db_user = User(
@@ -29,11 +61,11 @@ def create_user(db: Session, user: UserCreate):
         role_id=user.role_id,
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    # Assigns db_user.id; the user and employee rows commit together
+    db.flush()
 
-    # Get the role
-    role = db.query(Role).filter(Role.id == user.role_id).first()
+    # Get the role (served from the in-memory roles table)
+    role = role_cache.get(db, user.role_id)
 
     # If the role includes employee privileges, create an Employee record
     if role and role.is_employee:
@@ -49,10 +81,10 @@ def create_user(db: Session, user: UserCreate):
             national_insurance_number=user.national_insurance_number,
         )
         db.add(db_employee)
-        db.commit()
-        db.refresh(db_employee)
+    db.commit()
 
-    return db_user
+    # UserOut embeds the role: load it with the user rather than lazily afterwards
+    return get_user_with_role(db, db_user.username)
 
 
 # Employee
@@ -64,28 +96,363 @@ def create_employee(db: Session, employee: EmployeeCreate):
     return db_emp
 
 
-# BankRequests
-def create_bank_request(db: Session, request: BankRequestCreate):
-    db_req = BankRequests(**request.model_dump())
-    db.add(db_req)
-    db.commit()
-    db.refresh(db_req)
-    return db_req
+# Columns of EmployeeOut that live on the employees table itself
+EMPLOYEE_COLUMNS = (
+    Employee.id,
+    Employee.first_name,
+    Employee.last_name,
+    Employee.email,
+    Employee.phone_number,
+    Employee.department,
+    Employee.position,
+    Employee.date_of_birth,
+    Employee.national_insurance_number,
+)
+
+# EmployeeOut status field -> request table it is read from
+STATUS_SOURCES = (
+    ("bank_request_statuses", BankRequests),
+    ("dbs_check_statuses", DBSChecks),
+    ("home_office_request_statuses", HomeOfficeRequests),
+)
+
+
+def get_request_statuses(db: Session, employee_ids, fields=None):
+    """Return {employee_id: {status field: [statuses]}} for the given employees.
+
+    Only (employee_id, status) pairs are read, in a single UNION ALL query, so
+    no request objects are loaded into the session. `fields` limits the
+    status fields to read; with none, there is no query at all.
+    """
+    sources = _status_sources(fields)
+    statuses = _empty_statuses(employee_ids, sources)
+    if statuses and sources:
+        _collect_statuses(statuses, db.execute(_request_statuses_query(statuses, sources)))
+    return statuses
+
+
+async def get_request_statuses_async(db, employee_ids, fields=None):
+    """`get_request_statuses` for an AsyncSession."""
+    sources = _status_sources(fields)
+    statuses = _empty_statuses(employee_ids, sources)
+    if statuses and sources:
+        _collect_statuses(statuses, await db.execute(_request_statuses_query(statuses, sources)))
+    return statuses
+
+
+def _status_sources(fields):
+    if fields is None:
+        return STATUS_SOURCES
+    return tuple((field, model) for field, model in STATUS_SOURCES if field in fields)
+
+
+def _empty_statuses(employee_ids, sources):
+    return {
+        employee_id: {field: [] for field, _ in sources}
+        for employee_id in employee_ids
+    }
+
+
+def _request_statuses_query(employee_ids, sources=STATUS_SOURCES):
+    return union_all(
+        *(
+            select(
+                literal(field).label("field"),
+                model.employee_id,
+                model.status,
+                model.id,
+            ).where(model.employee_id.in_(employee_ids), model.status.isnot(None))
+            for field, model in sources
+        )
+    ).order_by(literal_column("id"))
+
+
+def _collect_statuses(statuses, rows):
+    for field, employee_id, status, _ in rows:
+        statuses[employee_id][field].append(status)
+
+
+def iter_employees_with_statuses(db: Session, batch_size: int = 500):
+    """Yield every employee as a plain dict, request statuses included.
+
+    Rows are streamed in batches of `batch_size` (a server-side cursor on
+    Postgres) and each batch costs one extra status query, so memory use
+    does not grow with the number of employees.
+    """
+    result = db.execute(
+        select(*EMPLOYEE_COLUMNS)
+        .order_by(Employee.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for partition in result.partitions():
+        rows = [row._asdict() for row in partition]
+        statuses = get_request_statuses(db, [row["id"] for row in rows])
+        for row in rows:
+            row.update(statuses[row["id"]])
+            yield row
+
+
+# Unified request queue
+def request_queue_query(filters, limit: int, after=None, request_types=None):
+    """One UNION ALL over the request tables, oldest request_date first.
+
+    Rows are ordered by (request_date, request_type, id) with undated requests
+    last. `after` is that key for the last row already returned; the filters
+    and the keyset condition go into every branch so each table is read from
+    its (status, request_date, id) index.
+    """
+    branches = []
+    for request_type, model in REQUEST_TYPES:
+        if request_types and request_type not in request_types:
+            continue
+        clauses = filters.clauses(model)
+        if after is not None:
+            clauses.append(_queue_after(model, request_type, *after))
+        branches.append(
+            select(
+                literal(request_type).label("request_type"),
+                model.id,
+                model.employee_id,
+                model.request_date,
+                model.status,
+                model.details,
+            ).where(*clauses)
+        )
+    request_date = literal_column("request_date")
+    return (
+        union_all(*branches)
+        .order_by(
+            request_date.asc().nulls_last(),
+            literal_column("request_type"),
+            literal_column("id"),
+        )
+        .limit(limit)
+    )
+
+
+def _queue_after(model, request_type, after_date, after_type, after_id):
+    # (request_type, id) > (after_type, after_id), resolved per branch
+    if request_type > after_type:
+        later_same_date = true()
+    elif request_type == after_type:
+        later_same_date = model.id > after_id
+    else:
+        later_same_date = false()
+    if after_date is None:
+        return and_(model.request_date.is_(None), later_same_date)
+    return or_(
+        model.request_date > after_date,
+        and_(model.request_date == after_date, later_same_date),
+        model.request_date.is_(None),
+    )
+
+
+# Bulk import (bank requests, DBS checks, Home Office requests)
+BULK_IMPORT_MAX_ROWS = int(os.getenv("BULK_IMPORT_MAX_ROWS", "50000"))
+BULK_INSERT_BATCH_SIZE = 1000
+
+
+def import_format(filename, content_type, fmt=None):
+    """Pick "csv" or "ndjson" from an explicit format, the file extension or its content type."""
+    if fmt:
+        return fmt
+    name = (filename or "").lower()
+    if name.endswith(".csv") or content_type == "text/csv":
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or content_type in (
+        "application/x-ndjson",
+        "application/jsonl",
+    ):
+        return "ndjson"
+    raise HTTPException(
+        status_code=400, detail="Upload a .csv or .ndjson file, or pass format=csv|ndjson"
+    )
 
 
-# HomeOfficeRequests
-def create_home_office_request(db: Session, request: HomeOfficeRequestCreate):
-    db_req = HomeOfficeRequests(**request.model_dump())
-    db.add(db_req)
+def read_import_rows(content: bytes, fmt: str):
+    """Parse an uploaded CSV or NDJSON file into a list of dicts (empty CSV cells -> None)."""
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Upload must be UTF-8 encoded")
+    if fmt == "csv":
+        rows = [
+            {key: (val if val != "" else None) for key, val in row.items()}
+            for row in csv.DictReader(io.StringIO(text))
+        ]
+    else:
+        rows = []
+        for line_no, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                raise HTTPException(status_code=400, detail=f"Line {line_no} is not valid JSON")
+    if len(rows) > BULK_IMPORT_MAX_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {BULK_IMPORT_MAX_ROWS} rows can be imported at once",
+        )
+    return rows
+
+
+def import_requests(db: Session, model, create_schema, rows, all_or_nothing=False):
+    """Validate rows against `create_schema` and insert the valid ones in one transaction.
+
+    Returns {"inserted": n, "errors": [{"row": n, "errors": [...]}]}; rows are
+    numbered from 1 in upload order. With all_or_nothing nothing is inserted
+    when any row fails.
+    """
+    valid, errors = [], []
+    for row_no, row in enumerate(rows, start=1):
+        try:
+            valid.append((row_no, create_schema.model_validate(row).model_dump()))
+        except ValidationError as e:
+            messages = [
+                f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+                for err in e.errors()
+            ]
+            errors.append({"row": row_no, "errors": messages})
+
+    # Reject unknown employees up front instead of failing the whole insert on the FK
+    employee_ids = {data["employee_id"] for _, data in valid}
+    known = set(
+        db.scalars(select(Employee.id).where(Employee.id.in_(employee_ids)))
+    ) if employee_ids else set()
+    for row_no, data in valid:
+        if data["employee_id"] not in known:
+            errors.append({"row": row_no, "errors": [f"employee_id: Employee {data['employee_id']} not found"]})
+    values = [data for _, data in valid if data["employee_id"] in known]
+    errors.sort(key=lambda err: err["row"])
+
+    if errors and all_or_nothing:
+        return {"inserted": 0, "errors": errors}
+    bulk_insert(db, model, values)
     db.commit()
-    db.refresh(db_req)
-    return db_req
+    return {"inserted": len(values), "errors": errors}
+
+
+def bulk_insert(db: Session, model, values):
+    """Insert many rows: COPY on Postgres, batched multi-row INSERTs elsewhere.
+
+    The new ids come back from RETURNING, so rows committed concurrently by
+    other transactions are never taken for part of the import.
+    """
+    if not values:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        ids = _copy_rows(db, model, values)
+    else:
+        ids = []
+        for start in range(0, len(values), BULK_INSERT_BATCH_SIZE):
+            ids += db.scalars(
+                insert(model).returning(model.id), values[start : start + BULK_INSERT_BATCH_SIZE]
+            ).all()
+    count_changes(
+        db.connection(),
+        model,
+        [(1, data.get("status"), data.get("employee_id")) for data in values],
+    )
+    bump_on_commit(db, [model.__tablename__])
+    log_changes(db, model, ids)
+    _invalidate_cached_responses(
+        db, model, employee_ids={data.get("employee_id") for data in values}
+    )
+    # One event for the whole import rather than one per row; HR only
+    publish_on_commit(db, [{"type": EVENT_TYPES[model], "op": "imported", "count": len(values)}])
 
 
-# DBSChecks
-def create_dbs_check(db: Session, check: DBSCheckCreate):
-    db_check = DBSChecks(**check.model_dump())
-    db.add(db_check)
+def _invalidate_cached_responses(db: Session, model, ids=(), employee_ids=()):
+    # Imported here: response_cache depends on auth, which imports this module
+    from response_cache import response_cache
+
+    table = model.__tablename__
+    response_cache.invalidate_on_commit(
+        db,
+        [table]
+        + [f"{table}:{id_}" for id_ in ids]
+        + [f"employees:{id_}" for id_ in employee_ids if id_ is not None],
+    )
+
+
+def _copy_rows(db: Session, model, values):
+    """COPY `values` into a temporary staging table, then move them into the
+    model's table with one INSERT ... SELECT ... RETURNING id."""
+    columns = list(values[0])
+    table = model.__tablename__
+    staging = f"{table}_import"
+    buffer = io.StringIO()
+    for data in values:
+        # Unquoted empty field is NULL in COPY's CSV format; quoted "" is an empty string
+        buffer.write(
+            ",".join(
+                "" if data[col] is None else '"' + str(data[col]).replace('"', '""') + '"'
+                for col in columns
+            )
+        )
+        buffer.write("\n")
+    buffer.seek(0)
+    column_list = ", ".join(columns)
+    conn = db.connection()
+    # Same column types, none of the constraints or defaults (no ids drawn here)
+    conn.exec_driver_sql(
+        f"CREATE TEMPORARY TABLE {staging} ON COMMIT DROP AS "
+        f"SELECT {column_list} FROM {table} WITH NO DATA"
+    )
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+    finally:
+        cursor.close()
+    ids = conn.exec_driver_sql(
+        f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging} RETURNING id"
+    ).scalars().all()
+    conn.exec_driver_sql(f"DROP TABLE {staging}")
+    return ids
+
+
+# Bulk status transitions
+BULK_STATUS_BATCH_SIZE = 10000
+
+
+def bulk_update_status(db: Session, model, new_status: str, ids=None, clauses=()):
+    """Set `status` on the rows matching `ids` (or `clauses`) with set-based UPDATEs.
+
+    The matching rows are locked and read first so the dashboard counts can
+    be moved in the same transaction, then updated by id in batches of
+    BULK_STATUS_BATCH_SIZE.
+    """
+    matched = select(model.id, model.status, model.employee_id).with_for_update()
+    matched = matched.where(model.id.in_(ids)) if ids is not None else matched.where(*clauses)
+    rows = db.execute(matched).all()
+    for start in range(0, len(rows), BULK_STATUS_BATCH_SIZE):
+        batch = [row.id for row in rows[start : start + BULK_STATUS_BATCH_SIZE]]
+        db.execute(
+            update(model).where(model.id.in_(batch)).values(status=new_status),
+            execution_options={"synchronize_session": "fetch"},
+        )
+    changes, audited, events = [], [], []
+    for request_id, old_status, employee_id in rows:
+        changes += [(-1, old_status, employee_id), (1, new_status, employee_id)]
+        audited.append((request_id, employee_id, old_status, new_status))
+        if old_status != new_status:
+            events.append(change_event(model, "updated", request_id, employee_id, new_status))
+    count_changes(db.connection(), model, changes)
+    record_changes(db, model, audited)
+    log_changes(db, model, [event["id"] for event in events])
+    publish_on_commit(db, events)
+    if rows:
+        bump_on_commit(db, [model.__tablename__])
+        _invalidate_cached_responses(
+            db,
+            model,
+            ids=[row.id for row in rows],
+            employee_ids={row.employee_id for row in rows},
+        )
     db.commit()
-    db.refresh(db_check)
-    return db_check
+    updated_ids = sorted(row[0] for row in rows)
+    missing_ids = sorted(set(ids) - set(updated_ids)) if ids is not None else []
+    return {"updated": len(updated_ids), "updated_ids": updated_ids, "missing_ids": missing_ids}
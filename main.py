@@ -1,83 +1,157 @@
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base, SessionLocal
-from routers import users, employees, bank_request, home_office, dbs
-from model import Role, User
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+import database
+from database import DB_MODE, configure_threadpool, create_schema, dialect_insert
+from routers import (
+    users,
+    employees,
+    bank_request,
+    home_office,
+    dbs,
+    request_queue,
+    dashboard,
+    monitoring,
+    metrics,
+    audit,
+    events,
+    sync,
+)
+from model import Employee, Role, User
 from auth.auth import get_password_hash
+from auth.hashing import password_hasher
+from audit import audit_writer
+from events import change_broker
+from pagination import NEXT_CURSOR_HEADER
+from metrics import METRICS_ENABLED, MetricsMiddleware
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # You can restrict this to your frontend's URL
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Set to false when the schema and seed data are managed outside the app
+# (migrations, a one-off job) so workers start without touching the database
+BOOTSTRAP_DB = os.getenv("BOOTSTRAP_DB", "true").lower() == "true"
+
+ROLES = {
+    "admin": {"is_admin": True, "is_hr": True, "is_employee": True},
+    "hr": {"is_admin": False, "is_hr": True, "is_employee": True},
+    "employee": {"is_admin": False, "is_hr": False, "is_employee": True},
+}
+
+
+# Initial DB setup for roles and admin user, in one transaction. Safe to run
+# from several workers at once: every insert skips rows that already exist.
+def init_db(bind=None):
+    bind = bind or database.get_engine()
+    create_schema(bind)
+    with Session(bind) as db, db.begin():
+        db.execute(
+            dialect_insert(bind, Role)
+            .values([{"role_name": name, **flags} for name, flags in ROLES.items()])
+            .on_conflict_do_nothing(index_elements=["role_name"])
+        )
 
-# Include routers (all CRUD and auth logic should be in routers)
-app.include_router(users.router)
-app.include_router(employees.router)
-app.include_router(bank_request.router)
-app.include_router(home_office.router)
-app.include_router(dbs.router)
-
-
-# Initial DB setup for roles and admin user
-def init_db():
-    db = SessionLocal()
-    try:
-        # Create roles if not exist
-        roles = {
-            "admin": {"is_admin": True, "is_hr": True, "is_employee": True},
-            "hr": {"is_admin": False, "is_hr": True, "is_employee": True},
-            "employee": {"is_admin": False, "is_hr": False, "is_employee": True},
-        }
-        for role_name, flags in roles.items():
-            r = db.query(Role).filter(Role.role_name == role_name).first()
-            if not r:
-                r = Role(
-                    role_name=role_name,
-                    is_admin=flags["is_admin"],
-                    is_hr=flags["is_hr"],
-                    is_employee=flags["is_employee"],
+        # Only hash the default password when the admin user is actually missing
+        if db.scalar(select(User.id).where(User.username == "admin")) is None:
+            admin_role_id = db.scalar(select(Role.id).where(Role.role_name == "admin"))
+            db.execute(
+                dialect_insert(bind, User)
+                .values(
+                    username="admin",
+                    email="admin@gmail.com",
+                    password_hash=get_password_hash("adminpassword"),
+                    role_id=admin_role_id,
                 )
-                db.add(r)
-                db.commit()  # Commit after each add
-
-        # Create default admin user if not exists
-        admin_user = db.query(User).filter(User.username == "admin").first()
-        if not admin_user:
-            admin_role = db.query(Role).filter(Role.role_name == "admin").first()
-            user = User(
-                username="admin",
-                email="admin@gmail.com",
-                password_hash=get_password_hash("adminpassword"),
-                role_id=admin_role.id,
+                .on_conflict_do_nothing(index_elements=["username"])
             )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-
-            # Create matching employee entry
-            from model import Employee
-
-            employee = Employee(
-                user_id=user.id,
-                first_name="Admin",
-                last_name="User",
-                email=user.email,
-                phone_number="0000000000",
-                department="Administration",
-                position="System Administrator",
+
+        # Create matching employee entry
+        admin_id = db.scalar(select(User.id).where(User.username == "admin"))
+        if db.scalar(select(Employee.id).where(Employee.user_id == admin_id)) is None:
+            db.execute(
+                dialect_insert(bind, Employee)
+                .values(
+                    user_id=admin_id,
+                    first_name="Admin",
+                    last_name="User",
+                    email="admin@gmail.com",
+                    phone_number="0000000000",
+                    department="Administration",
+                    position="System Administrator",
+                )
+                .on_conflict_do_nothing()
             )
-            db.add(employee)
-            db.commit()
 
-    finally:
-        db.close()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    await configure_threadpool()
+    if app.state.bootstrap_db:
+        await run_in_threadpool(init_db)
+    ready = time.perf_counter()
+    app.state.startup = {
+        "import_ms": 1000 * (app.state.created_at - _import_started),
+        "bootstrap_ms": 1000 * (ready - started),
+        "ready_ms": 1000 * (ready - _import_started),
+        "bootstrap_db": app.state.bootstrap_db,
+    }
+    logger.info("Worker ready in %.1f ms", app.state.startup["ready_ms"])
+    yield
+    # End the open event streams so the server is not kept waiting on them
+    change_broker.close()
+    password_hasher.shutdown()
+    # Write out the queued audit entries before the worker exits
+    await run_in_threadpool(audit_writer.shutdown)
+
+
+def create_app(bootstrap_db: bool = BOOTSTRAP_DB) -> FastAPI:
+    app = FastAPI(lifespan=lifespan)
+    app.state.bootstrap_db = bootstrap_db
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # You can restrict this to your frontend's URL
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER],
+    )
+    # Outermost, so its latency covers the whole stack
+    if METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
+    # In async mode the AsyncSession routers come first and take precedence over
+    # the sync routes they re-implement
+    if DB_MODE == "async":
+        from routers import async_crud
+
+        for router in async_crud.routers:
+            app.include_router(router)
+
+    # Include routers (all CRUD and auth logic should be in routers)
+    app.include_router(users.router)
+    app.include_router(employees.router)
+    app.include_router(bank_request.router)
+    app.include_router(home_office.router)
+    app.include_router(dbs.router)
+    app.include_router(request_queue.router)
+    app.include_router(dashboard.router)
+    app.include_router(monitoring.router)
+    app.include_router(metrics.router)
+    app.include_router(audit.router)
+    app.include_router(events.router)
+    app.include_router(sync.router)
+    app.state.created_at = time.perf_counter()
+    return app
 
 
-init_db()
+app = create_app()
@@ -0,0 +1,354 @@
+"""Per-route request metrics: latency, DB time, statement count, auth and serialisation time.
+
+MetricsMiddleware (pure ASGI) puts a RequestTimings in a context variable for
+each HTTP request. The engine cursor hooks add statement time to it, the auth
+dependencies and ListSerializer time themselves with timed(), and TimedRoute
+counts everything after the endpoint returns (response_model validation, JSON
+rendering) as serialisation. Once the response has been sent the totals go
+into histograms labelled by method and route template, served in Prometheus
+text format at /metrics. Unless disabled, each response also carries a
+Server-Timing header with the same breakdown. The phases can overlap: a
+token that has to be resolved from the database counts towards both auth and db.
+
+Routes can declare a statement budget with @query_budget(n). A request that
+runs more statements is logged (QUERY_BUDGET_MODE=log, the default), fails
+with QueryBudgetExceeded (raise; the test suite runs this way) or is ignored
+(off). Budgets only fit routes whose statement count does not grow with the
+size of the input or the result.
+
+Counters are per process; with several workers, scrape each one or aggregate
+in Prometheus.
+"""
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+load_dotenv(".env.custom")
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+# /metrics requires "Authorization: Bearer <METRICS_TOKEN>"; without a token it
+# is closed unless METRICS_PUBLIC=true opens it to anyone who can reach it
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "false").lower() == "true"
+# "log", "raise" or "off": what happens when a route exceeds its query budget
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "log").lower()
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+
+class RequestTimings:
+    __slots__ = (
+        "started",
+        "db_seconds",
+        "statements",
+        "auth_seconds",
+        "serialize_seconds",
+        "endpoint_done",
+        "statement_log",
+    )
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.statements = 0
+        self.auth_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.endpoint_done = None
+        # SQL of each statement, only kept when a budget failure must show it
+        self.statement_log = None
+
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.started
+        return (
+            f'total;dur={1000 * total:.2f}, '
+            f'db;dur={1000 * self.db_seconds:.2f};desc="{self.statements} statements", '
+            f'auth;dur={1000 * self.auth_seconds:.2f}, '
+            f'serialize;dur={1000 * self.serialize_seconds:.2f}'
+        )
+
+
+# Sync routes and dependencies run in the threadpool with a copy of the
+# request's context, so they all see (and add to) the same RequestTimings
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+@contextmanager
+def timed(phase: str):
+    """Add the time spent in the block to the current request's `phase`_seconds."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        attribute = f"{phase}_seconds"
+        setattr(timings, attribute, getattr(timings, attribute) + time.perf_counter() - start)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def query_budget(statements: int):
+    """Declare the most SQL statements one request to the route may run, auth included."""
+
+    def decorate(endpoint):
+        endpoint.query_budget = statements
+        return endpoint
+
+    return decorate
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series.setdefault(labels, [[0] * (len(self.buckets) + 1), 0.0, 0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self, label_names, lines):
+        lines.append(f"# HELP {self.name} {self.help_text}")
+        lines.append(f"# TYPE {self.name} histogram")
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(label_names, labels))
+            cumulative = 0
+            for bound, n in zip((*self.buckets, "+Inf"), counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+
+
+class RouteMetrics:
+    """Histograms per (method, route template); responses counted by status."""
+
+    LABELS = ("method", "route")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.duration = Histogram(
+                "http_request_duration_seconds", "Time to handle the request.", SECONDS_BUCKETS
+            )
+            self.db = Histogram(
+                "http_request_db_seconds", "Time spent executing SQL statements.", SECONDS_BUCKETS
+            )
+            self.statements = Histogram(
+                "http_request_db_statements", "SQL statements executed.", STATEMENT_BUCKETS
+            )
+            self.auth = Histogram(
+                "http_request_auth_seconds", "Time spent authenticating the caller.", SECONDS_BUCKETS
+            )
+            self.serialize = Histogram(
+                "http_request_serialize_seconds", "Time spent serialising the response.", SECONDS_BUCKETS
+            )
+            self.responses = {}
+            self.over_budget = {}
+
+    def observe(self, method, route, status, timings: RequestTimings, total):
+        labels = (method, route)
+        with self._lock:
+            self.duration.observe(labels, total)
+            self.db.observe(labels, timings.db_seconds)
+            self.statements.observe(labels, timings.statements)
+            self.auth.observe(labels, timings.auth_seconds)
+            self.serialize.observe(labels, timings.serialize_seconds)
+            key = (method, route, str(status))
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def observe_over_budget(self, method, route):
+        with self._lock:
+            key = (method, route)
+            self.over_budget[key] = self.over_budget.get(key, 0) + 1
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_responses_total Responses sent, by status code.",
+            "# TYPE http_responses_total counter",
+        ]
+        with self._lock:
+            for (method, route, status), n in sorted(self.responses.items()):
+                lines.append(
+                    f'http_responses_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {n}'
+                )
+            lines.append("# HELP http_requests_over_query_budget_total Requests that ran more SQL statements than their route's budget.")
+            lines.append("# TYPE http_requests_over_query_budget_total counter")
+            for (method, route), n in sorted(self.over_budget.items()):
+                lines.append(
+                    f'http_requests_over_query_budget_total{{method="{method}",route="{_escape(route)}"}} {n}'
+                )
+            for histogram in (self.duration, self.db, self.statements, self.auth, self.serialize):
+                histogram.render(self.LABELS, lines)
+        return "\n".join(lines) + "\n"
+
+
+route_metrics = RouteMetrics()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: no extra task per request, body streamed untouched."""
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING_ENABLED):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", ()))
+                    headers.append((b"server-timing", timings.server_timing().encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            route_metrics.observe(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status,
+                timings,
+                time.perf_counter() - timings.started,
+            )
+
+
+class TimedRoute(APIRoute):
+    """Route class that counts the time after the endpoint returns as serialisation
+    and checks the endpoint's query budget."""
+
+    def get_route_handler(self):
+        call = self.dependant.call
+        if not getattr(call, "_timed", False):
+            self.dependant.call = _mark_endpoint_done(call)
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            timings = _current.get()
+            budget = getattr(self.endpoint, "query_budget", None)
+            if timings is None or budget is None or QUERY_BUDGET_MODE == "off":
+                budget = None
+            elif QUERY_BUDGET_MODE == "raise":
+                timings.statement_log = []
+            response = await handler(request)
+            if timings is not None:
+                if timings.endpoint_done is not None:
+                    timings.serialize_seconds += time.perf_counter() - timings.endpoint_done
+                if budget is not None and timings.statements > budget:
+                    self.over_budget(request, timings, budget)
+            return response
+
+        return timed_handler
+
+    def over_budget(self, request, timings, budget):
+        route_metrics.observe_over_budget(request.method, self.path)
+        message = (
+            f"{request.method} {self.path} ran {timings.statements} SQL statements; "
+            f"its budget is {budget}"
+        )
+        if QUERY_BUDGET_MODE == "raise":
+            raise QueryBudgetExceeded("\n    ".join([message, *timings.statement_log]))
+        logger.warning(message)
+
+
+def _mark_endpoint_done(call):
+    def mark():
+        timings = _current.get()
+        if timings is not None:
+            timings.endpoint_done = time.perf_counter()
+
+    if asyncio.iscoroutinefunction(call):
+
+        @functools.wraps(call)
+        async def wrapper(*args, **kwargs):
+            result = await call(*args, **kwargs)
+            mark()
+            return result
+
+    else:
+
+        @functools.wraps(call)
+        def wrapper(*args, **kwargs):
+            result = call(*args, **kwargs)
+            mark()
+            return result
+
+    wrapper._timed = True
+    return wrapper
+
+
+# DB time: every engine (sync, and the sync side of async engines) reports its
+# statements to whichever request is running them
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    timings = _current.get()
+    started = conn.info.get("statement_started")
+    if timings is None or not started:
+        return
+    timings.db_seconds += time.perf_counter() - started.pop()
+    timings.statements += 1
+    if timings.statement_log is not None:
+        timings.statement_log.append(statement)
+
+
+@event.listens_for(Engine, "handle_error")
+def _drop_failed_statement(context):
+    # after_cursor_execute does not run for a failed statement
+    conn = context.connection
+    if conn is not None and conn.info.get("statement_started"):
+        conn.info["statement_started"].pop()
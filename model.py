@@ -1,8 +1,36 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date
+from sqlalchemy import (
+    DDL,
+    Column,
+    BigInteger,
+    Integer,
+    String,
+    Boolean,
+    ForeignKey,
+    Date,
+    DateTime,
+    Float,
+    Index,
+    event,
+    func,
+    literal_column,
+    text,
+)
 from sqlalchemy.orm import relationship
 from database import Base
 
 
+# Indexes shared by the three request tables: children of an employee (with
+# their statuses), keyset pages filtered by status, request_date ranges and
+# the cross-type request queue (status, oldest first)
+def request_indexes(table):
+    return (
+        Index(f"ix_{table}_employee_id_status", "employee_id", "status"),
+        Index(f"ix_{table}_status_id", "status", "id"),
+        Index(f"ix_{table}_request_date", "request_date"),
+        Index(f"ix_{table}_status_request_date_id", "status", "request_date", "id"),
+    )
+
+
 class Role(Base):
     __tablename__ = "roles"
     id = Column(Integer, primary_key=True, index=True)
@@ -14,6 +42,32 @@ class Role(Base):
     users = relationship("User", back_populates="role")
 
 
+# "Not before" marks for access tokens whose role claims went stale, shared by
+# every worker (see auth/revocation.py): kind is "user" or "role"
+class TokenRevocation(Base):
+    __tablename__ = "token_revocations"
+    kind = Column(String, primary_key=True)
+    subject_id = Column(Integer, primary_key=True)
+    # Unix time, compared with the tokens' iat claim
+    revoked_at = Column(Float, nullable=False, index=True)
+
+
+# Single-use tickets for opening an event stream (auth/stream_tickets.py),
+# redeemable through any worker; only a hash of each ticket is stored
+class StreamTicket(Base):
+    __tablename__ = "stream_tickets"
+    ticket_hash = Column(String, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    role_id = Column(Integer)
+    employee_id = Column(Integer)
+    everything = Column(Boolean, nullable=False)
+    # Unix times: since when the caller's audience is known good, when its
+    # access token expires, and when the ticket itself does
+    authorised_at = Column(Float, nullable=False)
+    token_expires_at = Column(Float, nullable=False)
+    expires_at = Column(Float, nullable=False, index=True)
+
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
@@ -26,6 +80,19 @@ class User(Base):
     employee = relationship("Employee", back_populates="user", uselist=False)
 
 
+def search_document(columns):
+    """lower(col1 || ' ' || col2 || ...): the text employee search matches.
+
+    The constants are rendered inline so queries repeat the indexed expression
+    exactly, which PostgreSQL needs in order to use the index.
+    """
+    parts = [func.coalesce(column, literal_column("''")) for column in columns]
+    document = parts[0]
+    for part in parts[1:]:
+        document = document + literal_column("' '") + part
+    return func.lower(document)
+
+
 class Employee(Base):
     __tablename__ = "employees"
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
@@ -35,7 +102,7 @@ class Employee(Base):
     last_name = Column(String, nullable=False)
     email = Column(String, nullable=False)
     phone_number = Column(String, nullable=True)
-    department = Column(String, nullable=True)
+    department = Column(String, nullable=True, index=True)
     position = Column(String, nullable=True)
     date_of_birth = Column(Date, nullable=True)
     national_insurance_number = Column(String, nullable=True)
@@ -45,9 +112,41 @@ class Employee(Base):
     home_office_requests = relationship("HomeOfficeRequests", back_populates="employee")
     user = relationship("User", back_populates="employee")
 
+    # Trigram index for substring and fuzzy search on PostgreSQL; other
+    # databases use the in-process index in search.py
+    __table_args__ = (
+        Index(
+            "ix_employees_search_trgm",
+            search_document(
+                (first_name, last_name, email, national_insurance_number, department)
+            ).label("search_document"),
+            postgresql_using="gin",
+            postgresql_ops={"search_document": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+# Columns HR searches employees by, in search_document order (see search.py)
+EMPLOYEE_SEARCH_COLUMNS = (
+    Employee.first_name,
+    Employee.last_name,
+    Employee.email,
+    Employee.national_insurance_number,
+    Employee.department,
+)
+
+
+# gin_trgm_ops comes from the pg_trgm extension
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
 
 class BankRequests(Base):
     __tablename__ = "bank_requests"
+    __table_args__ = request_indexes("bank_requests")
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     employee_id = Column(Integer, ForeignKey("employees.id"))
     request_date = Column(Date, nullable=True)
@@ -59,6 +158,7 @@ class BankRequests(Base):
 
 class HomeOfficeRequests(Base):
     __tablename__ = "home_office_requests"
+    __table_args__ = request_indexes("home_office_requests")
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     employee_id = Column(Integer, ForeignKey("employees.id"))
     request_date = Column(Date, nullable=True)
@@ -70,6 +170,7 @@ class HomeOfficeRequests(Base):
 
 class DBSChecks(Base):
     __tablename__ = "dbs_checks"
+    __table_args__ = request_indexes("dbs_checks")
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     employee_id = Column(Integer, ForeignKey("employees.id"))
     request_date = Column(Date, nullable=True)
@@ -77,3 +178,65 @@ class DBSChecks(Base):
     details = Column(String, nullable=True)
 
     employee = relationship("Employee", back_populates="dbs_checks")
+
+
+# request_type tag -> table, in the order ties are broken when types are merged
+REQUEST_TYPES = (
+    ("bank_request", BankRequests),
+    ("dbs_check", DBSChecks),
+    ("home_office_request", HomeOfficeRequests),
+)
+
+
+# Dashboard counts by request type x status x department, kept up to date by
+# aggregates.py. Missing status/department are stored as "" so they can be
+# part of the primary key.
+class RequestStatusCount(Base):
+    __tablename__ = "request_status_counts"
+    request_type = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    department = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, server_default=text("0"))
+
+
+# Write counter per table, bumped by every transaction that writes to it (see
+# versions.py); ETags are built from these
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, server_default=text("0"))
+
+
+# Latest revision of every employee and request row, deleted ones included as
+# tombstones, for delta sync (see changelog.py)
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+    __table_args__ = (
+        Index("ix_change_log_revision", "revision", "entity_type", "entity_id"),
+    )
+    entity_type = Column(String, primary_key=True)
+    entity_id = Column(Integer, primary_key=True)
+    # A transaction id on PostgreSQL (changelog.py), hence 64 bits
+    revision = Column(BigInteger, nullable=False)
+    deleted = Column(Boolean, nullable=False, default=False)
+
+
+# Who moved which request to which status, and when. Written in batches by the
+# background writer in audit.py, never in the request's own transaction.
+class AuditLog(Base):
+    __tablename__ = "audit_log"
+    __table_args__ = (
+        Index("ix_audit_log_request", "request_type", "request_id", "id"),
+        Index("ix_audit_log_changed_by", "changed_by", "id"),
+        Index("ix_audit_log_changed_at", "changed_at"),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    request_type = Column(String, nullable=False)
+    request_id = Column(Integer, nullable=False)
+    employee_id = Column(Integer, nullable=True)
+    old_status = Column(String, nullable=True)
+    new_status = Column(String, nullable=True)
+    # Not foreign keys: entries outlive the users and requests they mention
+    changed_by = Column(Integer, nullable=True)
+    changed_by_username = Column(String, nullable=True)
+    changed_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,110 @@
+import base64
+import json
+from datetime import date
+from typing import Optional
+
+from fastapi import HTTPException, Query, Response
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Response header carrying the cursor for the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageParams:
+    """Keyset pagination parameters: return at most `limit` rows with id > `after`."""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        after: Optional[int] = Query(None, ge=0),
+    ):
+        self.limit = limit
+        self.after = after
+
+
+class CursorPageParams:
+    """Keyset pagination over a composite sort key, with an opaque `after` cursor."""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        after: Optional[str] = Query(None),
+    ):
+        self.limit = limit
+        self.after = decode_cursor(after) if after is not None else None
+
+
+def encode_cursor(values) -> str:
+    raw = json.dumps(list(values), separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+    if not isinstance(values, list):
+        raise HTTPException(400, "Invalid cursor")
+    return values
+
+
+class RequestFilters:
+    """Server-side filters shared by the bank, DBS and Home Office request lists."""
+
+    def __init__(
+        self,
+        status: Optional[str] = Query(None),
+        employee_id: Optional[int] = Query(None),
+        request_date_from: Optional[date] = Query(None),
+        request_date_to: Optional[date] = Query(None),
+    ):
+        self.status = status
+        self.employee_id = employee_id
+        self.request_date_from = request_date_from
+        self.request_date_to = request_date_to
+
+    def clauses(self, model):
+        clauses = []
+        if self.status is not None:
+            clauses.append(model.status == self.status)
+        if self.employee_id is not None:
+            clauses.append(model.employee_id == self.employee_id)
+        if self.request_date_from is not None:
+            clauses.append(model.request_date >= self.request_date_from)
+        if self.request_date_to is not None:
+            clauses.append(model.request_date <= self.request_date_to)
+        return clauses
+
+    def apply(self, query, model):
+        clauses = self.clauses(model)
+        return query.filter(*clauses) if clauses else query
+
+
+def paginate(query, model, page: PageParams, response: Response):
+    """Run one keyset page of `query` ordered by primary key.
+
+    One extra row is fetched to tell whether another page exists; if it does,
+    the id of the last returned row is sent back in the X-Next-Cursor header.
+    """
+    if page.after is not None:
+        query = query.filter(model.id > page.after)
+    rows = query.order_by(model.id).limit(page.limit + 1).all()
+    return _trim_page(rows, page, response)
+
+
+async def paginate_async(db, stmt, model, page: PageParams, response: Response):
+    """`paginate` for a select() statement run on an AsyncSession."""
+    if page.after is not None:
+        stmt = stmt.where(model.id > page.after)
+    result = await db.scalars(stmt.order_by(model.id).limit(page.limit + 1))
+    return _trim_page(result.all(), page, response)
+
+
+def _trim_page(rows, page: PageParams, response: Response):
+    if len(rows) > page.limit:
+        rows = rows[: page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = str(rows[-1].id)
+    return rows
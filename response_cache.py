@@ -0,0 +1,268 @@
+"""Read-through cache for GET responses, invalidated when writes commit.
+
+Routes opt in by using CachedRoute as their router's route class and listing a
+CachedResponse dependency after their auth dependency. Entries are keyed by
+path, query string and the caller's role flags, and tagged with the tables
+(list routes) or rows (detail routes) they were built from. Session hooks
+collect the tags of everything a transaction writes and drop the matching
+entries once it commits.
+
+The default backend is an in-process LRU with a TTL; a shared store only has
+to implement CacheBackend. With the in-process backend, a write handled by
+another worker is only seen here once the entry's TTL runs out.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import Depends, Request, Response
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from auth.dependencies import get_current_user, get_current_user_async
+from metrics import TimedRoute
+from versions import etag_matches
+
+load_dotenv(".env.custom")
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+RESPONSE_CACHE_MAX_SIZE = int(os.getenv("RESPONSE_CACHE_MAX_SIZE", "2048"))
+
+# Response headers worth replaying on a hit
+CACHED_HEADERS = ("content-type", "etag", "cache-control", "x-next-cursor")
+
+
+class CacheBackend:
+    """Storage interface; `generation` must change on every invalidation."""
+
+    def get(self, key: str) -> Optional[tuple]:
+        raise NotImplementedError
+
+    def set(self, key: str, entry: tuple, tags, generation) -> None:
+        """Store `entry` unless anything was invalidated since `generation` was read."""
+        raise NotImplementedError
+
+    def generation(self):
+        raise NotImplementedError
+
+    def invalidate_tags(self, tags) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """Thread-safe LRU with a per-entry TTL and a tag -> keys index."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+        max_size: int = RESPONSE_CACHE_MAX_SIZE,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.skipped_stores = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, entry, tags, generation):
+        with self._lock:
+            # A write committed while this response was being built
+            if generation != self._generation:
+                self.skipped_stores += 1
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, entry, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def invalidate_tags(self, tags):
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    if key in self._entries:
+                        self._drop(key)
+                        self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "skipped_stores": self.skipped_stores,
+            }
+
+    def _drop(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class ResponseCache:
+    def __init__(self, backend: CacheBackend, enabled: bool = RESPONSE_CACHE_ENABLED):
+        self.backend = backend
+        self.enabled = enabled
+
+    def invalidate_on_commit(self, session: Session, tags):
+        """Queue tags for writes the session hooks cannot see (bulk Core statements)."""
+        session.info.setdefault("response_cache_tags", set()).update(tags)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, **self.backend.stats()}
+
+
+response_cache = ResponseCache(MemoryBackend())
+
+
+class CachedResponseHit(Exception):
+    def __init__(self, entry):
+        self.entry = entry
+
+
+class CachedResponse:
+    """Dependency: answer from the cache, or mark the response to be stored.
+
+    `tags` are formatted with the path parameters, e.g. "employees:{employee_id}".
+    """
+
+    def __init__(self, *tags):
+        self.tags = tags
+
+    def lookup(self, request: Request, user):
+        if not response_cache.enabled:
+            return
+        role = f"{int(user.is_admin)}{int(user.is_hr)}{int(user.is_employee)}"
+        query = "&".join(sorted(request.url.query.split("&"))) if request.url.query else ""
+        key = f"{request.url.path}?{query}#{role}"
+        entry = response_cache.backend.get(key)
+        if entry is not None:
+            raise CachedResponseHit(entry)
+        tags = [tag.format(**request.path_params) for tag in self.tags]
+        request.scope["response_cache"] = (key, tags, response_cache.backend.generation())
+
+    async def __call__(self, request: Request, user=Depends(get_current_user)):
+        self.lookup(request, user)
+
+
+class CachedResponseAsync(CachedResponse):
+    async def __call__(self, request: Request, user=Depends(get_current_user_async)):
+        self.lookup(request, user)
+
+
+class CachedRoute(TimedRoute):
+    """Route class that replays cache hits and stores successful responses."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def cached_handler(request: Request) -> Response:
+            try:
+                response = await handler(request)
+            except CachedResponseHit as hit:
+                status_code, body, headers = hit.entry
+                if etag_matches(request.headers.get("if-none-match"), headers.get("etag")):
+                    return Response(status_code=304, headers={"etag": headers["etag"]})
+                return Response(body, status_code=status_code, headers=headers)
+            pending = request.scope.pop("response_cache", None)
+            if pending is not None and response.status_code == 200 and hasattr(response, "body"):
+                key, tags, generation = pending
+                headers = {
+                    name: value
+                    for name, value in response.headers.items()
+                    if name in CACHED_HEADERS
+                }
+                response_cache.backend.set(
+                    key, (response.status_code, response.body, headers), tags, generation
+                )
+            return response
+
+        return cached_handler
+
+
+# Invalidation: collect the tags of every row a transaction writes (its table,
+# the row itself and, for requests, the owning employee's detail) and drop the
+# matching entries after commit; a rollback discards them.
+@event.listens_for(Session, "after_flush")
+def _collect_cache_tags(session, flush_context):
+    tags = session.info.setdefault("response_cache_tags", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        state = inspect(obj)
+        table = state.mapper.local_table.name
+        tags.add(table)
+        if state.identity:
+            tags.add(f"{table}:{state.identity[0]}")
+        if "employee_id" in state.attrs:
+            history = state.attrs.employee_id.history
+            for employee_id in (*history.deleted, *history.unchanged, *history.added):
+                tags.add(f"employees:{employee_id}")
+            if obj.employee_id is not None:
+                tags.add(f"employees:{obj.employee_id}")
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_cache_tags(session):
+    tags = session.info.pop("response_cache_tags", None)
+    if tags:
+        response_cache.backend.invalidate_tags(tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_cache_tags(session):
+    session.info.pop("response_cache_tags", None)
@@ -0,0 +1,260 @@
+"""Async (AsyncSession) variants of the CRUD routers, served when DB_MODE=async.
+
+main.py includes these ahead of the sync routers, so they answer every route
+they define; anything without an async variant (exports, imports, ...) falls
+through to the sync router. Detail routes use an `:int` path convertor so they
+never swallow sibling paths such as /employees/export.
+"""
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from auth.dependencies import (
+    get_current_user_async,
+    require_admin_async,
+    require_hr_async,
+)
+from database import get_async_db
+from functions_crud import STATUS_SOURCES, get_request_statuses_async
+from model import BankRequests, DBSChecks, Employee, HomeOfficeRequests
+from pagination import PageParams, RequestFilters, paginate_async
+from schemas import (
+    BankRequestCreate,
+    BankRequestOut,
+    BankRequestUpdate,
+    DBSCheckCreate,
+    DBSCheckOut,
+    DBSCheckUpdate,
+    EmployeeCreate,
+    EmployeeOut,
+    EmployeeUpdate,
+    HomeOfficeRequestCreate,
+    HomeOfficeRequestOut,
+    HomeOfficeRequestUpdate,
+)
+from response_cache import CachedResponseAsync, CachedRoute
+from metrics import query_budget
+from serialization import Fieldset, FieldsetWithIncludes, Selection
+from versions import ConditionalGetAsync
+
+
+def build_request_router(
+    model, create_schema, update_schema, out_schema, prefix, tags, not_found
+):
+    router = APIRouter(prefix=prefix, tags=tags, route_class=CachedRoute)
+    list_cache = CachedResponseAsync(model.__tablename__)
+    detail_cache = CachedResponseAsync(model.__tablename__ + ":{request_id}")
+    request_etag = ConditionalGetAsync(model.__tablename__)
+    request_fields = Fieldset(out_schema)
+
+    @router.get("/", response_model=List[out_schema])
+    @query_budget(4)
+    async def read_requests(
+        response: Response,
+        page: PageParams = Depends(),
+        filters: RequestFilters = Depends(),
+        selection: Selection = Depends(request_fields),
+        db: AsyncSession = Depends(get_async_db),
+        user=Depends(get_current_user_async),
+        cached=Depends(list_cache),
+        etag=Depends(request_etag),
+    ):
+        stmt = select(model).options(selection.load_only(model)).where(*filters.clauses(model))
+        rows = await paginate_async(db, stmt, model, page, response)
+        return selection.response(rows, response)
+
+    @router.get("/{request_id:int}", response_model=out_schema)
+    @query_budget(4)
+    async def read_request(
+        request_id: int,
+        response: Response,
+        selection: Selection = Depends(request_fields),
+        db: AsyncSession = Depends(get_async_db),
+        user=Depends(get_current_user_async),
+        cached=Depends(detail_cache),
+        etag=Depends(request_etag),
+    ):
+        req = await db.get(model, request_id, options=[selection.load_only(model)])
+        if not req:
+            raise HTTPException(404, not_found)
+        return selection.item_response(req, response)
+
+    @router.post("/", response_model=out_schema)
+    @query_budget(9)
+    async def create_request(
+        request: create_schema,
+        db: AsyncSession = Depends(get_async_db),
+        user=Depends(require_hr_async),
+    ):
+        new_req = model(**request.model_dump())
+        db.add(new_req)
+        await db.commit()
+        await db.refresh(new_req)
+        return new_req
+
+    @router.put("/{request_id:int}", response_model=out_schema)
+    @query_budget(11)
+    async def update_request(
+        request_id: int,
+        update_data: update_schema,
+        db: AsyncSession = Depends(get_async_db),
+        user=Depends(require_hr_async),
+    ):
+        req = await db.get(model, request_id)
+        if not req:
+            raise HTTPException(404, not_found)
+        for key, val in update_data.model_dump(exclude_unset=True).items():
+            setattr(req, key, val)
+        await db.commit()
+        await db.refresh(req)
+        return req
+
+    @router.delete("/{request_id:int}", status_code=status.HTTP_204_NO_CONTENT)
+    @query_budget(10)
+    async def delete_request(
+        request_id: int,
+        db: AsyncSession = Depends(get_async_db),
+        user=Depends(require_admin_async),
+    ):
+        req = await db.get(model, request_id)
+        if not req:
+            raise HTTPException(404, not_found)
+        await db.delete(req)
+        await db.commit()
+
+    return router
+
+
+bank_requests_router = build_request_router(
+    BankRequests,
+    BankRequestCreate,
+    BankRequestUpdate,
+    BankRequestOut,
+    prefix="/bank_requests",
+    tags=["Bank Requests"],
+    not_found="Bank request not found",
+)
+dbs_checks_router = build_request_router(
+    DBSChecks,
+    DBSCheckCreate,
+    DBSCheckUpdate,
+    DBSCheckOut,
+    prefix="/dbs_checks",
+    tags=["DBS Checks"],
+    not_found="DBS check not found",
+)
+home_office_router = build_request_router(
+    HomeOfficeRequests,
+    HomeOfficeRequestCreate,
+    HomeOfficeRequestUpdate,
+    HomeOfficeRequestOut,
+    prefix="/home_office_requests",
+    tags=["Home Office Requests"],
+    not_found="Home Office request not found",
+)
+
+employees_router = APIRouter(prefix="/employees", tags=["Employees"], route_class=CachedRoute)
+employees_etag = ConditionalGetAsync(
+    Employee.__tablename__, *(model.__tablename__ for _, model in STATUS_SOURCES)
+)
+employees_list_cache = CachedResponseAsync(
+    Employee.__tablename__, *(model.__tablename__ for _, model in STATUS_SOURCES)
+)
+employee_detail_cache = CachedResponseAsync(Employee.__tablename__ + ":{employee_id}")
+employee_fields = FieldsetWithIncludes(EmployeeOut, [field for field, _ in STATUS_SOURCES])
+
+
+@employees_router.get("/", response_model=List[EmployeeOut])
+@query_budget(5)
+async def read_employees(
+    response: Response,
+    page: PageParams = Depends(),
+    selection: Selection = Depends(employee_fields),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user_async),
+    cached=Depends(employees_list_cache),
+    etag=Depends(employees_etag),
+):
+    stmt = select(Employee).options(selection.load_only(Employee))
+    employees = await paginate_async(db, stmt, Employee, page, response)
+    statuses = await get_request_statuses_async(
+        db, [emp.id for emp in employees], selection.includes
+    )
+    return selection.response(
+        [
+            {**{name: getattr(emp, name) for name in selection.column_names}, **statuses[emp.id]}
+            for emp in employees
+        ],
+        response,
+    )
+
+
+@employees_router.get("/{employee_id:int}", response_model=EmployeeOut)
+@query_budget(5)
+async def read_employee(
+    employee_id: int,
+    response: Response,
+    selection: Selection = Depends(employee_fields),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user_async),
+    cached=Depends(employee_detail_cache),
+    etag=Depends(employees_etag),
+):
+    employee = await db.get(Employee, employee_id, options=[selection.load_only(Employee)])
+    if not employee:
+        raise HTTPException(404, "Employee not found")
+    statuses = await get_request_statuses_async(db, [employee.id], selection.includes)
+    row = {name: getattr(employee, name) for name in selection.column_names}
+    return selection.item_response({**row, **statuses[employee.id]}, response)
+
+
+@employees_router.post("/", response_model=EmployeeOut)
+@query_budget(9)
+async def create_employee(
+    employee: EmployeeCreate, db: AsyncSession = Depends(get_async_db)
+):
+    new_employee = Employee(**employee.model_dump())
+    db.add(new_employee)
+    await db.commit()
+    await db.refresh(new_employee)
+    statuses = {field: [] for field, _ in STATUS_SOURCES}
+    return EmployeeOut.from_orm_with_status(new_employee, statuses)
+
+
+@employees_router.put("/{employee_id:int}", response_model=EmployeeOut)
+@query_budget(12)
+async def update_employee(
+    employee_id: int,
+    employee_update: EmployeeUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(require_hr_async),
+):
+    employee = await db.get(Employee, employee_id)
+    if not employee:
+        raise HTTPException(404, "Employee not found")
+    for key, val in employee_update.model_dump(exclude_unset=True).items():
+        setattr(employee, key, val)
+    await db.commit()
+    await db.refresh(employee)
+    statuses = await get_request_statuses_async(db, [employee.id])
+    return EmployeeOut.from_orm_with_status(employee, statuses[employee.id])
+
+
+@employees_router.delete("/{employee_id:int}", response_model=str)
+@query_budget(12)
+async def delete_employee(
+    employee_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(require_admin_async),
+):
+    employee = await db.get(Employee, employee_id)
+    if not employee:
+        raise HTTPException(404, "Employee not found")
+    await db.delete(employee)
+    await db.commit()
+    return "Successfully deleted employee"
+
+
+routers = [employees_router, bank_requests_router, home_office_router, dbs_checks_router]
@@ -0,0 +1,60 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.orm import Session
+
+from database import get_db
+from model import AuditLog
+from pagination import PageParams, paginate
+from schemas import AuditLogOut
+from auth.dependencies import require_admin
+from metrics import TimedRoute, query_budget
+from serialization import ListSerializer
+
+router = APIRouter(prefix="/audit", tags=["Audit"], route_class=TimedRoute)
+list_serializer = ListSerializer(AuditLogOut)
+
+
+class AuditFilters:
+    def __init__(
+        self,
+        request_type: Optional[Literal["bank_request", "dbs_check", "home_office_request"]] = Query(None),
+        request_id: Optional[int] = Query(None),
+        employee_id: Optional[int] = Query(None),
+        changed_by: Optional[int] = Query(None),
+        changed_from: Optional[datetime] = Query(None),
+        changed_to: Optional[datetime] = Query(None),
+    ):
+        self.request_type = request_type
+        self.request_id = request_id
+        self.employee_id = employee_id
+        self.changed_by = changed_by
+        self.changed_from = changed_from
+        self.changed_to = changed_to
+
+    def apply(self, query):
+        for column in ("request_type", "request_id", "employee_id", "changed_by"):
+            value = getattr(self, column)
+            if value is not None:
+                query = query.filter(getattr(AuditLog, column) == value)
+        if self.changed_from is not None:
+            query = query.filter(AuditLog.changed_at >= self.changed_from)
+        if self.changed_to is not None:
+            query = query.filter(AuditLog.changed_at <= self.changed_to)
+        return query
+
+
+# Status changes, oldest first. Entries are written in the background, so the
+# latest changes can take up to AUDIT_FLUSH_SECONDS to appear.
+@router.get("/", response_model=List[AuditLogOut])
+@query_budget(3)
+def read_audit_log(
+    response: Response,
+    page: PageParams = Depends(),
+    filters: AuditFilters = Depends(),
+    db: Session = Depends(get_db),
+    user=Depends(require_admin),
+):
+    query = filters.apply(db.query(*list_serializer.columns(AuditLog)))
+    return list_serializer.response(paginate(query, AuditLog, page, response), response)
@@ -1,25 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional
 from database import get_db
 from model import BankRequests
-from schemas import BankRequestCreate, BankRequestUpdate, BankRequestOut
+from functions_crud import (
+    bulk_update_status,
+    import_format,
+    import_requests,
+    read_import_rows,
+)
+from pagination import PageParams, RequestFilters, paginate
+from schemas import (
+    BankRequestCreate,
+    BankRequestUpdate,
+    BankRequestOut,
+    BulkImportResult,
+    BulkStatusUpdate,
+    BulkStatusResult,
+)
 from auth.dependencies import get_current_user, require_hr, require_admin
+from response_cache import CachedResponse, CachedRoute
+from metrics import query_budget
+from serialization import Fieldset, Selection
+from versions import ConditionalGet
 
-router = APIRouter(prefix="/bank_requests", tags=["Bank Requests"])
+router = APIRouter(prefix="/bank_requests", tags=["Bank Requests"], route_class=CachedRoute)
+bank_requests_list_cache = CachedResponse(BankRequests.__tablename__)
+bank_requests_detail_cache = CachedResponse(BankRequests.__tablename__ + ":{request_id}")
+bank_requests_etag = ConditionalGet(BankRequests.__tablename__)
+bank_requests_fields = Fieldset(BankRequestOut)
 
 @router.get("/", response_model=List[BankRequestOut])
-def read_bank_requests(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    return db.query(BankRequests).all()
+@query_budget(4)
+def read_bank_requests(
+    response: Response,
+    page: PageParams = Depends(),
+    filters: RequestFilters = Depends(),
+    selection: Selection = Depends(bank_requests_fields),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+    cached=Depends(bank_requests_list_cache),
+    etag=Depends(bank_requests_etag),
+):
+    query = filters.apply(db.query(*selection.columns(BankRequests)), BankRequests)
+    return selection.response(paginate(query, BankRequests, page, response), response)
 
 @router.get("/{request_id}", response_model=BankRequestOut)
-def read_bank_request(request_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    req = db.query(BankRequests).filter(BankRequests.id == request_id).first()
+@query_budget(4)
+def read_bank_request(
+    request_id: int,
+    response: Response,
+    selection: Selection = Depends(bank_requests_fields),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+    cached=Depends(bank_requests_detail_cache),
+    etag=Depends(bank_requests_etag),
+):
+    req = db.query(*selection.columns(BankRequests)).filter(BankRequests.id == request_id).first()
     if not req:
         raise HTTPException(404, "Bank request not found")
-    return req
+    return selection.item_response(req, response)
 
 @router.post("/", response_model=BankRequestOut)
+@query_budget(9)
 def create_bank_request(request: BankRequestCreate, db: Session = Depends(get_db), user=Depends(require_hr)):
     new_req = BankRequests(**request.dict())
     db.add(new_req)
@@ -28,6 +71,7 @@ def create_bank_request(request: BankRequestCreate, db: Session = Depends(get_db
     return new_req
 
 @router.put("/{request_id}", response_model=BankRequestOut)
+@query_budget(11)
 def update_bank_request(request_id: int, update_data: BankRequestUpdate, db: Session = Depends(get_db), user=Depends(require_hr)):
     req = db.query(BankRequests).filter(BankRequests.id == request_id).first()
     if not req:
@@ -39,9 +83,32 @@ def update_bank_request(request_id: int, update_data: BankRequestUpdate, db: Ses
     return req
 
 @router.delete("/{request_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(10)
 def delete_bank_request(request_id: int, db: Session = Depends(get_db), user=Depends(require_admin)):
     req = db.query(BankRequests).filter(BankRequests.id == request_id).first()
     if not req:
         raise HTTPException(404, "Bank request not found")
     db.delete(req)
     db.commit()
+
+@router.post("/import", response_model=BulkImportResult)
+def import_bank_requests(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = Query(None),
+    all_or_nothing: bool = Query(False),
+    db: Session = Depends(get_db),
+    user=Depends(require_hr),
+):
+    rows = read_import_rows(file.file.read(), import_format(file.filename, file.content_type, format))
+    return import_requests(db, BankRequests, BankRequestCreate, rows, all_or_nothing)
+
+@router.post("/bulk_status", response_model=BulkStatusResult)
+def bulk_update_bank_request_status(
+    transition: BulkStatusUpdate,
+    db: Session = Depends(get_db),
+    user=Depends(require_hr),
+):
+    if transition.ids is not None:
+        return bulk_update_status(db, BankRequests, transition.status, ids=transition.ids)
+    filters = RequestFilters(**transition.filter.model_dump())
+    return bulk_update_status(db, BankRequests, transition.status, clauses=filters.clauses(BankRequests))
@@ -0,0 +1,48 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy.orm import Session
+
+from aggregates import summary
+from database import get_db
+from model import REQUEST_TYPES, Employee
+from schemas import DashboardBucket
+from auth.dependencies import require_hr
+from response_cache import CachedResponse, CachedRoute
+from metrics import query_budget
+from serialization import ListSerializer
+from versions import ConditionalGet
+
+router = APIRouter(prefix="/dashboard", tags=["Dashboard"], route_class=CachedRoute)
+# The counts move with request writes and employee department changes
+summary_etag = ConditionalGet(
+    Employee.__tablename__, *(model.__tablename__ for _, model in REQUEST_TYPES)
+)
+summary_cache = CachedResponse(
+    Employee.__tablename__, *(model.__tablename__ for _, model in REQUEST_TYPES)
+)
+summary_serializer = ListSerializer(DashboardBucket)
+
+
+# Request counts by type x status x department, read from the aggregate table
+@router.get("/summary", response_model=List[DashboardBucket])
+@query_budget(4)
+def read_dashboard_summary(
+    response: Response,
+    db: Session = Depends(get_db),
+    user=Depends(require_hr),
+    cached=Depends(summary_cache),
+    etag=Depends(summary_etag),
+):
+    return summary_serializer.response(
+        [
+            {
+                "request_type": row.request_type,
+                "status": row.status or None,
+                "department": row.department or None,
+                "count": row.count,
+            }
+            for row in summary(db)
+        ],
+        response,
+    )
@@ -1,25 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional
 from database import get_db
 from model import DBSChecks
-from schemas import DBSCheckCreate, DBSCheckUpdate, DBSCheckOut
+from functions_crud import (
+    bulk_update_status,
+    import_format,
+    import_requests,
+    read_import_rows,
+)
+from pagination import PageParams, RequestFilters, paginate
+from schemas import (
+    DBSCheckCreate,
+    DBSCheckUpdate,
+    DBSCheckOut,
+    BulkImportResult,
+    BulkStatusUpdate,
+    BulkStatusResult,
+)
 from auth.dependencies import get_current_user, require_hr, require_admin
+from response_cache import CachedResponse, CachedRoute
+from metrics import query_budget
+from serialization import Fieldset, Selection
+from versions import ConditionalGet
 
-router = APIRouter(prefix="/dbs_checks", tags=["DBS Checks"])
+router = APIRouter(prefix="/dbs_checks", tags=["DBS Checks"], route_class=CachedRoute)
+dbs_checks_list_cache = CachedResponse(DBSChecks.__tablename__)
+dbs_checks_detail_cache = CachedResponse(DBSChecks.__tablename__ + ":{check_id}")
+dbs_checks_etag = ConditionalGet(DBSChecks.__tablename__)
+dbs_checks_fields = Fieldset(DBSCheckOut)
 
 @router.get("/", response_model=List[DBSCheckOut])
-def read_dbs_checks(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    return db.query(DBSChecks).all()
+@query_budget(4)
+def read_dbs_checks(
+    response: Response,
+    page: PageParams = Depends(),
+    filters: RequestFilters = Depends(),
+    selection: Selection = Depends(dbs_checks_fields),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+    cached=Depends(dbs_checks_list_cache),
+    etag=Depends(dbs_checks_etag),
+):
+    query = filters.apply(db.query(*selection.columns(DBSChecks)), DBSChecks)
+    return selection.response(paginate(query, DBSChecks, page, response), response)
 
 @router.get("/{check_id}", response_model=DBSCheckOut)
-def read_dbs_check(check_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    check = db.query(DBSChecks).filter(DBSChecks.id == check_id).first()
+@query_budget(4)
+def read_dbs_check(
+    check_id: int,
+    response: Response,
+    selection: Selection = Depends(dbs_checks_fields),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+    cached=Depends(dbs_checks_detail_cache),
+    etag=Depends(dbs_checks_etag),
+):
+    check = db.query(*selection.columns(DBSChecks)).filter(DBSChecks.id == check_id).first()
     if not check:
         raise HTTPException(404, "DBS check not found")
-    return check
+    return selection.item_response(check, response)
 
 @router.post("/", response_model=DBSCheckOut)
+@query_budget(9)
 def create_dbs_check(check: DBSCheckCreate, db: Session = Depends(get_db), user=Depends(require_hr)):
     new_check = DBSChecks(**check.dict())
     db.add(new_check)
@@ -28,6 +71,7 @@ def create_dbs_check(check: DBSCheckCreate, db: Session = Depends(get_db), user=
     return new_check
 
 @router.put("/{check_id}", response_model=DBSCheckOut)
+@query_budget(11)
 def update_dbs_check(check_id: int, update_data: DBSCheckUpdate, db: Session = Depends(get_db), user=Depends(require_hr)):
     check = db.query(DBSChecks).filter(DBSChecks.id == check_id).first()
     if not check:
@@ -39,9 +83,32 @@ def update_dbs_check(check_id: int, update_data: DBSCheckUpdate, db: Session = D
     return check
 
 @router.delete("/{check_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(10)
 def delete_dbs_check(check_id: int, db: Session = Depends(get_db), user=Depends(require_admin)):
     check = db.query(DBSChecks).filter(DBSChecks.id == check_id).first()
     if not check:
         raise HTTPException(404, "DBS check not found")
     db.delete(check)
     db.commit()
+
+@router.post("/import", response_model=BulkImportResult)
+def import_dbs_checks(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = Query(None),
+    all_or_nothing: bool = Query(False),
+    db: Session = Depends(get_db),
+    user=Depends(require_hr),
+):
+    rows = read_import_rows(file.file.read(), import_format(file.filename, file.content_type, format))
+    return import_requests(db, DBSChecks, DBSCheckCreate, rows, all_or_nothing)
+
+@router.post("/bulk_status", response_model=BulkStatusResult)
+def bulk_update_dbs_check_status(
+    transition: BulkStatusUpdate,
+    db: Session = Depends(get_db),
+    user=Depends(require_hr),
+):
+    if transition.ids is not None:
+        return bulk_update_status(db, DBSChecks, transition.status, ids=transition.ids)
+    filters = RequestFilters(**transition.filter.model_dump())
+    return bulk_update_status(db, DBSChecks, transition.status, clauses=filters.clauses(DBSChecks))
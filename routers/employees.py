@@ -1,59 +1,179 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
-from typing import List
+import csv
+import io
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import List, Literal
 from database import get_db
 from model import Employee
+from functions_crud import (
+    EMPLOYEE_COLUMNS,
+    STATUS_SOURCES,
+    get_request_statuses,
+    iter_employees_with_statuses,
+)
+from pagination import NEXT_CURSOR_HEADER, CursorPageParams, PageParams, encode_cursor, paginate
 from schemas import EmployeeCreate, EmployeeUpdate, EmployeeOut
 from auth.dependencies import get_current_user, require_hr, require_admin
-
-router = APIRouter(prefix="/employees", tags=["Employees"])
+from response_cache import CachedResponse, CachedRoute
+from metrics import query_budget
+from search import search_employees
+from serialization import FieldsetWithIncludes, Selection
+from versions import ConditionalGet
+
+router = APIRouter(prefix="/employees", tags=["Employees"], route_class=CachedRoute)
+# Employee responses embed request statuses, so they change with those tables too
+employees_etag = ConditionalGet(
+    Employee.__tablename__, *(model.__tablename__ for _, model in STATUS_SOURCES)
+)
+employees_list_cache = CachedResponse(
+    Employee.__tablename__, *(model.__tablename__ for _, model in STATUS_SOURCES)
+)
+# Request writes also invalidate "employees:<employee_id>"
+employee_detail_cache = CachedResponse(Employee.__tablename__ + ":{employee_id}")
+employee_fields = FieldsetWithIncludes(EmployeeOut, [field for field, _ in STATUS_SOURCES])
 
 
 @router.get("/", response_model=List[EmployeeOut])
-def read_employees(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    employees = (
-        db.query(Employee)
-        .options(
-            joinedload(Employee.bank_requests),
-            joinedload(Employee.dbs_checks),
-            joinedload(Employee.home_office_requests),
+@query_budget(5)
+def read_employees(
+    response: Response,
+    page: PageParams = Depends(),
+    selection: Selection = Depends(employee_fields),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+    cached=Depends(employees_list_cache),
+    etag=Depends(employees_etag),
+):
+    employees = paginate(db.query(*selection.columns(Employee)), Employee, page, response)
+    statuses = get_request_statuses(db, [emp.id for emp in employees], selection.includes)
+    return selection.response(
+        [{**emp._asdict(), **statuses[emp.id]} for emp in employees], response
+    )
+
+
+EXPORT_FIELDS = [column.key for column in EMPLOYEE_COLUMNS] + [
+    field for field, _ in STATUS_SOURCES
+]
+
+
+def _export_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, default=str) + "\n"
+
+
+def _export_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    # Sent before the first query, and even when there are no employees
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for row in rows:
+        for field, _ in STATUS_SOURCES:
+            row[field] = ";".join(row[field])
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+@router.get("/export")
+def export_employees(
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    db: Session = Depends(get_db),
+    user=Depends(require_hr),
+):
+    def rows():
+        try:
+            yield from iter_employees_with_statuses(db)
+        finally:
+            db.close()
+
+    if format == "csv":
+        return StreamingResponse(
+            _export_csv(rows()),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="employees.csv"'},
         )
-        .all()
+    return StreamingResponse(_export_ndjson(rows()), media_type="application/x-ndjson")
+
+
+# Ranked prefix/substring/fuzzy search over names, email, NI number and
+# department (see search.py). Declared before /{employee_id}, which would
+# otherwise take "search" for an id.
+@router.get("/search", response_model=List[EmployeeOut])
+@query_budget(7)
+def read_employee_search(
+    response: Response,
+    q: str = Query(..., min_length=2, max_length=100),
+    page: CursorPageParams = Depends(),
+    selection: Selection = Depends(employee_fields),
+    db: Session = Depends(get_db),
+    user=Depends(require_hr),
+    cached=Depends(employees_list_cache),
+    etag=Depends(employees_etag),
+):
+    after = _search_cursor(page.after) if page.after is not None else None
+    matches = search_employees(db, q, page.limit + 1, after)
+    if len(matches) > page.limit:
+        matches = matches[: page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(matches[-1])
+    ids = [employee_id for _, employee_id in matches]
+    if not ids:
+        return selection.response([], response)
+    query = db.query(*selection.columns(Employee)).filter(Employee.id.in_(ids))
+    rows = {row.id: row for row in query}
+    statuses = get_request_statuses(db, ids, selection.includes)
+    return selection.response(
+        [{**rows[id_]._asdict(), **statuses[id_]} for id_ in ids if id_ in rows], response
     )
-    return [EmployeeOut.from_orm_with_status(emp) for emp in employees]
+
+
+def _search_cursor(values):
+    try:
+        score, employee_id = values
+        return float(score), int(employee_id)
+    except (TypeError, ValueError):
+        raise HTTPException(400, "Invalid cursor")
 
 
 @router.get("/{employee_id}", response_model=EmployeeOut)
+@query_budget(5)
 def read_employee(
-    employee_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)
+    employee_id: int,
+    response: Response,
+    selection: Selection = Depends(employee_fields),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+    cached=Depends(employee_detail_cache),
+    etag=Depends(employees_etag),
 ):
-    employee = (
-        db.query(Employee)
-        .options(
-            joinedload(Employee.bank_requests),
-            joinedload(Employee.dbs_checks),
-            joinedload(Employee.home_office_requests),
-        )
-        .filter(Employee.id == employee_id)
-        .first()
-    )
+    employee = db.query(*selection.columns(Employee)).filter(Employee.id == employee_id).first()
 
     if not employee:
         raise HTTPException(404, "Employee not found")
 
-    return EmployeeOut.from_orm_with_status(employee)
+    statuses = get_request_statuses(db, [employee.id], selection.includes)
+    return selection.item_response({**employee._asdict(), **statuses[employee.id]}, response)
 
 
 @router.post("/", response_model=EmployeeOut)
+@query_budget(9)
 def create_employee(employee: EmployeeCreate, db: Session = Depends(get_db)):
     new_employee = Employee(**employee.model_dump())
     db.add(new_employee)
     db.commit()
     db.refresh(new_employee)
-    return EmployeeOut.from_orm_with_status(new_employee)
+    # A new employee has no requests yet, so there is nothing to load
+    statuses = {field: [] for field, _ in STATUS_SOURCES}
+    return EmployeeOut.from_orm_with_status(new_employee, statuses)
 
 
 @router.put("/{employee_id}", response_model=EmployeeOut)
+@query_budget(12)
 def update_employee(
     employee_id: int,
     employee_update: EmployeeUpdate,
@@ -69,10 +189,14 @@ def update_employee(
 
     db.commit()
     db.refresh(employee)
-    return EmployeeOut.from_orm_with_status(employee)
+    statuses = get_request_statuses(db, [employee.id])
+    return EmployeeOut.from_orm_with_status(employee, statuses[employee.id])
 
 
+# Up to 17 for an employee with requests of every type: each request table's
+# rows are loaded and unlinked from the employee
 @router.delete("/{employee_id}", response_model=str)
+@query_budget(17)
 def delete_employee(
     employee_id: int, db: Session = Depends(get_db), user=Depends(require_admin)
 ):
@@ -0,0 +1,238 @@
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+    WebSocketException,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import HTTPConnection, Request
+
+from database import get_db
+from model import Employee
+from auth.dependencies import (
+    bearer_token,
+    get_current_user,
+    principal_for_token,
+    security,
+    token_lifetime,
+)
+from auth.identity_cache import Principal, token_revocations
+from auth.stream_tickets import STREAM_TICKET_SECONDS, StreamGrant, issue_ticket, redeem_ticket
+from events import EVENTS_HEARTBEAT_SECONDS, change_broker
+from metrics import TimedRoute, query_budget
+
+router = APIRouter(prefix="/events", tags=["Events"], route_class=TimedRoute)
+
+KEEPALIVE, EXPIRED = object(), object()
+
+
+def _grant(principal: Principal, token: str, db: Session) -> StreamGrant:
+    """The caller's audience: HR and admins see every change, everyone else the
+    changes to their own employee record and requests."""
+    everything = principal.is_hr or principal.is_admin
+    employee_id = None
+    if not everything:
+        employee_id = db.scalar(select(Employee.id).where(Employee.user_id == principal.id))
+    authorised_at, expires_at = token_lifetime(token)
+    return StreamGrant(
+        principal.id, principal.role_id, employee_id, everything, authorised_at, expires_at
+    )
+
+
+def _invalid_ticket():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired stream ticket",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def _authorise(connection: HTTPConnection, db: Session) -> StreamGrant:
+    """The grant of a stream opened with an Authorization header or a ?ticket=."""
+
+    def resolve():
+        try:
+            token = bearer_token(connection)
+            if token is not None:
+                return _grant(principal_for_token(token, db), token, db)
+            ticket = connection.query_params.get("ticket")
+            grant = redeem_ticket(db, ticket) if ticket else None
+            if grant is None:
+                raise _invalid_ticket()
+            token_revocations.refresh(db)
+            return grant
+        finally:
+            # Hand the connection back now: a stream can stay open for hours
+            db.close()
+
+    grant = await run_in_threadpool(resolve)
+    if not still_authorised(grant):
+        raise _invalid_ticket()
+    return grant
+
+
+def still_authorised(grant: StreamGrant) -> bool:
+    """False once the grant's token has expired or its caller's account or role changed."""
+    return time.time() < grant.token_expires_at and not token_revocations.is_revoked(
+        grant.user_id, grant.role_id, grant.authorised_at
+    )
+
+
+# One stream at a time reloads the revocation marks; the others skip
+_refreshing_revocations = threading.Lock()
+
+
+def _refresh_revocations(db: Session):
+    if not _refreshing_revocations.acquire(blocking=False):
+        return
+    try:
+        token_revocations.refresh(db)
+    finally:
+        db.close()
+        _refreshing_revocations.release()
+
+
+async def next_message(subscriber, grant: StreamGrant, db: Optional[Session], heartbeat: float):
+    """The subscriber's next message, KEEPALIVE after `heartbeat` idle seconds,
+    None when the broker ends the stream, or EXPIRED once the grant no longer
+    holds. Revocation marks are reloaded with `db` when they are due."""
+    try:
+        message = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+    except asyncio.TimeoutError:
+        message = KEEPALIVE
+    if message is None:
+        return None
+    if db is not None and token_revocations.needs_refresh():
+        await run_in_threadpool(_refresh_revocations, db)
+    return message if still_authorised(grant) else EXPIRED
+
+
+async def sse_messages(
+    subscriber,
+    grant: StreamGrant,
+    db: Optional[Session] = None,
+    heartbeat: float = EVENTS_HEARTBEAT_SECONDS,
+):
+    while True:
+        message = await next_message(subscriber, grant, db, heartbeat)
+        if message is KEEPALIVE:
+            # Keeps proxies from closing an idle stream
+            yield ": keepalive\n\n"
+            continue
+        if message is EXPIRED:
+            # Not a plain close, which EventSource would retry with the spent ticket
+            yield "event: expired\ndata: {}\n\n"
+            return
+        if message is None:
+            return
+        seq, data = message
+        yield f"id: {seq}\nevent: changes\ndata: {data}\n\n"
+
+
+# Clients that cannot set an Authorization header (EventSource, browser
+# WebSockets) exchange their token here for a ticket, then connect with ?ticket=.
+@router.post("/ticket")
+@query_budget(4)
+def stream_ticket(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    grant = _grant(current_user, credentials.credentials, db)
+    return {"ticket": issue_ticket(db, grant), "expires_in": STREAM_TICKET_SECONDS}
+
+
+# Server-sent events: one "changes" event per committed transaction, with the
+# batch number as its id so EventSource resumes from Last-Event-ID on reconnect.
+# An "expired" event ends the stream when its token expires or its caller's
+# account or role changes; reconnect with a new ticket.
+@router.get("/stream")
+async def stream_changes(
+    request: Request,
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID"),
+    db: Session = Depends(get_db),
+):
+    grant = await _authorise(request, db)
+    subscriber = change_broker.subscribe(grant.employee_id, grant.everything, last_event_id)
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many event subscribers")
+    return StreamingResponse(
+        sse_messages(subscriber, grant, db),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Runs however the stream ends, client disconnects included
+        background=BackgroundTask(change_broker.unsubscribe, subscriber),
+    )
+
+
+async def _send_changes(websocket: WebSocket, subscriber, grant: StreamGrant, db: Session):
+    try:
+        while True:
+            message = await next_message(subscriber, grant, db, EVENTS_HEARTBEAT_SECONDS)
+            if message is KEEPALIVE:
+                continue
+            if message is EXPIRED:
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="expired")
+                return
+            if message is None:
+                await websocket.close(code=status.WS_1001_GOING_AWAY)
+                return
+            seq, data = message
+            # Splice the id into the batch JSON the broker encoded once for everyone
+            await websocket.send_text(f'{{"id":{seq},{data[1:]}')
+    except WebSocketDisconnect:
+        pass
+
+
+async def _receive_until_closed(websocket: WebSocket):
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+
+# The same batches over a WebSocket, as {"id": ..., "events": [...]} messages.
+# Messages from the client are ignored. The socket is closed with 1008 when its
+# token expires or its caller's account or role changes.
+@router.websocket("/ws")
+async def websocket_changes(
+    websocket: WebSocket,
+    last_event_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db),
+):
+    try:
+        grant = await _authorise(websocket, db)
+    except HTTPException:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION)
+    subscriber = change_broker.subscribe(grant.employee_id, grant.everything, last_event_id)
+    if subscriber is None:
+        raise WebSocketException(code=status.WS_1013_TRY_AGAIN_LATER)
+    try:
+        await websocket.accept()
+        tasks = [
+            asyncio.create_task(_send_changes(websocket, subscriber, grant, db)),
+            asyncio.create_task(_receive_until_closed(websocket)),
+        ]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            task.result()
+    finally:
+        change_broker.unsubscribe(subscriber)
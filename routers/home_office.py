@@ -1,40 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional
 from database import get_db
 from model import HomeOfficeRequests
+from functions_crud import (
+    bulk_update_status,
+    import_format,
+    import_requests,
+    read_import_rows,
+)
+from pagination import PageParams, RequestFilters, paginate
 from schemas import (
     HomeOfficeRequestCreate,
     HomeOfficeRequestUpdate,
     HomeOfficeRequestOut,
+    BulkImportResult,
+    BulkStatusUpdate,
+    BulkStatusResult,
 )
 from auth.dependencies import get_current_user, require_hr, require_admin
+from response_cache import CachedResponse, CachedRoute
+from metrics import query_budget
+from serialization import Fieldset, Selection
+from versions import ConditionalGet
 
-router = APIRouter(prefix="/home_office_requests", tags=["Home Office Requests"])
+router = APIRouter(prefix="/home_office_requests", tags=["Home Office Requests"], route_class=CachedRoute)
+home_office_list_cache = CachedResponse(HomeOfficeRequests.__tablename__)
+home_office_detail_cache = CachedResponse(HomeOfficeRequests.__tablename__ + ":{request_id}")
+home_office_etag = ConditionalGet(HomeOfficeRequests.__tablename__)
+home_office_fields = Fieldset(HomeOfficeRequestOut)
 
 
 @router.get("/", response_model=List[HomeOfficeRequestOut])
+@query_budget(4)
 def read_home_office_requests(
-    db: Session = Depends(get_db), user=Depends(get_current_user)
+    response: Response,
+    page: PageParams = Depends(),
+    filters: RequestFilters = Depends(),
+    selection: Selection = Depends(home_office_fields),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+    cached=Depends(home_office_list_cache),
+    etag=Depends(home_office_etag),
 ):
-    return db.query(HomeOfficeRequestOut).all()
+    query = filters.apply(db.query(*selection.columns(HomeOfficeRequests)), HomeOfficeRequests)
+    return selection.response(paginate(query, HomeOfficeRequests, page, response), response)
 
 
 @router.get("/{request_id}", response_model=HomeOfficeRequestOut)
+@query_budget(4)
 def read_home_office_request(
-    request_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)
+    request_id: int,
+    response: Response,
+    selection: Selection = Depends(home_office_fields),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+    cached=Depends(home_office_detail_cache),
+    etag=Depends(home_office_etag),
 ):
     req = (
-        db.query(HomeOfficeRequestOut)
-        .filter(HomeOfficeRequestOut.id == request_id)
+        db.query(*selection.columns(HomeOfficeRequests))
+        .filter(HomeOfficeRequests.id == request_id)
         .first()
     )
     if not req:
         raise HTTPException(404, "Home Office request not found")
-    return req
+    return selection.item_response(req, response)
 
 
 @router.post("/", response_model=HomeOfficeRequestOut)
+@query_budget(9)
 def create_home_office_request(
     request: HomeOfficeRequestCreate,
     db: Session = Depends(get_db),
@@ -48,6 +83,7 @@ def create_home_office_request(
 
 
 @router.put("/{request_id}", response_model=HomeOfficeRequestOut)
+@query_budget(11)
 def update_home_office_request(
     request_id: int,
     update_data: HomeOfficeRequestUpdate,
@@ -67,6 +103,7 @@ def update_home_office_request(
 
 
 @router.delete("/{request_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(10)
 def delete_home_office_request(
     request_id: int, db: Session = Depends(get_db), user=Depends(require_admin)
 ):
@@ -77,3 +114,26 @@ def delete_home_office_request(
         raise HTTPException(404, "Home Office request not found")
     db.delete(req)
     db.commit()
+
+
+@router.post("/import", response_model=BulkImportResult)
+def import_home_office_requests(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = Query(None),
+    all_or_nothing: bool = Query(False),
+    db: Session = Depends(get_db),
+    user=Depends(require_hr),
+):
+    rows = read_import_rows(file.file.read(), import_format(file.filename, file.content_type, format))
+    return import_requests(db, HomeOfficeRequests, HomeOfficeRequestCreate, rows, all_or_nothing)
+
+@router.post("/bulk_status", response_model=BulkStatusResult)
+def bulk_update_home_office_request_status(
+    transition: BulkStatusUpdate,
+    db: Session = Depends(get_db),
+    user=Depends(require_hr),
+):
+    if transition.ids is not None:
+        return bulk_update_status(db, HomeOfficeRequests, transition.status, ids=transition.ids)
+    filters = RequestFilters(**transition.filter.model_dump())
+    return bulk_update_status(db, HomeOfficeRequests, transition.status, clauses=filters.clauses(HomeOfficeRequests))
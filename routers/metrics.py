@@ -0,0 +1,22 @@
+import secrets
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from metrics import METRICS_PUBLIC, METRICS_TOKEN, route_metrics
+
+router = APIRouter(tags=["Monitoring"])
+
+
+# Prometheus text exposition; scrapers authenticate with METRICS_TOKEN. With no
+# token configured the endpoint stays closed unless METRICS_PUBLIC opts in.
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics(authorization: str = Header(default="")):
+    if METRICS_TOKEN:
+        if not secrets.compare_digest(authorization, f"Bearer {METRICS_TOKEN}"):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    elif not METRICS_PUBLIC:
+        raise HTTPException(
+            status_code=403, detail="Set METRICS_TOKEN (or METRICS_PUBLIC=true) to serve metrics"
+        )
+    return PlainTextResponse(route_metrics.render(), media_type="text/plain; version=0.0.4")
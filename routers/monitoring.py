@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, Request
+
+from audit import audit_writer
+from auth.dependencies import require_admin
+from database import pool_status
+from events import change_broker
+from auth.hashing import password_hasher
+from auth.identity_cache import identity_cache, token_revocations
+from response_cache import response_cache
+from metrics import TimedRoute
+from slow_queries import slow_query_log
+
+router = APIRouter(prefix="/monitoring", tags=["Monitoring"], route_class=TimedRoute)
+
+
+@router.get("/identity_cache")
+def read_identity_cache_stats(user=Depends(require_admin)):
+    return {**identity_cache.stats(), "revocations": token_revocations.stats()}
+
+
+@router.get("/password_hashing")
+def read_password_hashing_stats(user=Depends(require_admin)):
+    return password_hasher.stats()
+
+
+@router.get("/response_cache")
+def read_response_cache_stats(user=Depends(require_admin)):
+    return response_cache.stats()
+
+
+@router.get("/slow_queries")
+def read_slow_queries(user=Depends(require_admin)):
+    return slow_query_log.stats()
+
+
+@router.get("/audit_log")
+def read_audit_log_stats(user=Depends(require_admin)):
+    return audit_writer.stats()
+
+
+@router.get("/events")
+def read_event_stream_stats(user=Depends(require_admin)):
+    return change_broker.stats()
+
+
+@router.get("/pool")
+async def read_pool_stats(user=Depends(require_admin)):
+    return await pool_status()
+
+
+@router.get("/startup")
+def read_startup_timing(request: Request, user=Depends(require_admin)):
+    return getattr(request.app.state, "startup", {})
@@ -0,0 +1,58 @@
+from datetime import date
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session
+
+from database import get_db
+from functions_crud import request_queue_query
+from model import REQUEST_TYPES
+from pagination import NEXT_CURSOR_HEADER, CursorPageParams, RequestFilters, encode_cursor
+from schemas import RequestQueueItem
+from auth.dependencies import require_hr
+from response_cache import CachedResponse, CachedRoute
+from metrics import query_budget
+from serialization import ListSerializer
+from versions import ConditionalGet
+
+router = APIRouter(prefix="/requests", tags=["Request Queue"], route_class=CachedRoute)
+queue_cache = CachedResponse(*(model.__tablename__ for _, model in REQUEST_TYPES))
+queue_serializer = ListSerializer(RequestQueueItem)
+queue_etag = ConditionalGet(*(model.__tablename__ for _, model in REQUEST_TYPES))
+
+
+# Bank, DBS and Home Office requests as one stream, oldest request_date first
+@router.get("/queue", response_model=List[RequestQueueItem])
+@query_budget(4)
+def read_request_queue(
+    response: Response,
+    page: CursorPageParams = Depends(),
+    filters: RequestFilters = Depends(),
+    request_type: Optional[List[Literal["bank_request", "dbs_check", "home_office_request"]]] = Query(None),
+    db: Session = Depends(get_db),
+    user=Depends(require_hr),
+    cached=Depends(queue_cache),
+    etag=Depends(queue_etag),
+):
+    after = _queue_cursor(page.after) if page.after is not None else None
+    stmt = request_queue_query(filters, page.limit + 1, after, request_type)
+    rows = db.execute(stmt).all()
+    if len(rows) > page.limit:
+        rows = rows[: page.limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            [last.request_date, last.request_type, last.id]
+        )
+    return queue_serializer.response(rows, response)
+
+
+def _queue_cursor(values):
+    try:
+        request_date, request_type, request_id = values
+        return (
+            date.fromisoformat(request_date) if request_date is not None else None,
+            str(request_type),
+            int(request_id),
+        )
+    except (TypeError, ValueError):
+        raise HTTPException(400, "Invalid cursor")
@@ -0,0 +1,115 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from database import get_db
+from changelog import MODEL_OF_TYPE, latest_revision_query, visible_revisions
+from functions_crud import EMPLOYEE_COLUMNS
+from model import REQUEST_TYPES, ChangeLog
+from pagination import NEXT_CURSOR_HEADER, CursorPageParams, encode_cursor
+from schemas import SyncChange
+from auth.dependencies import require_hr
+from metrics import TimedRoute, query_budget
+from serialization import ListSerializer
+from versions import ConditionalGet
+
+router = APIRouter(prefix="/sync", tags=["Sync"], route_class=TimedRoute)
+change_serializer = ListSerializer(SyncChange)
+
+
+class ChangesConditionalGet(ConditionalGet):
+    """ETag from the latest visible revision rather than a table version: on
+    PostgreSQL a commit can become visible to sync after it was made, when an
+    older transaction ends. Any change that becomes visible raises it."""
+
+    def __call__(self, request: Request, response: Response, db: Session = Depends(get_db)):
+        latest = db.scalar(latest_revision_query(db)) or 0
+        self.check(request, response, {ChangeLog.__tablename__: latest})
+
+
+changes_etag = ChangesConditionalGet(ChangeLog.__tablename__)
+
+# What the list endpoints return for each type. Employees come without their
+# request statuses: the request changes carry those.
+SYNC_COLUMNS = {
+    "employee": EMPLOYEE_COLUMNS,
+    **{request_type: tuple(model.__table__.columns) for request_type, model in REQUEST_TYPES},
+}
+
+
+# Employees and requests created, updated or deleted after revision `since`,
+# oldest change first, each row once at its latest revision. Page through with
+# `after` and X-Next-Cursor, keeping `since`; once there is no next page, the
+# highest revision received is the `since` for the next sync.
+@router.get("/changes", response_model=List[SyncChange])
+@query_budget(6)
+def read_changes(
+    response: Response,
+    since: int = Query(0, ge=0),
+    page: CursorPageParams = Depends(),
+    db: Session = Depends(get_db),
+    user=Depends(require_hr),
+    etag=Depends(changes_etag),
+):
+    stmt = select(
+        ChangeLog.revision, ChangeLog.entity_type, ChangeLog.entity_id, ChangeLog.deleted
+    ).where(ChangeLog.revision > since, visible_revisions(db))
+    if page.after is not None:
+        stmt = stmt.where(_changes_after(*_changes_cursor(page.after)))
+    stmt = stmt.order_by(ChangeLog.revision, ChangeLog.entity_type, ChangeLog.entity_id)
+    log = db.execute(stmt.limit(page.limit + 1)).all()
+    if len(log) > page.limit:
+        log = log[: page.limit]
+        last = log[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            [last.revision, last.entity_type, last.entity_id]
+        )
+
+    ids = {}
+    for entry in log:
+        if not entry.deleted:
+            ids.setdefault(entry.entity_type, []).append(entry.entity_id)
+    rows = {}
+    for entity_type, type_ids in ids.items():
+        model = MODEL_OF_TYPE[entity_type]
+        for row in db.execute(select(*SYNC_COLUMNS[entity_type]).where(model.id.in_(type_ids))):
+            rows[(entity_type, row.id)] = row._asdict()
+
+    changes = []
+    for revision, entity_type, entity_id, deleted in log:
+        # A row deleted since its entry was read has a tombstone further on
+        data = None if deleted else rows.get((entity_type, entity_id))
+        changes.append(
+            {
+                "revision": revision,
+                "type": entity_type,
+                "id": entity_id,
+                "deleted": data is None,
+                "data": data,
+            }
+        )
+    return change_serializer.response(changes, response)
+
+
+def _changes_after(revision, entity_type, entity_id):
+    # (revision, entity_type, entity_id) > the cursor
+    return or_(
+        ChangeLog.revision > revision,
+        and_(
+            ChangeLog.revision == revision,
+            or_(
+                ChangeLog.entity_type > entity_type,
+                and_(ChangeLog.entity_type == entity_type, ChangeLog.entity_id > entity_id),
+            ),
+        ),
+    )
+
+
+def _changes_cursor(values):
+    try:
+        revision, entity_type, entity_id = values
+        return int(revision), str(entity_type), int(entity_id)
+    except (TypeError, ValueError):
+        raise HTTPException(400, "Invalid cursor")
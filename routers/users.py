@@ -7,9 +7,11 @@ from pydantic import BaseModel
 from database import get_db
 from schemas import UserCreate, UserOut, RoleOut
 from functions_crud import create_user, get_user_by_username
-from auth.auth import authenticate_user, create_access_token
+from auth.auth import authenticate_user_async, create_access_token, principal_claims
+from auth.hashing import HashingOverloaded
+from metrics import TimedRoute, query_budget
 
-router = APIRouter(prefix="/users", tags=["Users"])
+router = APIRouter(prefix="/users", tags=["Users"], route_class=TimedRoute)
 
 #  Corrected: Define TokenWithUser with proper Pydantic model
 class TokenWithUser(BaseModel):
@@ -20,20 +22,37 @@ class TokenWithUser(BaseModel):
 
 #  Registration endpoint
 @router.post("/register", response_model=UserOut)
+@query_budget(10)
 def register_user(user: UserCreate, db: Session = Depends(get_db)):
     db_user = get_user_by_username(db, user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    return create_user(db, user)
+    try:
+        return create_user(db, user)
+    except HashingOverloaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many registrations in progress, please retry",
+            headers={"Retry-After": "1"},
+        )
 
 
 # Login endpoint returning JWT + user data
+# Login runs on the event loop so that bcrypt waits in the hashing pool, not in a worker thread
 @router.post("/login", response_model=TokenWithUser)
-def login_user(
+@query_budget(1)
+async def login_user(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    try:
+        user = await authenticate_user_async(db, form_data.username, form_data.password)
+    except HashingOverloaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins in progress, please retry",
+            headers={"Retry-After": "1"},
+        )
     if not user:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
 
@@ -45,7 +64,7 @@ def login_user(
         scopes.append(user.role.role_name)
 
     access_token = create_access_token(
-        data={"sub": user.username},
+        data={"sub": user.username, **principal_claims(user)},
         expires_delta=access_token_expires,
         scopes=scopes
     )
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr, field_validator
-from typing import Optional, List
-from datetime import date
+from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
+from typing import Any, Dict, Literal, Optional, List
+from datetime import date, datetime
 from re import search
 from fastapi import HTTPException, status
 
@@ -192,29 +192,31 @@ class EmployeeOut(EmployeeBase):
     home_office_request_statuses: Optional[List[str]] = None
 
     @staticmethod
-    def from_orm_with_status(employee):
-        # Extract statuses from bank requests, DBS checks, and home office requests
-        bank_statuses = [
-            req.status
-            for req in getattr(employee, "bank_requests", [])
-            if hasattr(req, "status") and req.status is not None
-        ]
-        dbs_statuses = [
-            req.status
-            for req in getattr(employee, "dbs_checks", [])
-            if hasattr(req, "status") and req.status is not None
-        ]
-        home_office_statuses = [
-            req.status
-            for req in getattr(employee, "home_office_requests", [])
-            if hasattr(req, "status") and req.status is not None
-        ]
+    def from_orm_with_status(employee, statuses=None):
+        # Statuses normally come pre-loaded from functions_crud.get_request_statuses;
+        # otherwise fall back to the employee's relationship collections
+        if statuses is None:
+            statuses = {
+                "bank_request_statuses": [
+                    req.status
+                    for req in getattr(employee, "bank_requests", [])
+                    if hasattr(req, "status") and req.status is not None
+                ],
+                "dbs_check_statuses": [
+                    req.status
+                    for req in getattr(employee, "dbs_checks", [])
+                    if hasattr(req, "status") and req.status is not None
+                ],
+                "home_office_request_statuses": [
+                    req.status
+                    for req in getattr(employee, "home_office_requests", [])
+                    if hasattr(req, "status") and req.status is not None
+                ],
+            }
 
         # Validate and dump employee data
         data = EmployeeOut.model_validate(employee, from_attributes=True).model_dump()
-        data["bank_request_statuses"] = bank_statuses
-        data["dbs_check_statuses"] = dbs_statuses
-        data["home_office_request_statuses"] = home_office_statuses
+        data.update(statuses)
         return EmployeeOut(**data)
 
     class Config:
@@ -276,8 +278,8 @@ class HomeOfficeRequestOut(HomeOfficeRequestBase):
 # DBS Check schemas
 class DBSCheckBase(BaseModel):
     employee_id: int
-    check_date: Optional[date] = None
-    result: Optional[str] = None
+    request_date: Optional[date] = None
+    status: Optional[str] = None
     details: Optional[str] = None
 
 
@@ -296,6 +298,86 @@ class DBSCheckOut(DBSCheckBase):
         from_attributes = True
 
 
+# Request queue schemas
+class RequestQueueItem(BaseModel):
+    request_type: Literal["bank_request", "dbs_check", "home_office_request"]
+    id: int
+    employee_id: Optional[int] = None
+    request_date: Optional[date] = None
+    status: Optional[str] = None
+    details: Optional[str] = None
+
+
+# Dashboard schemas
+class DashboardBucket(BaseModel):
+    request_type: str
+    status: Optional[str] = None
+    department: Optional[str] = None
+    count: int
+
+
+# Bulk import schemas
+class BulkImportRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+
+class BulkImportResult(BaseModel):
+    inserted: int
+    errors: List[BulkImportRowError]
+
+
+# Bulk status transition schemas
+class RequestFilter(BaseModel):
+    status: Optional[str] = None
+    employee_id: Optional[int] = None
+    request_date_from: Optional[date] = None
+    request_date_to: Optional[date] = None
+
+
+class BulkStatusUpdate(BaseModel):
+    status: str
+    ids: Optional[List[int]] = Field(None, min_length=1, max_length=10000)
+    filter: Optional[RequestFilter] = None
+
+    @model_validator(mode="after")
+    def check_target(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("Provide either ids or filter")
+        if self.filter is not None and not self.filter.model_dump(exclude_none=True):
+            raise ValueError("filter needs at least one criterion")
+        return self
+
+
+class BulkStatusResult(BaseModel):
+    updated: int
+    updated_ids: List[int]
+    missing_ids: List[int]
+
+
+# Audit log schemas
+class AuditLogOut(BaseModel):
+    id: int
+    request_type: Literal["bank_request", "dbs_check", "home_office_request"]
+    request_id: int
+    employee_id: Optional[int] = None
+    old_status: Optional[str] = None
+    new_status: Optional[str] = None
+    changed_by: Optional[int] = None
+    changed_by_username: Optional[str] = None
+    changed_at: datetime
+
+
+# Delta sync schemas
+class SyncChange(BaseModel):
+    revision: int
+    type: Literal["employee", "bank_request", "dbs_check", "home_office_request"]
+    id: int
+    deleted: bool
+    # The row's current columns; None for a tombstone
+    data: Optional[Dict[str, Any]] = None
+
+
 # Auth schemas
 class Token(BaseModel):
     access_token: str
@@ -0,0 +1,407 @@
+"""Ranked employee search by name, email, NI number or department.
+
+Both backends score a match the same way:
+
+    1.0   a field equals the query
+    0.9   a field starts with it
+    0.8   a word in a field starts with it
+    0.6   the query appears anywhere
+    <0.5  fuzzy: half the word similarity of the query and the employee's
+          text, when that is at least SIMILARITY_THRESHOLD
+
+and order by score, then id. On PostgreSQL the work is done by the pg_trgm GIN
+index on model.search_document (LIKE '%q%' and the <% word-similarity
+operator). Elsewhere an in-process trigram index of the same text answers the
+query, with word similarity approximated as the share of the query's trigrams
+that the employee's text contains.
+
+That index is rebuilt when the employees table version (versions.py) changes,
+which takes a few seconds at 50k employees. Only the first build is waited
+for: later rebuilds run on a background thread while searches keep using the
+previous snapshot. Employees written through this worker are seen at once,
+since the session hooks below hand each commit's employee rows to the index,
+which scores them from those values until the rebuild that includes them;
+writes made through other workers are seen once the rebuild finishes.
+"""
+import logging
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from heapq import nsmallest
+from itertools import chain
+from math import ceil
+from typing import NamedTuple
+
+from sqlalchemy import Numeric, and_, case, cast, event, func, inspect, literal, or_, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import SingletonThreadPool, StaticPool
+
+from model import EMPLOYEE_SEARCH_COLUMNS, Employee, TableVersion, search_document
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_THRESHOLD = 0.6
+EXACT, PREFIX, WORD_PREFIX, SUBSTRING, FUZZY = 1.0, 0.9, 0.8, 0.6, 0.5
+
+
+def normalise(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def word_trigrams(text: str):
+    """pg_trgm-style trigrams: each word padded with two spaces before, one after."""
+    grams = set()
+    for word in _WORD.findall(text):
+        padded = f"  {word} "
+        grams.update([padded[i : i + 3] for i in range(len(padded) - 2)])
+    return grams
+
+
+def inner_trigrams(text: str):
+    """Trigrams inside the words of `text` (present wherever `text` is a substring)."""
+    grams = set()
+    for word in _WORD.findall(text):
+        grams.update([word[i : i + 3] for i in range(len(word) - 2)])
+    return grams
+
+
+def _prefixed(mapping, keys, query):
+    """Union of the id lists of the sorted `keys` that start with `query`."""
+    start = bisect_left(keys, query)
+    end = bisect_left(keys, query + "\U0010ffff", start)
+    if end - start == 1:
+        return mapping[keys[start]]
+    return set(chain.from_iterable(mapping[key] for key in keys[start:end]))
+
+
+class IndexData(NamedTuple):
+    documents: dict  # id -> search text, in id order
+    values: dict  # field value -> ids
+    value_keys: list  # sorted values
+    words: dict  # space-separated word of the search text -> ids
+    word_keys: list  # sorted words
+    postings: dict  # trigram -> ids
+    # id -> (stamp, lowercased fields, or None if deleted), for employees
+    # committed here since the rows above were read; replaced, never mutated
+    pending: dict = {}
+
+
+EMPTY = IndexData({}, {}, [], {}, [], {})
+
+
+def score_fields(query: str, fields):
+    """The score of one employee's lowercased search fields, or None if no match."""
+    document = " ".join(fields)
+    if query in fields:
+        return EXACT
+    if any(field.startswith(query) for field in fields):
+        return PREFIX
+    if f" {query}" in f" {document}":
+        return WORD_PREFIX
+    if query in document:
+        return SUBSTRING
+    grams = word_trigrams(query)
+    if grams:
+        shared = len(grams & word_trigrams(document))
+        if shared >= ceil(SIMILARITY_THRESHOLD * len(grams)):
+            return round(FUZZY * shared / len(grams), 4)
+    return None
+
+
+def _single_connection(bind) -> bool:
+    """Whether every session of `bind` shares one connection (in-memory SQLite)."""
+    return isinstance(bind.engine.pool, (StaticPool, SingletonThreadPool))
+
+
+class TrigramIndex:
+    """In-process index over the employee search columns.
+
+    Each match tier has its own lookup, so a page is found without scoring
+    every employee: field values give exact and prefix matches, the words of
+    the search text give word-prefix matches, and trigram postings narrow the
+    substring and fuzzy candidates. Id lists are in ascending id order, so a
+    substring scan stops as soon as the page is full.
+    """
+
+    def __init__(self):
+        self.version = None
+        # Swapped in as one, so searches never see half of a rebuild
+        self.data = EMPTY
+        # Guards swaps of self.data; _rebuild_lock lets one rebuild run at a time
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._thread = None
+        # Numbers the commits applied to data.pending
+        self._stamp = 0
+
+    def build(self, rows, version, stamp=None):
+        """Index `rows` of (id, *EMPLOYEE_SEARCH_COLUMNS) given in id order.
+
+        `stamp` is the last commit applied() before the rows were read: later
+        pending changes are kept. Without it the rows replace them all.
+        """
+        documents, values, words = {}, {}, {}
+        for employee_id, *fields in rows:
+            fields = [(value or "").lower() for value in fields]
+            document = documents[employee_id] = " ".join(fields)
+            for mapping, keys in ((values, fields), (words, document.split())):
+                for key in keys:
+                    ids = mapping.get(key)
+                    if ids is None:
+                        mapping[key] = array("i", (employee_id,))
+                    elif ids[-1] != employee_id:
+                        ids.append(employee_id)
+        values.pop("", None)
+
+        # Trigrams per distinct alphanumeric run, then merged per trigram
+        runs = {}
+        for word, ids in words.items():
+            for run in _WORD.findall(word):
+                runs.setdefault(run, []).append(ids)
+        lists = {}
+        for run, ids in runs.items():
+            padded = f"  {run} "
+            for gram in {padded[i : i + 3] for i in range(len(padded) - 2)}:
+                lists.setdefault(gram, []).extend(ids)
+        postings = {
+            gram: ids[0] if len(ids) == 1 else array("i", sorted(set(chain.from_iterable(ids))))
+            for gram, ids in lists.items()
+        }
+        value_keys, word_keys = sorted(values), sorted(words)
+        with self._lock:
+            pending = {}
+            if stamp is not None:
+                pending = {i: change for i, change in self.data.pending.items() if change[0] > stamp}
+            self.data = IndexData(documents, values, value_keys, words, word_keys, postings, pending)
+            self.version = version
+
+    def apply(self, changes):
+        """Search the committed {employee_id: fields, or None} as such until the next build."""
+        with self._lock:
+            self._stamp += 1
+            pending = dict(self.data.pending)
+            pending.update((i, (self._stamp, fields)) for i, fields in changes.items())
+            self.data = self.data._replace(pending=pending)
+
+    def clear(self):
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            self.version = None
+            self.data = EMPTY
+
+    def refresh(self, db: Session):
+        """Rebuild if the employees table changed since the last build.
+
+        Only the first build is waited for, or every build when the database
+        has a single shared connection that another thread cannot read on.
+        """
+        version = self._current_version(db)
+        if version == self.version:
+            return
+        bind = db.get_bind()
+        if self.version is not None and not _single_connection(bind):
+            if self._rebuild_lock.acquire(blocking=False):
+                self._thread = threading.Thread(
+                    target=self._rebuild, args=(bind,), name="trigram-index-rebuild", daemon=True
+                )
+                self._thread.start()
+            return
+        with self._rebuild_lock:
+            if version != self.version:
+                self._read_and_build(db, version)
+
+    def _rebuild(self, bind):
+        try:
+            with Session(bind.engine) as db:
+                self._read_and_build(db, self._current_version(db))
+        except Exception:
+            # The version is unchanged, so the next search tries again
+            logger.exception("Trigram index rebuild failed")
+        finally:
+            self._rebuild_lock.release()
+
+    def _read_and_build(self, db: Session, version):
+        stamp = self._stamp
+        rows = db.execute(select(Employee.id, *EMPLOYEE_SEARCH_COLUMNS).order_by(Employee.id)).all()
+        self.build(rows, version, stamp)
+
+    @staticmethod
+    def _current_version(db: Session):
+        return db.scalar(
+            select(TableVersion.version).where(TableVersion.table_name == Employee.__tablename__)
+        ) or 0
+
+    def search(self, query: str, limit: int, after=None):
+        """[(score, employee_id)] best first, at most `limit` after the cursor."""
+        data = self.data
+        if not data.pending:
+            return self._search(data, query, limit, after)
+        # Employees committed since the build are scored from their new values
+        results = [
+            result
+            for result in self._search(data, query, limit + len(data.pending), after)
+            if result[1] not in data.pending
+        ]
+        for employee_id, (_, fields) in data.pending.items():
+            score = None if fields is None else score_fields(query, fields)
+            if score is not None and (after is None or (-score, employee_id) > (-after[0], after[1])):
+                results.append((score, employee_id))
+        return sorted(results, key=lambda result: (-result[0], result[1]))[:limit]
+
+    def _search(self, data, query: str, limit: int, after=None):
+        documents = data.documents
+
+        def word_prefix():
+            if " " not in query:
+                return _prefixed(data.words, data.word_keys, query)
+            # Only a whole first word can be followed by the rest of the query
+            first = data.words.get(query.split(" ", 1)[0], ())
+            return [i for i in first if f" {query}" in f" {documents[i]}"]
+
+        # Each tier's ids are only looked up if the page is not full yet
+        tiers = (
+            (EXACT, lambda: data.values.get(query, ())),
+            (PREFIX, lambda: _prefixed(data.values, data.value_keys, query)),
+            (WORD_PREFIX, word_prefix),
+        )
+
+        results, seen = [], set()
+        for score, lookup in tiers:
+            if len(results) >= limit:
+                return results
+            ids = sorted(set(lookup()) - seen)
+            seen.update(ids)
+            ids = ids[self._start(score, ids, after) :]
+            results.extend((score, employee_id) for employee_id in ids[: limit - len(results)])
+        if len(results) >= limit:
+            return results
+
+        # Substring matches: every one contains the query's rarest inner trigram
+        grams = inner_trigrams(query)
+        if grams:
+            candidates = min((data.postings.get(gram, ()) for gram in grams), key=len)
+        else:
+            candidates = list(documents)
+        for employee_id in candidates[self._start(SUBSTRING, candidates, after) :]:
+            if query in documents[employee_id] and employee_id not in seen:
+                results.append((SUBSTRING, employee_id))
+                if len(results) >= limit:
+                    return results
+
+        # Not enough: add fuzzy matches, which always rank below substring ones
+        # An employee sharing `needed` of the query's trigrams has at least one
+        # of its `len - needed + 1` rarest, so only those are counted in full
+        grams = word_trigrams(query)
+        lists = sorted((data.postings.get(gram, ()) for gram in grams), key=len)
+        needed = ceil(SIMILARITY_THRESHOLD * len(grams))
+        rare = len(grams) - needed + 1
+        shared = Counter(chain.from_iterable(lists[:rare]))
+        for ids in lists[rare:]:
+            shared.update(shared.keys() & ids)
+        # As (-score, id), so the smallest are the best
+        fuzzy = [
+            (-round(FUZZY * n / len(grams), 4), employee_id)
+            for employee_id, n in shared.items()
+            if n >= needed and query not in documents[employee_id]
+        ]
+        if after is not None:
+            fuzzy = [r for r in fuzzy if r > (-after[0], after[1])]
+        return results + [(-score, i) for score, i in nsmallest(limit - len(results), fuzzy)]
+
+    @staticmethod
+    def _start(score, ids, after):
+        """Position in the ascending `ids` of a tier scoring `score` where the page starts."""
+        if after is None or score < after[0]:
+            return 0
+        if score > after[0]:
+            return len(ids)
+        return bisect_right(ids, after[1])
+
+
+trigram_index = TrigramIndex()
+
+
+@event.listens_for(Session, "after_flush")
+def _note_employee_changes(session, flush_context):
+    # PostgreSQL searches its own index, which never applies these
+    if session.connection().dialect.name == "postgresql":
+        return
+    changes = {}
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, Employee):
+            continue
+        if obj in session.deleted:
+            changes[inspect(obj).identity[0]] = None
+        elif obj in session.new or session.is_modified(obj):
+            changes[obj.id] = tuple(
+                (getattr(obj, column.key) or "").lower() for column in EMPLOYEE_SEARCH_COLUMNS
+            )
+    if changes:
+        session.info.setdefault("search_changes", {}).update(changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_employee_changes(session):
+    changes = session.info.pop("search_changes", None)
+    if changes:
+        trigram_index.apply(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_employee_changes(session):
+    session.info.pop("search_changes", None)
+
+
+def search_postgresql(db: Session, query: str, limit: int, after=None):
+    document = search_document(EMPLOYEE_SEARCH_COLUMNS)
+    fields = [func.lower(column) for column in EMPLOYEE_SEARCH_COLUMNS]
+    score = func.round(
+        cast(
+            case(
+                (or_(*(field == query for field in fields)), EXACT),
+                (or_(*(field.startswith(query, autoescape=True) for field in fields)), PREFIX),
+                ((" " + document).contains(" " + query, autoescape=True), WORD_PREFIX),
+                (document.contains(query, autoescape=True), SUBSTRING),
+                else_=func.word_similarity(query, document) * FUZZY,
+            ),
+            Numeric,
+        ),
+        4,
+    )
+    matches = (
+        select(Employee.id.label("id"), score.label("score"))
+        .where(
+            or_(
+                document.contains(query, autoescape=True),
+                literal(query).op("<%", is_comparison=True)(document),
+            )
+        )
+        .subquery()
+    )
+    stmt = select(matches.c.score, matches.c.id)
+    if after is not None:
+        after_score, after_id = after
+        stmt = stmt.where(
+            or_(
+                matches.c.score < after_score,
+                and_(matches.c.score == after_score, matches.c.id > after_id),
+            )
+        )
+    rows = db.execute(stmt.order_by(matches.c.score.desc(), matches.c.id).limit(limit)).all()
+    return [(float(score), employee_id) for score, employee_id in rows]
+
+
+def search_employees(db: Session, query: str, limit: int, after=None):
+    """[(score, employee_id)] for one page of matches of `query`, best first."""
+    query = normalise(query)
+    if db.get_bind().dialect.name == "postgresql":
+        return search_postgresql(db, query, limit, after)
+    trigram_index.refresh(db)
+    return trigram_index.search(query, limit, after)
@@ -0,0 +1,162 @@
+"""Single-pass JSON serialization for list responses.
+
+Returning ORM objects through `response_model` costs several passes per row:
+validate the object, dump it, validate the dump against the response model
+and serialise that. A ListSerializer instead pairs an Out schema with a
+TypedDict twin and a precompiled TypeAdapter, turns each row (a SQLAlchemy Row,
+an ORM object or a dict) into a plain dict of the schema's fields and dumps
+the whole list to JSON bytes in one call. Routes keep the schema as their
+response_model, so the OpenAPI docs do not change.
+
+Fieldset adds a `fields=` parameter to a route (FieldsetWithIncludes also
+`include=`), so a caller that needs a few columns gets only those, queried
+and serialised alone.
+"""
+from typing import List, Optional
+
+from fastapi import HTTPException, Query, Response
+from pydantic import TypeAdapter
+from sqlalchemy.orm import load_only
+from typing_extensions import TypedDict
+
+from metrics import timed
+
+# Set by the returned Response itself, not copied from the route's Response
+_RESPONSE_OWN_HEADERS = {"content-length", "content-type"}
+
+
+class ListSerializer:
+    def __init__(self, schema, fields=None):
+        self.schema = schema
+        self.fields = tuple(schema.model_fields) if fields is None else tuple(fields)
+        row_type = TypedDict(
+            f"{schema.__name__}Row",
+            {name: schema.model_fields[name].annotation for name in self.fields},
+        )
+        self.adapter = TypeAdapter(List[row_type])
+        self.item_adapter = TypeAdapter(row_type)
+
+    def columns(self, model):
+        """The model columns backing the schema, for column-only queries."""
+        return [getattr(model, name) for name in self.fields if hasattr(model, name)]
+
+    def _as_dict(self, row):
+        if isinstance(row, dict):
+            return {name: row.get(name) for name in self.fields}
+        return {name: getattr(row, name, None) for name in self.fields}
+
+    def dump(self, rows) -> bytes:
+        with timed("serialize"):
+            return self.adapter.dump_json([self._as_dict(row) for row in rows])
+
+    def response(self, rows, response: Response = None) -> Response:
+        return self._response(self.dump(rows), response)
+
+    def item_response(self, row, response: Response = None) -> Response:
+        """One row, for detail routes."""
+        with timed("serialize"):
+            body = self.item_adapter.dump_json(self._as_dict(row))
+        return self._response(body, response)
+
+    @staticmethod
+    def _response(body, response):
+        # FastAPI only applies the route's Response headers (X-Next-Cursor,
+        # ETag, ...) to responses it builds itself, so copy them over
+        headers = {}
+        if response is not None:
+            headers = {
+                name: value
+                for name, value in response.headers.items()
+                if name not in _RESPONSE_OWN_HEADERS
+            }
+        return Response(body, media_type="application/json", headers=headers)
+
+
+class Fieldset:
+    """Dependency reading `fields`, the columns of `schema` a caller wants.
+
+    Left out, it means all of them, so a plain request gets the whole schema.
+    The id is always returned, as pages are keyed on it.
+    """
+
+    includes = ()
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.columns = tuple(name for name in schema.model_fields if name not in self.includes)
+        self._serializers = {}
+
+    def __call__(
+        self,
+        fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    ) -> "Selection":
+        return self.select(fields, None)
+
+    def select(self, fields, include) -> "Selection":
+        columns = self.columns
+        if fields is not None:
+            columns = self._parse(fields, self.columns, "field")
+        included = self.includes
+        if include is not None:
+            included = self._parse(include, self.includes, "include")
+        if "id" not in columns:
+            columns = ("id",) + columns
+        return Selection(self, columns, included)
+
+    @staticmethod
+    def _parse(value, allowed, kind):
+        names = {name.strip() for name in value.split(",") if name.strip()}
+        unknown = sorted(names - set(allowed))
+        if unknown:
+            raise HTTPException(400, f"Unknown {kind}: {', '.join(unknown)}")
+        return tuple(name for name in allowed if name in names)
+
+    def serializer(self, names) -> ListSerializer:
+        # One per combination asked for; there are only so many
+        serializer = self._serializers.get(names)
+        if serializer is None:
+            serializer = self._serializers.setdefault(names, ListSerializer(self.schema, names))
+        return serializer
+
+
+class FieldsetWithIncludes(Fieldset):
+    """Fieldset that also reads `include`: which of `includes`, the schema
+    fields loaded with queries of their own (an employee's request statuses),
+    to return. Left out, it means all of them."""
+
+    def __init__(self, schema, includes):
+        self.includes = tuple(includes)
+        super().__init__(schema)
+
+    def __call__(
+        self,
+        fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+        include: Optional[str] = Query(None, description="Comma-separated related data to return"),
+    ) -> "Selection":
+        return self.select(fields, include)
+
+
+class Selection:
+    """The columns and includes one request asked for."""
+
+    def __init__(self, fieldset: Fieldset, columns, includes):
+        self.column_names = columns
+        self.includes = includes
+        names = set(columns) | set(includes)
+        self.serializer = fieldset.serializer(
+            tuple(name for name in fieldset.schema.model_fields if name in names)
+        )
+
+    def columns(self, model):
+        """The selected columns of `model`, for column-only queries."""
+        return [getattr(model, name) for name in self.column_names]
+
+    def load_only(self, model):
+        """The loader option for ORM queries that should load only the selected columns."""
+        return load_only(*self.columns(model))
+
+    def response(self, rows, response: Response = None) -> Response:
+        return self.serializer.response(rows, response)
+
+    def item_response(self, row, response: Response = None) -> Response:
+        return self.serializer.item_response(row, response)
@@ -0,0 +1,164 @@
+"""Slow-query log: the SQL, parameter shapes and query plan of slow statements.
+
+Every statement on every engine is timed; one that takes SLOW_QUERY_MS or
+longer is logged as a warning and kept in a small in-memory ring served at
+/monitoring/slow_queries. Parameters are recorded as their types only, never
+their values. With SLOW_QUERY_EXPLAIN on, the statement's plan is captured on
+the same connection (EXPLAIN on PostgreSQL, EXPLAIN QUERY PLAN on SQLite;
+the statement is planned, not run again) and remembered per SQL text, so a
+statement that is slow over and over is only explained once.
+"""
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+load_dotenv(".env.custom")
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "100"))
+
+EXPLAIN_PREFIX = {"postgresql": "EXPLAIN ", "sqlite": "EXPLAIN QUERY PLAN "}
+EXPLAINABLE = ("select", "insert", "update", "delete", "with")
+# Above this many parameters (large IN lists), only count them by type
+MAX_LISTED_PARAMETERS = 20
+
+
+def parameter_shape(parameters, executemany=False):
+    """The types of the bound parameters, e.g. {"id_1": "int"} or ["str", "int"]."""
+    if executemany:
+        first = parameter_shape(parameters[0]) if parameters else None
+        return {"rows": len(parameters), "row": first}
+    if not parameters:
+        return None
+    if isinstance(parameters, dict):
+        types = {name: type(value).__name__ for name, value in parameters.items()}
+    else:
+        types = [type(value).__name__ for value in parameters]
+    if len(types) > MAX_LISTED_PARAMETERS:
+        values = types.values() if isinstance(types, dict) else types
+        return {"count": len(types), "types": dict(Counter(values))}
+    return types
+
+
+def explain(conn, statement, parameters, executemany=False):
+    """Plan lines for `statement` from the connection's dialect, or None."""
+    prefix = EXPLAIN_PREFIX.get(conn.dialect.name)
+    if prefix is None or not statement.lstrip().lower().startswith(EXPLAINABLE):
+        return None
+    if executemany:
+        parameters = parameters[0] if parameters else ()
+    # A raw DBAPI cursor, so the EXPLAIN itself is neither timed nor logged. On
+    # PostgreSQL a failed statement aborts the transaction, hence the savepoint.
+    savepoint = conn.dialect.name == "postgresql" and conn.in_transaction()
+    cursor = conn.connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            if parameters:
+                cursor.execute(prefix + statement, parameters)
+            else:
+                cursor.execute(prefix + statement)
+            plan = [" ".join(str(column) for column in row) for row in cursor.fetchall()]
+        except Exception as exc:
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return [f"EXPLAIN failed: {exc}"]
+        if savepoint:
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        return plan
+    finally:
+        cursor.close()
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, size: int = SLOW_QUERY_LOG_SIZE):
+        self.threshold_ms = threshold_ms
+        self.explain = SLOW_QUERY_EXPLAIN
+        self._entries = deque(maxlen=size)
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+        self.slow_statements = 0
+
+    def record(self, conn, statement, parameters, executemany, duration_ms):
+        plan = None
+        if self.explain:
+            with self._lock:
+                plan = self._plans.get(statement)
+            if plan is None:
+                plan = explain(conn, statement, parameters, executemany)
+                with self._lock:
+                    self._plans[statement] = plan
+                    while len(self._plans) > 256:
+                        self._plans.popitem(last=False)
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(duration_ms, 2),
+            "statement": statement,
+            "parameters": parameter_shape(parameters, executemany),
+            "plan": plan,
+        }
+        with self._lock:
+            self._entries.append(entry)
+            self.slow_statements += 1
+        logger.warning(
+            "Slow query (%.1f ms): %s\n  parameters: %s\n  plan: %s",
+            duration_ms,
+            statement,
+            entry["parameters"],
+            "\n    ".join(plan) if plan else "-",
+        )
+
+    def entries(self):
+        with self._lock:
+            return list(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "threshold_ms": self.threshold_ms,
+                "explain": self.explain,
+                "slow_statements": self.slow_statements,
+                "recent": list(self._entries),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._plans.clear()
+            self.slow_statements = 0
+
+
+slow_query_log = SlowQueryLog()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _check_duration(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("slow_query_started")
+    if not started:
+        return
+    duration_ms = 1000 * (time.perf_counter() - started.pop())
+    if duration_ms >= slow_query_log.threshold_ms:
+        slow_query_log.record(conn, statement, parameters, executemany, duration_ms)
+
+
+@event.listens_for(Engine, "handle_error")
+def _drop_timer(context):
+    conn = context.connection
+    if conn is not None and conn.info.get("slow_query_started"):
+        conn.info["slow_query_started"].pop()
@@ -0,0 +1,131 @@
+"""Compare concurrent throughput of the sync and async (DB_MODE=async) routers.
+
+Usage:
+    python -m test.benchmarks.bench_db_modes --requests 2000 --concurrency 100
+
+Both modes are driven in-process through httpx's ASGI transport against the
+same seeded SQLite file (pass --database-url to point at Postgres instead), so
+the numbers compare the request-handling models rather than the network.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--employees", type=int, default=500)
+    parser.add_argument("--requests-per-employee", type=int, default=4)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--database-url", default=None)
+    return parser.parse_args()
+
+
+def seed(database_url, employees, per_employee):
+    from sqlalchemy import create_engine, insert
+
+    from database import Base
+    from model import BankRequests, Employee
+
+    engine = create_engine(database_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Employee),
+            [
+                {"user_id": i, "first_name": f"First{i}", "last_name": f"Last{i}", "email": f"e{i}@rcl.ac.uk"}
+                for i in range(1, employees + 1)
+            ],
+        )
+        conn.execute(
+            insert(BankRequests),
+            [
+                {"employee_id": i, "status": "Pending" if j % 2 else "Approved"}
+                for i in range(1, employees + 1)
+                for j in range(per_employee)
+            ],
+        )
+    engine.dispose()
+
+
+async def drive(app, paths, total, concurrency, headers):
+    import httpx
+
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+
+        async def one(i):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(paths[i % len(paths)])
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(1000 * statistics.median(latencies), 2),
+        "p95_ms": round(1000 * latencies[int(0.95 * (len(latencies) - 1))], 2),
+    }
+
+
+def main():
+    args = parse_args()
+    database_url = args.database_url or "sqlite:///" + os.path.join(
+        tempfile.mkdtemp(), "bench.db"
+    )
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    seed(database_url, args.employees, args.requests_per_employee)
+
+    from fastapi import FastAPI
+
+    from auth.auth import create_access_token
+    from routers import async_crud, bank_request, employees
+
+    sync_app = FastAPI()
+    sync_app.include_router(employees.router)
+    sync_app.include_router(bank_request.router)
+    async_app = FastAPI()
+    for router in async_crud.routers:
+        async_app.include_router(router)
+
+    token = create_access_token({"sub": "bench", "uid": 1, "role_id": 1, "is_hr": True})
+    headers = {"Authorization": f"Bearer {token}"}
+    paths = [
+        f"/bank_requests/?limit={args.page_size}&status=Pending",
+        f"/employees/?limit={args.page_size}",
+        "/bank_requests/1",
+        "/employees/1",
+    ]
+
+    results = {}
+    for mode, app in (("sync", sync_app), ("async", async_app)):
+        results[mode] = asyncio.run(
+            drive(app, paths, args.requests, args.concurrency, headers)
+        )
+    results["async_speedup"] = round(
+        results["async"]["throughput_rps"] / results["sync"]["throughput_rps"], 2
+    )
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
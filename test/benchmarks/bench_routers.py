@@ -0,0 +1,330 @@
+"""Latency/throughput benchmark for every endpoint of the users, employees and request routers.
+
+Usage:
+    python -m test.benchmarks.bench_routers                      # run and compare with baseline.json
+    python -m test.benchmarks.bench_routers --update-baseline    # store the worst of 3 runs as the baseline
+    python -m test.benchmarks.bench_routers --database-url postgresql://...  --employees 20000
+
+A fresh database (a temporary SQLite file unless --database-url is given) is
+seeded with --employees employees and --requests-per-type rows in each request
+table, then every endpoint is driven in-process through httpx's ASGI
+transport. Login and registration use real bcrypt through the hashing pool.
+Results are written as JSON to --output. Any endpoint whose p95 latency or
+throughput is more than --tolerance worse than the baseline, or that returns
+errors, is reported and makes the run exit with status 1.
+
+POST /employees/ is left out: it rejects every payload today (EmployeeCreate
+has no user_id), so there is nothing meaningful to time.
+"""
+import argparse
+import asyncio
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REQUEST_PREFIXES = ("bank_requests", "dbs_checks", "home_office_requests")
+PASSWORD = "Bench-pass1!"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--employees", type=int, default=500)
+    parser.add_argument("--requests-per-type", type=int, default=3, help="per employee")
+    parser.add_argument("--requests", type=int, default=100, help="calls per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10, help="for read endpoints")
+    parser.add_argument("--write-concurrency", type=int, default=1)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--response-cache", action="store_true", help="leave the response cache on")
+    parser.add_argument("--output", default=os.path.join(HERE, "results", "latest.json"))
+    parser.add_argument("--baseline", default=os.path.join(HERE, "baseline.json"))
+    parser.add_argument("--tolerance", type=float, default=1.0, help="1.0 = up to 2x worse")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="ignore smaller p95 changes")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument(
+        "--baseline-runs", type=int, default=3,
+        help="with --update-baseline: keep each endpoint's worst of this many runs",
+    )
+    return parser.parse_args()
+
+
+def seed(database_url, employees, per_type, spare):
+    """Seed roles, a bcrypt admin, employees and requests; `spare` employees have no requests."""
+    from sqlalchemy import create_engine, insert
+
+    from sqlalchemy.orm import Session
+
+    from aggregates import rebuild
+    from database import Base, create_schema
+    from model import BankRequests, DBSChecks, Employee, HomeOfficeRequests, Role, User
+    from auth.hashing import pwd_context
+
+    engine = create_engine(database_url)
+    Base.metadata.drop_all(bind=engine)
+    create_schema(engine)
+    total = employees + spare
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Role),
+            [
+                {"id": 1, "role_name": "admin", "is_admin": True, "is_hr": True, "is_employee": True},
+                {"id": 2, "role_name": "employee", "is_admin": False, "is_hr": False, "is_employee": True},
+            ],
+        )
+        admin_hash = pwd_context.hash(PASSWORD)
+        conn.execute(
+            insert(User),
+            [
+                {"id": i, "username": f"user{i}", "email": f"user{i}@rcl.ac.uk",
+                 "password_hash": admin_hash if i == 1 else "x", "role_id": 1 if i == 1 else 2}
+                for i in range(1, total + 1)
+            ],
+        )
+        conn.execute(
+            insert(Employee),
+            [
+                {"id": i, "user_id": i, "first_name": f"First{i}", "last_name": f"Last{i}",
+                 "email": f"user{i}@rcl.ac.uk", "department": f"Dept{i % 40}", "position": "Lecturer"}
+                for i in range(1, total + 1)
+            ],
+        )
+        for model in (BankRequests, DBSChecks, HomeOfficeRequests):
+            conn.execute(
+                insert(model),
+                [
+                    {"employee_id": i, "status": ("Pending", "Approved", "Rejected")[j % 3],
+                     "request_date": datetime.date(2025, 1 + j % 12, 1 + i % 28)}
+                    for i in range(1, employees + 1)
+                    for j in range(per_type)
+                ],
+            )
+    with Session(engine) as db:
+        rebuild(db)
+    engine.dispose()
+
+
+def ndjson(rows):
+    return ("\n".join(json.dumps(row) for row in rows) + "\n").encode()
+
+
+def build_cases(args, run_id):
+    """(name, write?, calls, request(i) -> (method, path, kwargs)) for every endpoint."""
+    n, page = args.employees, args.page_size
+    rows_per_table = args.employees * args.requests_per_type
+    calls = args.requests
+    few = max(1, calls // 10)
+    cases = [
+        ("users.login", True, few, lambda i: ("POST", "/users/login", {"data": {"username": "user1", "password": PASSWORD}})),
+        ("users.register", True, few, lambda i: ("POST", "/users/register", {"json": {
+            "username": f"new{run_id}_{i}", "email": f"new{run_id}_{i}@rcl.ac.uk", "password": PASSWORD,
+            "role_id": 2, "first_name": "New", "last_name": f"Starter{i}"}})),
+        ("employees.list", False, calls, lambda i: ("GET", f"/employees/?limit={page}&after={(i * page) % n}", {})),
+        ("employees.detail", False, calls, lambda i: ("GET", f"/employees/{1 + i % n}", {})),
+        ("employees.export", False, few, lambda i: ("GET", "/employees/export", {})),
+        ("employees.update", True, calls, lambda i: ("PUT", f"/employees/{1 + i % n}", {"json": {"position": f"Role{i}"}})),
+        # Spare employees n+1.. have no requests, so deleting them is valid on Postgres too
+        ("employees.delete", True, calls, lambda i: ("DELETE", f"/employees/{n + 1 + i}", {})),
+    ]
+    for prefix in REQUEST_PREFIXES:
+        cases += [
+            (f"{prefix}.list", False, calls, lambda i, p=prefix: ("GET", f"/{p}/?limit={page}&after={(i * page) % rows_per_table}", {})),
+            (f"{prefix}.list_filtered", False, calls, lambda i, p=prefix: ("GET", f"/{p}/?limit={page}&status=Pending", {})),
+            (f"{prefix}.detail", False, calls, lambda i, p=prefix: ("GET", f"/{p}/{1 + i % rows_per_table}", {})),
+            (f"{prefix}.create", True, calls, lambda i, p=prefix: ("POST", f"/{p}/", {"json": {"employee_id": 1 + i % n, "status": "Pending"}})),
+            (f"{prefix}.update", True, calls, lambda i, p=prefix: ("PUT", f"/{p}/{1 + i % rows_per_table}", {"json": {"employee_id": 1 + i % n, "status": "Approved"}})),
+            # Rows added by .create (and its warm-up call) come after the seeded ones
+            (f"{prefix}.delete", True, calls, lambda i, p=prefix: ("DELETE", f"/{p}/{rows_per_table + 1 + i}", {})),
+            (f"{prefix}.import", True, few, lambda i, p=prefix: ("POST", f"/{p}/import", {"files": {"file": (
+                "rows.ndjson", ndjson({"employee_id": 1 + (i * 100 + k) % n, "status": "Pending"} for k in range(100)))}})),
+            (f"{prefix}.bulk_status", True, few, lambda i, p=prefix: ("POST", f"/{p}/bulk_status", {"json": {
+                "status": ("Approved", "Rejected")[i % 2], "ids": [1 + (i * 100 + k) % rows_per_table for k in range(100)]}})),
+        ]
+    return cases
+
+
+async def drive(client, request, calls, concurrency):
+    latencies, errors = [], []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        method, path, kwargs = request(i)
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            latencies.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            errors.append(f"{method} {path}: {response.status_code} {response.text[:200]}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": calls,
+        "concurrency": concurrency,
+        "throughput_rps": round(calls / elapsed, 1),
+        "p50_ms": round(1000 * statistics.median(latencies), 2),
+        "p95_ms": round(1000 * latencies[int(0.95 * (len(latencies) - 1))], 2),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+    }
+
+
+async def run(app, cases, args, headers):
+    import httpx
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers, timeout=120) as client:
+        for name, write, calls, request in cases:
+            # One warm-up call (pool connections, hashing workers, adapters),
+            # using an index the measured calls never reach
+            warm = await client.request(*request(calls)[:2], **request(calls)[2])
+            if warm.status_code >= 400:
+                print(f"warm-up failed for {name}: {warm.status_code} {warm.text[:200]}", file=sys.stderr)
+            concurrency = args.write_concurrency if write else args.concurrency
+            results[name] = await drive(client, request, calls, concurrency)
+            print(f"{name:40} {results[name]['throughput_rps']:9.1f} rps  p95 {results[name]['p95_ms']:8.2f} ms", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, args):
+    """Return a list of human-readable regressions (empty when within tolerance)."""
+    problems = [f"{name}: {r['errors']} errors, e.g. {r['first_error']}" for name, r in results["endpoints"].items() if r["errors"]]
+    if baseline is None:
+        return problems
+    if baseline["meta"]["volumes"] != results["meta"]["volumes"]:
+        return problems + [
+            f"baseline volumes {baseline['meta']['volumes']} differ from this run's "
+            f"{results['meta']['volumes']}; rerun with matching options or --update-baseline"
+        ]
+    limit = 1 + args.tolerance
+    for name, base in baseline["endpoints"].items():
+        current = results["endpoints"].get(name)
+        if current is None:
+            problems.append(f"{name}: missing from this run")
+            continue
+        if current["p95_ms"] > base["p95_ms"] * limit and current["p95_ms"] - base["p95_ms"] > args.min_delta_ms:
+            problems.append(f"{name}: p95 {current['p95_ms']} ms vs baseline {base['p95_ms']} ms")
+        if current["throughput_rps"] * limit < base["throughput_rps"]:
+            problems.append(f"{name}: {current['throughput_rps']} rps vs baseline {base['throughput_rps']} rps")
+    return problems
+
+
+def rerun(args):
+    """The results of one more run with the same volumes, in a fresh process
+    (the app reads its configuration once per process)."""
+    output = os.path.join(tempfile.mkdtemp(), "run.json")
+    command = [
+        sys.executable, "-m", "test.benchmarks.bench_routers",
+        "--employees", str(args.employees),
+        "--requests-per-type", str(args.requests_per_type),
+        "--requests", str(args.requests),
+        "--concurrency", str(args.concurrency),
+        "--write-concurrency", str(args.write_concurrency),
+        "--page-size", str(args.page_size),
+        "--output", output,
+        "--baseline", os.path.join(os.path.dirname(output), "none.json"),
+    ]
+    if args.database_url:
+        command += ["--database-url", args.database_url]
+    if args.response_cache:
+        command.append("--response-cache")
+    subprocess.run(command, cwd=os.path.dirname(os.path.dirname(HERE)), check=True)
+    with open(output) as f:
+        return json.load(f)
+
+
+def slowest(runs):
+    """Per endpoint, the worst p95 and throughput of `runs`: a baseline that one
+    quick run on a noisy machine does not make too strict."""
+    merged = runs[0]
+    for run in runs[1:]:
+        for name, result in run["endpoints"].items():
+            worst = merged["endpoints"].setdefault(name, result)
+            worst["p95_ms"] = max(worst["p95_ms"], result["p95_ms"])
+            worst["throughput_rps"] = min(worst["throughput_rps"], result["throughput_rps"])
+    merged["meta"]["runs"] = len(runs)
+    return merged
+
+
+def main():
+    args = parse_args()
+    database_url = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    # Configuration is read at import time, so set it before importing the app
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ["BOOTSTRAP_DB"] = "false"
+    if not args.response_cache:
+        os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    spare = args.requests + 1
+    seed(database_url, args.employees, args.requests_per_type, spare)
+
+    from auth.auth import create_access_token
+    from auth.hashing import password_hasher
+    from main import create_app
+
+    token = create_access_token(
+        {"sub": "user1", "uid": 1, "role_id": 1, "is_hr": True, "is_admin": True, "is_employee": True}
+    )
+    cases = build_cases(args, run_id=int(time.time()))
+    try:
+        endpoints = asyncio.run(
+            run(create_app(bootstrap_db=False), cases, args, {"Authorization": f"Bearer {token}"})
+        )
+    finally:
+        password_hasher.shutdown()
+
+    results = {
+        "meta": {
+            "volumes": {
+                "employees": args.employees,
+                "requests_per_type": args.requests_per_type,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "write_concurrency": args.write_concurrency,
+                "page_size": args.page_size,
+                "response_cache": args.response_cache,
+            },
+            "database": database_url.split(":", 1)[0],
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "endpoints": endpoints,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}", file=sys.stderr)
+
+    if args.update_baseline:
+        runs = [results] + [rerun(args) for _ in range(args.baseline_runs - 1)]
+        with open(args.baseline, "w") as f:
+            json.dump(slowest(runs), f, indent=2)
+            f.write("\n")
+        print(f"baseline updated: {args.baseline}", file=sys.stderr)
+        return 0
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    else:
+        print(f"no baseline at {args.baseline}; only checking for errors", file=sys.stderr)
+    problems = compare(results, baseline, args)
+    for problem in problems:
+        print(f"REGRESSION {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""Latency of GET /employees/search on a large directory.
+
+Usage:
+    python -m test.benchmarks.bench_search --employees 50000 --requests 500
+
+Seeds a temporary SQLite database (or --database-url) with employees whose
+names, emails, NI numbers and departments are drawn from fixed word lists,
+then times a mix of prefix, substring, multi-word, email, NI-number and
+misspelt queries through the app, with the response cache off. On SQLite
+this measures the in-process trigram index; against PostgreSQL, the GIN index.
+The same queries are then timed through search.search_employees alone.
+Exits with status 1 if the endpoint's p99 exceeds --p99-ms.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+FIRST = ["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "David",
+         "Elizabeth", "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah",
+         "Priya", "Mohammed", "Olga", "Wei", "Aisha", "Kwame", "Siobhan", "Mateo", "Yuki", "Fatima"]
+LAST = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez",
+        "Martinez", "Hernandez", "Lopez", "Wilson", "Anderson", "Taylor", "Thomas", "Moore", "Jackson",
+        "Patel", "Khan", "Nowak", "Chen", "Okafor", "O'Brien", "Rossi", "Tanaka", "Murphy", "Singh"]
+DEPARTMENTS = ["Finance", "Human Resources", "Computing", "Business", "Law", "Health", "Estates",
+               "Admissions", "Registry", "Library", "Marketing", "Student Services"]
+QUERIES = ["jo", "smi", "patel", "john smith", "mary jones", "priya.patel", "finance", "student serv",
+           "AB12", "okaf", "jonson", "wiliams", "human", "tanaka", "rcl.ac.uk", "siob"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--employees", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--p99-ms", type=float, default=20.0)
+    return parser.parse_args()
+
+
+def seed(database_url, employees):
+    from sqlalchemy import create_engine, insert
+
+    from database import Base, create_schema
+    from model import Employee, User
+
+    rng = random.Random(42)
+    engine = create_engine(database_url)
+    Base.metadata.drop_all(bind=engine)
+    create_schema(engine)
+    people = []
+    for i in range(1, employees + 1):
+        first, last = rng.choice(FIRST), rng.choice(LAST)
+        people.append({
+            "id": i, "user_id": i, "first_name": first, "last_name": last,
+            "email": f"{first}.{last}{i}@rcl.ac.uk".lower().replace("'", ""),
+            "national_insurance_number": f"{rng.choice('ABCEGHJ')}{rng.choice('ABCEGHJ')}{rng.randrange(10**6):06d}C",
+            "department": rng.choice(DEPARTMENTS),
+        })
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User),
+            [{"id": p["id"], "username": f"user{p['id']}", "email": p["email"], "password_hash": "x"} for p in people],
+        )
+        conn.execute(insert(Employee), people)
+    engine.dispose()
+
+
+async def run(app, token, args):
+    import httpx
+
+    latencies, sizes = [], []
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        start = time.perf_counter()
+        response = await client.get("/employees/search", params={"q": "warm up"})
+        response.raise_for_status()
+        print(f"first search (builds the index on SQLite): {1000 * (time.perf_counter() - start):.0f} ms")
+        for i in range(args.requests):
+            query = QUERIES[i % len(QUERIES)]
+            start = time.perf_counter()
+            response = await client.get("/employees/search", params={"q": query, "limit": args.limit})
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+            sizes.append(len(response.json()))
+    return latencies, sizes
+
+
+def time_index(args):
+    """The search alone, without the request around it."""
+    from database import SessionLocal
+    from search import search_employees
+
+    latencies = []
+    with SessionLocal() as db:
+        for i in range(args.requests):
+            start = time.perf_counter()
+            search_employees(db, QUERIES[i % len(QUERIES)], args.limit + 1)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return (
+        1000 * statistics.median(latencies),
+        1000 * latencies[int(0.99 * (len(latencies) - 1))],
+        1000 * latencies[-1],
+    )
+
+
+def main():
+    args = parse_args()
+    database_url = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "search.db")
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ["BOOTSTRAP_DB"] = "false"
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    seed(database_url, args.employees)
+
+    from auth.auth import create_access_token
+    from main import create_app
+
+    token = create_access_token({"sub": "hr", "uid": 1, "role_id": None, "is_hr": True, "is_employee": True})
+    latencies, sizes = asyncio.run(run(create_app(bootstrap_db=False), token, args))
+    print(f"{args.employees} employees, {args.requests} searches, {statistics.mean(sizes):.1f} results on average")
+    _, p99, _ = percentiles(latencies)
+    print("endpoint  p50 %.2f ms   p99 %.2f ms   max %.2f ms" % percentiles(latencies))
+    print("search    p50 %.2f ms   p99 %.2f ms   max %.2f ms" % percentiles(time_index(args)))
+    if p99 > args.p99_ms:
+        print(f"p99 is over the {args.p99_ms} ms target", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
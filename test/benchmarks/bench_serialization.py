@@ -0,0 +1,84 @@
+"""Compare the response_model path with serialization.ListSerializer on a large list.
+
+Usage:
+    python -m test.benchmarks.bench_serialization --rows 10000 --repeat 5
+
+Both paths start from the same rows as the employees list route loads them:
+the old one builds EmployeeOut via from_orm_with_status from ORM objects and
+then lets FastAPI validate and serialise against response_model; the fast
+path dumps plain column rows straight to JSON bytes.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from datetime import date
+from typing import List
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args()
+
+
+def best_of(repeat, fn):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), statistics.median(times), body
+
+
+def main():
+    args = parse_args()
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+
+    from model import Employee
+    from schemas import EmployeeOut
+    from serialization import ListSerializer
+
+    statuses = {
+        "bank_request_statuses": ["Pending", "Approved"],
+        "dbs_check_statuses": ["Cleared"],
+        "home_office_request_statuses": [],
+    }
+    employees = [
+        Employee(
+            id=i, user_id=i, first_name=f"First{i}", last_name=f"Last{i}", email=f"e{i}@rcl.ac.uk",
+            department=f"Dept{i % 40}", position="Lecturer", date_of_birth=date(1990, 1, 1),
+        )
+        for i in range(1, args.rows + 1)
+    ]
+    rows = [
+        {**{name: getattr(emp, name, None) for name in EmployeeOut.model_fields}, **statuses}
+        for emp in employees
+    ]
+    field = create_model_field(name="Response", type_=List[EmployeeOut], mode="serialization")
+
+    def response_model_path():
+        content = [EmployeeOut.from_orm_with_status(emp, statuses) for emp in employees]
+        data = asyncio.run(serialize_response(field=field, response_content=content))
+        return JSONResponse(data).body
+
+    serializer = ListSerializer(EmployeeOut)
+
+    def fast_path():
+        return serializer.dump(rows)
+
+    slow_best, slow_median, slow_body = best_of(args.repeat, response_model_path)
+    fast_best, fast_median, fast_body = best_of(args.repeat, fast_path)
+    print(f"{args.rows} rows, best of {args.repeat}")
+    print(f"  response_model: {slow_best * 1000:8.1f} ms (median {slow_median * 1000:.1f} ms), {len(slow_body)} bytes")
+    print(f"  ListSerializer: {fast_best * 1000:8.1f} ms (median {fast_median * 1000:.1f} ms), {len(fast_body)} bytes")
+    print(f"  speedup: {slow_best / fast_best:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
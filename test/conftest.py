@@ -1,7 +1,28 @@
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+# Routes that run more SQL statements than their declared budget fail the test
+os.environ.setdefault("QUERY_BUDGET_MODE", "raise")
+# The audit writer only writes when a test calls audit_writer.flush(), never
+# concurrently with the test's own use of the shared in-memory connection
+os.environ.setdefault("AUDIT_FLUSH_SECONDS", "3600")
+os.environ.setdefault("AUDIT_BATCH_SIZE", "100000")
+
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from main import app
+from database import Base, get_db
+from auth.dependencies import get_current_user
+from auth.identity_cache import Principal, identity_cache, role_cache, token_revocations
 from model import User, Role, Employee, BankRequests, DBSChecks, HomeOfficeRequests
+from response_cache import response_cache
+from search import trigram_index
+from audit import audit_writer
+from events import change_broker
 from unittest.mock import MagicMock
 
 @pytest.fixture
@@ -44,4 +65,68 @@ def mock_user_regular():
     role.is_hr = False
     role.is_admin = False
     user.role = role
-    return user
\ No newline at end of file
+    return user
+
+
+# Real (in-memory SQLite) database fixtures for endpoint tests
+@pytest.fixture
+def db_engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(db_engine):
+    db = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def hr_user(db_session):
+    role = Role(role_name="hr", is_hr=True, is_admin=False, is_employee=True)
+    user = User(username="hruser", email="hr@rcl.ac.uk", password_hash="x", role=role)
+    db_session.add(user)
+    db_session.commit()
+    return Principal(
+        id=user.id,
+        username=user.username,
+        role_id=role.id,
+        is_hr=True,
+        is_employee=True,
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_identity_caches():
+    yield
+    identity_cache.clear()
+    role_cache.clear()
+    token_revocations.clear()
+    response_cache.clear()
+    trigram_index.clear()
+    audit_writer.clear()
+    change_broker.clear()
+
+
+@pytest.fixture
+def admin_client(db_session):
+    admin = Principal(id=99, username="admin", role_id=None, is_hr=True, is_admin=True)
+    app.dependency_overrides[get_db] = lambda: db_session
+    app.dependency_overrides[get_current_user] = lambda: admin
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def api_client(db_session, hr_user):
+    app.dependency_overrides[get_db] = lambda: db_session
+    app.dependency_overrides[get_current_user] = lambda: hr_user
+    yield TestClient(app)
+    app.dependency_overrides.clear()
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from main import create_app, init_db
+from database import check_backend
+from model import Employee, Role, User
+
+
+def test_import_needs_no_database():
+    env = {k: v for k, v in os.environ.items() if k != "DATABASE_URL"}
+    result = subprocess.run(
+        [sys.executable, "-c", "import main, database; assert database.engine is None"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def test_bootstrap_is_idempotent(db_engine, db_session):
+    init_db(db_engine)
+    init_db(db_engine)
+    assert db_session.scalar(select(func.count(Role.id))) == 3
+    assert db_session.scalar(select(func.count(User.id))) == 1
+    assert db_session.scalar(select(func.count(Employee.id))) == 1
+
+
+def test_lifespan_records_startup_timing():
+    app = create_app(bootstrap_db=False)
+    with TestClient(app):
+        startup = app.state.startup
+    assert startup["bootstrap_db"] is False
+    assert startup["ready_ms"] >= startup["import_ms"] >= 0
+
+
+def test_unsupported_database_is_refused_up_front():
+    with pytest.raises(RuntimeError, match="Unsupported database 'mysql'"):
+        check_backend("mysql+pymysql://hr:secret@db/rclhrs")
+    check_backend("postgresql://hr:secret@db/rclhrs")
+    check_backend("sqlite:///hr.db")
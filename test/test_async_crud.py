@@ -0,0 +1,98 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from audit import audit_writer
+from auth.auth import create_access_token
+from database import Base, get_async_db, get_db
+from model import Employee
+from routers import async_crud, employees
+
+
+@pytest.fixture
+def async_client(tmp_path):
+    url = f"sqlite:///{tmp_path / 'async.db'}"
+    sync_engine = create_engine(url, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=sync_engine)
+    sync_sessions = sessionmaker(bind=sync_engine)
+    with sync_sessions() as db:
+        db.add(Employee(user_id=1, first_name="Ada", last_name="Lovelace", email="ada@rcl.ac.uk"))
+        db.commit()
+    engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"), poolclass=NullPool)
+    sessions = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with sessions() as db:
+            yield db
+
+    app = FastAPI()
+    for router in async_crud.routers:
+        app.include_router(router)
+    app.include_router(employees.router)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_db] = lambda: sync_sessions()
+    token = create_access_token(
+        {"sub": "hruser", "uid": 1, "role_id": 1, "is_hr": True, "is_admin": True}
+    )
+    client = TestClient(app, headers={"Authorization": f"Bearer {token}"})
+    yield client
+    sync_engine.dispose()
+
+
+def test_async_request_crud(async_client):
+    created = async_client.post("/bank_requests/", json={"employee_id": 1, "status": "Pending"})
+    assert created.status_code == 200
+    request_id = created.json()["id"]
+
+    updated = async_client.put(f"/bank_requests/{request_id}", json={"employee_id": 1, "status": "Approved"})
+    assert updated.json()["status"] == "Approved"
+
+    listed = async_client.get("/bank_requests/", params={"status": "Approved"})
+    assert [r["id"] for r in listed.json()] == [request_id]
+
+    assert async_client.delete(f"/bank_requests/{request_id}").status_code == 204
+    assert async_client.get(f"/bank_requests/{request_id}").status_code == 404
+
+
+def test_async_employees_with_statuses(async_client):
+    async_client.post("/dbs_checks/", json={"employee_id": 1, "status": "Cleared"})
+
+    response = async_client.get("/employees/1")
+    assert response.json()["dbs_check_statuses"] == ["Cleared"]
+
+    page = async_client.get("/employees/", params={"limit": 1})
+    assert page.json()[0]["first_name"] == "Ada"
+
+
+def test_sync_only_routes_fall_through(async_client):
+    # /employees/export has no async variant and must not hit /employees/{id}
+    response = async_client.get("/employees/export")
+    assert response.status_code == 200
+    assert '"first_name": "Ada"' in response.text
+
+
+def test_async_status_changes_are_audited(async_client, monkeypatch):
+    queued = []
+    monkeypatch.setattr(audit_writer, "enqueue", lambda bind, rows: queued.extend(rows))
+    request_id = async_client.post("/bank_requests/", json={"employee_id": 1, "status": "Pending"}).json()["id"]
+    async_client.put(f"/bank_requests/{request_id}", json={"status": "Approved"})
+
+    assert [(r["old_status"], r["new_status"], r["changed_by_username"]) for r in queued] == [
+        (None, "Pending", "hruser"),
+        ("Pending", "Approved", "hruser"),
+    ]
+
+
+def test_async_sparse_fields(async_client):
+    async_client.post("/bank_requests/", json={"employee_id": 1, "status": "Pending"})
+
+    listed = async_client.get("/bank_requests/", params={"fields": "status"})
+    assert listed.json() == [{"status": "Pending", "id": 1}]
+    detail = async_client.get("/employees/1", params={"fields": "first_name", "include": "bank_request_statuses"})
+    assert detail.json() == {"first_name": "Ada", "id": 1, "bank_request_statuses": ["Pending"]}
+    employees = async_client.get("/employees/", params={"fields": "last_name", "include": ""})
+    assert employees.json() == [{"last_name": "Lovelace", "id": 1}]
@@ -0,0 +1,146 @@
+import asyncio
+import time
+from datetime import date, datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from main import app
+from database import get_db
+from auth.auth import create_access_token
+from audit import AuditWriter, audit_writer
+from model import AuditLog, BankRequests, DBSChecks, HomeOfficeRequests
+
+
+def token_client(db_session, **claims):
+    app.dependency_overrides[get_db] = lambda: db_session
+    token = create_access_token({"sub": claims.pop("sub"), "role_id": None, "is_employee": True, **claims})
+    return TestClient(app, headers={"Authorization": f"Bearer {token}"})
+
+
+@pytest.fixture
+def hr_client(db_session):
+    yield token_client(db_session, sub="harriet", uid=7, is_hr=True)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def auditor(db_session):
+    yield token_client(db_session, sub="root", uid=1, is_hr=True, is_admin=True)
+    app.dependency_overrides.clear()
+
+
+def audit_rows(auditor, **params):
+    assert audit_writer.flush(timeout=5)
+    response = auditor.get("/audit/", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_status_change_is_recorded_with_its_author(hr_client, auditor, db_session):
+    db_session.add(BankRequests(employee_id=3, status="Pending", request_date=date(2025, 5, 1)))
+    db_session.commit()
+
+    assert hr_client.put("/bank_requests/1", json={"status": "Approved"}).status_code == 200
+    # Not a status change
+    assert hr_client.put("/bank_requests/1", json={"details": "checked"}).status_code == 200
+
+    created, approved = audit_rows(auditor)
+    assert (created["old_status"], created["new_status"], created["changed_by"]) == (None, "Pending", None)
+    assert approved["request_type"] == "bank_request"
+    assert approved["request_id"] == 1
+    assert approved["employee_id"] == 3
+    assert (approved["old_status"], approved["new_status"]) == ("Pending", "Approved")
+    assert (approved["changed_by"], approved["changed_by_username"]) == (7, "harriet")
+
+
+def test_create_delete_and_bulk_changes_are_recorded(hr_client, auditor, db_session):
+    assert hr_client.post(
+        "/dbs_checks/", json={"employee_id": 2, "status": "Requested", "request_date": "2025-05-01"}
+    ).status_code == 200
+    assert hr_client.post("/dbs_checks/bulk_status", json={"status": "Cleared", "ids": [1]}).status_code == 200
+    assert auditor.delete("/dbs_checks/1").status_code == 204
+
+    rows = audit_rows(auditor, request_type="dbs_check", request_id=1)
+    assert [(r["old_status"], r["new_status"], r["changed_by"]) for r in rows] == [
+        (None, "Requested", 7),
+        ("Requested", "Cleared", 7),
+        ("Cleared", None, 1),
+    ]
+
+
+def test_rolled_back_changes_are_not_recorded(auditor, db_session):
+    db_session.add(HomeOfficeRequests(employee_id=1, status="Pending"))
+    db_session.flush()
+    db_session.rollback()
+    assert audit_rows(auditor) == []
+
+
+def test_audit_log_is_paginated_and_filtered(auditor, db_session):
+    for i in range(3):
+        db_session.add(DBSChecks(employee_id=i, status="Requested"))
+        db_session.commit()
+
+    assert audit_writer.flush(timeout=5)
+    first = auditor.get("/audit/", params={"limit": 2})
+    assert [r["request_id"] for r in first.json()] == [1, 2]
+    after = first.headers["X-Next-Cursor"]
+    assert [r["request_id"] for r in audit_rows(auditor, after=after)] == [3]
+    assert [r["request_id"] for r in audit_rows(auditor, employee_id=1)] == [2]
+    assert audit_rows(auditor, changed_from="2999-01-01T00:00:00Z") == []
+
+
+def test_audit_log_requires_admin(hr_client):
+    assert hr_client.get("/audit/").status_code == 403
+
+
+def row(request_id):
+    return {
+        "request_type": "bank_request",
+        "request_id": request_id,
+        "new_status": "Pending",
+        "changed_at": datetime.now(timezone.utc),
+    }
+
+
+def written(db_engine):
+    with db_engine.connect() as conn:
+        return conn.scalars(select(AuditLog.request_id).order_by(AuditLog.id)).all()
+
+
+def test_writer_drops_entries_when_the_queue_is_full(db_engine):
+    writer = AuditWriter(max_size=2, batch_size=10, interval=3600, enqueue_timeout=0)
+    writer.enqueue(db_engine, [row(1), row(2), row(3)])
+    assert writer.stats()["queued"] == 2
+    assert writer.stats()["dropped"] == 1
+
+    writer.shutdown(timeout=5)
+    assert written(db_engine) == [1, 2]
+    assert writer.stats()["written"] == 2
+
+
+def test_writer_never_waits_on_the_event_loop(db_engine):
+    writer = AuditWriter(max_size=1, batch_size=10, interval=3600, enqueue_timeout=30)
+
+    async def commit_on_the_loop():
+        start = time.monotonic()
+        writer.enqueue(db_engine, [row(1), row(2)])
+        return time.monotonic() - start
+
+    assert asyncio.run(commit_on_the_loop()) < 1
+    assert writer.stats()["dropped"] == 1
+    writer.shutdown(timeout=5)
+    assert written(db_engine) == [1]
+
+
+def test_writer_flushes_full_batches_without_being_asked(db_engine):
+    writer = AuditWriter(max_size=10, batch_size=2, interval=3600)
+    writer.enqueue(db_engine, [row(1), row(2), row(3)])
+    deadline = time.monotonic() + 5
+    while writer.stats()["written"] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert writer.stats()["written"] == 2
+    assert writer.stats()["queued"] == 1
+    writer.shutdown(timeout=5)
+    assert written(db_engine) == [1, 2, 3]
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from test.benchmarks.bench_routers import compare
+
+ARGS = SimpleNamespace(tolerance=1.0, min_delta_ms=2.0)
+VOLUMES = {"employees": 500, "requests_per_type": 3}
+
+
+def results(**endpoints):
+    return {
+        "meta": {"volumes": VOLUMES},
+        "endpoints": {
+            name: {"p95_ms": p95, "throughput_rps": rps, "errors": 0, "first_error": None}
+            for name, (p95, rps) in endpoints.items()
+        },
+    }
+
+
+def test_compare_passes_within_tolerance():
+    baseline = results(list=(10.0, 200.0))
+    assert compare(results(list=(19.0, 110.0)), baseline, ARGS) == []
+
+
+def test_compare_flags_slower_p95_and_lower_throughput():
+    baseline = results(list=(10.0, 200.0), detail=(5.0, 300.0))
+    problems = compare(results(list=(25.0, 200.0), detail=(5.0, 90.0)), baseline, ARGS)
+    assert len(problems) == 2
+    assert problems[0].startswith("list: p95")
+    assert problems[1].startswith("detail: 90.0 rps")
+
+
+def test_compare_ignores_small_absolute_changes():
+    assert compare(results(list=(1.5, 200.0)), results(list=(0.5, 200.0)), ARGS) == []
+
+
+def test_compare_flags_errors_missing_endpoints_and_other_volumes():
+    current = results(list=(10.0, 200.0))
+    current["endpoints"]["list"].update(errors=3, first_error="GET /x: 500")
+    problems = compare(current, results(list=(10.0, 200.0), detail=(5.0, 300.0)), ARGS)
+    assert problems == ["list: 3 errors, e.g. GET /x: 500", "detail: missing from this run"]
+
+    other = results(list=(10.0, 200.0))
+    other["meta"]["volumes"] = {"employees": 50, "requests_per_type": 3}
+    assert "differ" in compare(results(list=(10.0, 200.0)), other, ARGS)[0]
+
+
+@pytest.mark.skipif(os.getenv("RUN_BENCHMARKS") != "1", reason="set RUN_BENCHMARKS=1")
+def test_routers_against_baseline(tmp_path):
+    # The benchmark configures the app through environment variables at import
+    # time, so it runs in its own interpreter
+    completed = subprocess.run(
+        [sys.executable, "-m", "test.benchmarks.bench_routers", "--output", str(tmp_path / "latest.json")],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+    )
+    assert completed.returncode == 0, completed.stderr[-4000:]
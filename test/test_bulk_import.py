@@ -0,0 +1,95 @@
+import json
+import time
+
+from sqlalchemy import event, select
+
+from functions_crud import bulk_insert
+from model import ChangeLog, Employee, BankRequests, DBSChecks, HomeOfficeRequests
+
+
+def seed_employee(db):
+    employee = Employee(user_id=1, first_name="Ada", last_name="Lovelace", email="ada@rcl.ac.uk")
+    db.add(employee)
+    db.commit()
+    return employee.id
+
+
+def test_csv_import_reports_row_errors(api_client, db_session):
+    employee_id = seed_employee(db_session)
+    content = (
+        "employee_id,request_date,status,details\n"
+        f"{employee_id},2025-03-01,Pending,first\n"
+        f"{employee_id},not-a-date,Pending,bad date\n"
+        "999,2025-03-02,Pending,unknown employee\n"
+        f"{employee_id},,Submitted,\n"
+    )
+
+    response = api_client.post(
+        "/dbs_checks/import", files={"file": ("checks.csv", content, "text/csv")}
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["inserted"] == 2
+    assert [err["row"] for err in body["errors"]] == [2, 3]
+    assert body["errors"][0]["errors"][0].startswith("request_date:")
+    checks = db_session.query(DBSChecks).order_by(DBSChecks.id).all()
+    assert [(c.status, c.details) for c in checks] == [("Pending", "first"), ("Submitted", None)]
+
+
+def test_ndjson_import_all_or_nothing(api_client, db_session):
+    employee_id = seed_employee(db_session)
+    lines = [
+        json.dumps({"employee_id": employee_id, "status": "Pending"}),
+        json.dumps({"status": "missing employee"}),
+    ]
+    files = {"file": ("requests.ndjson", "\n".join(lines), "application/x-ndjson")}
+
+    response = api_client.post("/home_office_requests/import", params={"all_or_nothing": True}, files=files)
+    assert response.json()["inserted"] == 0
+    assert db_session.query(HomeOfficeRequests).count() == 0
+
+    response = api_client.post("/home_office_requests/import", files=files)
+    assert response.json()["inserted"] == 1
+
+
+def test_unknown_format_is_rejected(api_client):
+    response = api_client.post("/bank_requests/import", files={"file": ("rows.txt", "x", "text/plain")})
+    assert response.status_code == 400
+
+
+def test_ten_thousand_rows_import_quickly(api_client, db_session):
+    employee_id = seed_employee(db_session)
+    content = "employee_id,status\n" + f"{employee_id},Pending\n" * 10_000
+
+    start = time.perf_counter()
+    response = api_client.post("/bank_requests/import", params={"format": "csv"}, files={"file": ("rows", content)})
+    elapsed = time.perf_counter() - start
+
+    assert response.json() == {"inserted": 10_000, "errors": []}
+    assert db_session.query(BankRequests).count() == 10_000
+    assert elapsed < 10
+
+
+def test_rows_committed_alongside_an_import_are_not_taken_for_it(db_session, db_engine):
+    employee_id = seed_employee(db_session)
+
+    # Another transaction's row lands while the import is running
+    stray = []
+
+    def concurrent_insert(conn, cursor, statement, *args):
+        if statement.startswith("INSERT INTO dbs_checks") and not stray:
+            stray.append(cursor.execute("INSERT INTO dbs_checks (status) VALUES ('Stray')").lastrowid)
+
+    event.listen(db_engine, "before_cursor_execute", concurrent_insert)
+    try:
+        bulk_insert(db_session, DBSChecks, [{"employee_id": employee_id, "status": "Pending"}] * 2)
+    finally:
+        event.remove(db_engine, "before_cursor_execute", concurrent_insert)
+    db_session.commit()
+
+    logged = db_session.scalars(
+        select(ChangeLog.entity_id).where(ChangeLog.entity_type == "dbs_check").order_by(ChangeLog.entity_id)
+    ).all()
+    assert stray == [1]
+    assert logged == [2, 3]
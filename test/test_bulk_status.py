@@ -0,0 +1,40 @@
+from datetime import date
+
+from model import BankRequests, HomeOfficeRequests
+
+
+def seed(db, model, count=4):
+    for i in range(count):
+        db.add(model(employee_id=1 + i % 2, status="Pending", request_date=date(2025, 5, i + 1)))
+    db.commit()
+
+
+def test_transition_by_ids_reports_missing(api_client, db_session):
+    seed(db_session, HomeOfficeRequests)
+
+    response = api_client.post(
+        "/home_office_requests/bulk_status", json={"status": "Approved", "ids": [1, 3, 42]}
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"updated": 2, "updated_ids": [1, 3], "missing_ids": [42]}
+    statuses = [r.status for r in db_session.query(HomeOfficeRequests).order_by(HomeOfficeRequests.id)]
+    assert statuses == ["Approved", "Pending", "Approved", "Pending"]
+
+
+def test_transition_by_filter(api_client, db_session):
+    seed(db_session, BankRequests)
+
+    response = api_client.post(
+        "/bank_requests/bulk_status",
+        json={"status": "Rejected", "filter": {"employee_id": 2, "request_date_to": "2025-05-02"}},
+    )
+
+    assert response.json() == {"updated": 1, "updated_ids": [2], "missing_ids": []}
+
+
+def test_ids_or_filter_required(api_client):
+    assert api_client.post("/dbs_checks/bulk_status", json={"status": "Cleared"}).status_code == 422
+    assert api_client.post(
+        "/dbs_checks/bulk_status", json={"status": "Cleared", "filter": {}}
+    ).status_code == 422
@@ -0,0 +1,101 @@
+from datetime import date
+
+from sqlalchemy.dialects import postgresql
+
+from aggregates import previous_values_query, rebuild
+from model import BankRequests, DBSChecks, Employee, HomeOfficeRequests, RequestStatusCount, User
+
+
+def seed_employees(db):
+    for i, department in enumerate(["Finance", "IT"], start=1):
+        user = User(username=f"user{i}", email=f"user{i}@rcl.ac.uk", password_hash="x")
+        db.add(Employee(user=user, first_name="A", last_name="B", email=user.email, department=department))
+    db.commit()
+
+
+def counts(db):
+    return {
+        (row.request_type, row.status, row.department): row.count
+        for row in db.query(RequestStatusCount)
+        if row.count
+    }
+
+
+def test_orm_writes_keep_counts_in_step(db_session):
+    seed_employees(db_session)
+    first = BankRequests(employee_id=1, status="Pending", request_date=date(2025, 5, 1))
+    db_session.add_all([first, BankRequests(employee_id=2, status="Pending"), DBSChecks(employee_id=1)])
+    db_session.commit()
+    assert counts(db_session) == {
+        ("bank_request", "Pending", "Finance"): 1,
+        ("bank_request", "Pending", "IT"): 1,
+        ("dbs_check", "", "Finance"): 1,
+    }
+
+    first.status = "Approved"
+    db_session.commit()
+    db_session.get(Employee, 2).department = "Finance"
+    db_session.commit()
+    db_session.delete(db_session.get(DBSChecks, 1))
+    db_session.commit()
+
+    expected = {("bank_request", "Approved", "Finance"): 1, ("bank_request", "Pending", "Finance"): 1}
+    assert counts(db_session) == expected
+    rebuild(db_session)
+    assert counts(db_session) == expected
+
+
+def test_deleting_an_employee_moves_their_requests_out_of_the_department(admin_client, db_session):
+    seed_employees(db_session)
+    db_session.add_all([
+        BankRequests(employee_id=1, status="Pending"),
+        BankRequests(employee_id=1, status="Approved"),
+        DBSChecks(employee_id=1),
+        HomeOfficeRequests(employee_id=1, status="Pending"),
+        BankRequests(employee_id=2, status="Pending"),
+    ])
+    db_session.commit()
+
+    assert admin_client.delete("/employees/1").status_code == 200
+
+    live = counts(db_session)
+    assert live == {
+        ("bank_request", "Pending", ""): 1,
+        ("bank_request", "Approved", ""): 1,
+        ("dbs_check", "", ""): 1,
+        ("home_office_request", "Pending", ""): 1,
+        ("bank_request", "Pending", "IT"): 1,
+    }
+    rebuild(db_session)
+    assert counts(db_session) == live
+
+
+def test_rollback_leaves_counts_alone(db_session):
+    seed_employees(db_session)
+    db_session.add(BankRequests(employee_id=1, status="Pending"))
+    db_session.flush()
+    db_session.rollback()
+    assert counts(db_session) == {}
+
+
+def test_bulk_paths_and_summary_endpoint(api_client, db_session):
+    seed_employees(db_session)
+    response = api_client.post(
+        "/bank_requests/import",
+        files={"file": ("rows.ndjson", b'{"employee_id": 1, "status": "Pending"}\n{"employee_id": 2, "status": "Pending"}\n')},
+    )
+    assert response.json()["inserted"] == 2
+    api_client.post("/bank_requests/bulk_status", json={"status": "Approved", "ids": [2]})
+
+    response = api_client.get("/dashboard/summary")
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"request_type": "bank_request", "status": "Approved", "department": "IT", "count": 1},
+        {"request_type": "bank_request", "status": "Pending", "department": "Finance", "count": 1},
+    ]
+
+
+def test_previous_values_are_read_with_a_row_lock():
+    query = previous_values_query(BankRequests, [1, 2])
+    assert "FOR UPDATE" in str(query.compile(dialect=postgresql.dialect()))
@@ -0,0 +1,54 @@
+import csv
+import io
+import json
+from datetime import date
+
+from model import Employee, BankRequests, DBSChecks, HomeOfficeRequests
+from routers.employees import EXPORT_FIELDS
+
+
+def seed_employees(db):
+    ada = Employee(user_id=1, first_name="Ada", last_name="Lovelace", email="ada@rcl.ac.uk", date_of_birth=date(1990, 12, 10))
+    alan = Employee(user_id=2, first_name="Alan", last_name="Turing", email="alan@rcl.ac.uk")
+    db.add_all([ada, alan])
+    db.commit()
+    db.add_all(
+        [
+            BankRequests(employee_id=ada.id, status="Pending"),
+            BankRequests(employee_id=ada.id, status="Approved"),
+            DBSChecks(employee_id=ada.id, status="Cleared"),
+            HomeOfficeRequests(employee_id=alan.id, status="Submitted"),
+        ]
+    )
+    db.commit()
+
+
+def test_export_ndjson(api_client, db_session):
+    seed_employees(db_session)
+
+    response = api_client.get("/employees/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["first_name"] for r in rows] == ["Ada", "Alan"]
+    assert rows[0]["date_of_birth"] == "1990-12-10"
+    assert rows[0]["bank_request_statuses"] == ["Pending", "Approved"]
+    assert rows[0]["dbs_check_statuses"] == ["Cleared"]
+    assert rows[1]["home_office_request_statuses"] == ["Submitted"]
+
+
+def test_export_csv(api_client, db_session):
+    seed_employees(db_session)
+
+    response = api_client.get("/employees/export", params={"format": "csv"})
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [r["last_name"] for r in rows] == ["Lovelace", "Turing"]
+    assert rows[0]["bank_request_statuses"] == "Pending;Approved"
+    assert rows[1]["bank_request_statuses"] == ""
+
+
+def test_export_csv_of_no_employees_has_a_header(api_client):
+    response = api_client.get("/employees/export", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.text.splitlines() == [",".join(EXPORT_FIELDS)]
@@ -0,0 +1,204 @@
+import threading
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from main import app
+from database import get_db
+from auth.dependencies import get_current_user
+from auth.identity_cache import Principal
+from database import create_schema
+from model import Employee
+from search import TrigramIndex, search_employees, search_postgresql, trigram_index
+from versions import bump_versions
+
+PEOPLE = [
+    ("John", "Smith", "john.smith@rcl.ac.uk", "AB123456C", "Finance"),
+    ("Johanna", "Smyth", "jo.smyth@rcl.ac.uk", None, "HR"),
+    ("Bob", "Johnson", "bob.johnson@rcl.ac.uk", "CD654321A", "Finance"),
+    ("Priya", "Patel", "priya.patel@rcl.ac.uk", None, "Computing"),
+]
+
+
+def add_people(db_session):
+    for user_id, (first, last, email, ni, department) in enumerate(PEOPLE, start=1):
+        db_session.add(
+            Employee(
+                user_id=user_id,
+                first_name=first,
+                last_name=last,
+                email=email,
+                national_insurance_number=ni,
+                department=department,
+            )
+        )
+    db_session.commit()
+
+
+def names(response):
+    return [f"{e['first_name']} {e['last_name']}" for e in response.json()]
+
+
+def test_exact_and_prefix_matches_rank_first(api_client, db_session):
+    add_people(db_session)
+    response = api_client.get("/employees/search", params={"q": "John"})
+    assert response.status_code == 200
+    # Exact first name, then a last-name prefix, then the fuzzy "Johanna"
+    assert names(response) == ["John Smith", "Bob Johnson", "Johanna Smyth"]
+    assert response.json()[0]["bank_request_statuses"] == []
+
+
+def test_matches_email_ni_number_and_department(api_client, db_session):
+    add_people(db_session)
+    assert names(api_client.get("/employees/search", params={"q": "priya.patel@"})) == ["Priya Patel"]
+    assert names(api_client.get("/employees/search", params={"q": "cd6543"})) == ["Bob Johnson"]
+    assert names(api_client.get("/employees/search", params={"q": "finance"})) == ["John Smith", "Bob Johnson"]
+
+
+def test_fuzzy_match_tolerates_a_typo(api_client, db_session):
+    add_people(db_session)
+    assert names(api_client.get("/employees/search", params={"q": "Pattel"})) == ["Priya Patel"]
+
+
+def test_results_are_paginated_with_a_cursor(api_client, db_session):
+    add_people(db_session)
+    first = api_client.get("/employees/search", params={"q": "finance", "limit": 1})
+    assert names(first) == ["John Smith"]
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = api_client.get("/employees/search", params={"q": "finance", "limit": 1, "after": cursor})
+    assert names(second) == ["Bob Johnson"]
+    assert "X-Next-Cursor" not in second.headers
+
+
+def test_index_follows_writes(api_client, db_session):
+    add_people(db_session)
+    assert names(api_client.get("/employees/search", params={"q": "computing"})) == ["Priya Patel"]
+
+    priya = db_session.query(Employee).filter(Employee.first_name == "Priya").one()
+    priya.department = "Law"
+    db_session.commit()
+
+    assert api_client.get("/employees/search", params={"q": "computing"}).json() == []
+    assert names(api_client.get("/employees/search", params={"q": "law"})) == ["Priya Patel"]
+
+
+def test_invalid_input(api_client):
+    assert api_client.get("/employees/search", params={"q": "j"}).status_code == 422
+    assert api_client.get("/employees/search", params={"q": "jo", "after": "bm9wZQ"}).status_code == 400
+
+
+def test_search_requires_hr(db_session):
+    employee = Principal(id=5, username="emp", role_id=None, is_employee=True)
+    app.dependency_overrides[get_db] = lambda: db_session
+    app.dependency_overrides[get_current_user] = lambda: employee
+    try:
+        assert TestClient(app).get("/employees/search", params={"q": "john"}).status_code == 403
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_trigram_index_cursor():
+    index = TrigramIndex()
+    index.build([(1, "Ann", "Lee", "", None, ""), (2, "Ann", "Ray", "", None, ""), (3, "Anna", "Lee", "", None, "")], 1)
+    assert index.search("ann", 2) == [(1.0, 1), (1.0, 2)]
+    assert index.search("ann", 2, after=(1.0, 2)) == [(0.9, 3)]
+
+
+def test_trigram_index_tiers():
+    index = TrigramIndex()
+    index.build(
+        [
+            (1, "Mary", "Le Ann", "mary@x.com", None, "Law"),
+            (2, "Annabel", "Lee", "annabel@x.com", None, "Law"),
+            (3, "Joanne", "Ray", "jo@x.com", None, "Law"),
+            (4, "Ann", "Ray", "ann@x.com", None, "Law"),
+            (5, "Anm", "Ray", "z@x.com", None, "Law"),
+        ],
+        1,
+    )
+    assert index.search("ann", 10) == [(1.0, 4), (0.9, 2), (0.8, 1), (0.6, 3)]
+    assert index.search("mary le", 10) == [(0.8, 1)]
+    # The substring tier resumes after the cursor
+    assert index.search("ann", 10, after=(0.6, 2)) == [(0.6, 3)]
+    assert [employee_id for _, employee_id in index.search("annabell", 10)] == [2]
+
+
+def test_pending_changes_are_scored_like_the_index():
+    rows = [
+        (1, "Mary", "Le Ann", "mary@x.com", None, "Law"),
+        (2, "Annabel", "Lee", "annabel@x.com", None, "Law"),
+        (3, "Joanne", "Ray", "jo@x.com", None, "Law"),
+        (4, "Ann", "Ray", "ann@x.com", None, "Law"),
+        (5, "Anm", "Ray", "z@x.com", None, "Law"),
+    ]
+    built, pending = TrigramIndex(), TrigramIndex()
+    built.build(rows, 1)
+    pending.build([], 1)
+    pending.apply({id_: tuple((f or "").lower() for f in fields) for id_, *fields in rows})
+    for query in ("ann", "mary le", "annabell", "law", "ray"):
+        assert pending.search(query, 10) == built.search(query, 10)
+        assert pending.search(query, 2, after=(0.9, 2)) == built.search(query, 2, after=(0.9, 2))
+
+    built.apply({4: None, 3: ("ann", "ray", "", "", "law")})
+    assert built.search("ann", 10) == [(1.0, 3), (0.9, 2), (0.8, 1)]
+
+
+def test_rebuilds_run_in_the_background(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    create_schema(engine)
+    with Session(engine) as db:
+        db.add(Employee(user_id=1, first_name="Priya", last_name="Patel", email="p@x.com"))
+        db.commit()
+        assert search_employees(db, "patel", 10) == [(1.0, 1)]
+
+    release = threading.Event()
+    read_and_build = trigram_index._read_and_build
+
+    def slow_read_and_build(db, version):
+        release.wait(5)
+        read_and_build(db, version)
+
+    trigram_index._read_and_build = slow_read_and_build
+    try:
+        with Session(engine) as db:
+            # Written here: seen at once, while the rebuild waits
+            db.add(Employee(user_id=2, first_name="Ravi", last_name="Patel", email="r@x.com"))
+            db.commit()
+            assert search_employees(db, "patel", 10) == [(1.0, 1), (1.0, 2)]
+            assert trigram_index._thread.is_alive()
+
+            # Written by another worker: seen once the rebuild has read it
+            with engine.begin() as conn:
+                conn.execute(insert(Employee).values(user_id=3, first_name="Asha", last_name="Patel", email="a@x.com"))
+                bump_versions(conn, [Employee.__tablename__])
+            assert search_employees(db, "patel", 10) == [(1.0, 1), (1.0, 2)]
+            release.set()
+            trigram_index._thread.join()
+            assert search_employees(db, "patel", 10) == [(1.0, 1), (1.0, 2), (1.0, 3)]
+    finally:
+        del trigram_index._read_and_build
+        engine.dispose()
+
+
+class RecordingSession:
+    def execute(self, stmt):
+        self.stmt = stmt
+        return self
+
+    def all(self):
+        return []
+
+
+def test_postgresql_query_uses_the_trigram_index_expression():
+    db = RecordingSession()
+    search_postgresql(db, "smith", 10, after=(0.9, 3))
+    sql = str(db.stmt.compile(dialect=postgresql.dialect()))
+    # Must repeat the expression of ix_employees_search_trgm verbatim
+    assert (
+        "lower(coalesce(employees.first_name, '') || ' ' || coalesce(employees.last_name, '')"
+        in sql
+    )
+    assert "<%" in sql and "LIKE" in sql
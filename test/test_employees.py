@@ -0,0 +1,80 @@
+from sqlalchemy import event
+
+from model import Employee, BankRequests, DBSChecks, HomeOfficeRequests
+
+
+def seed_employees(db, count=3, per_type=2):
+    for i in range(count):
+        employee = Employee(user_id=i + 1, first_name=f"First{i}", last_name=f"Last{i}", email=f"e{i}@rcl.ac.uk")
+        db.add(employee)
+        db.flush()
+        for j in range(per_type):
+            db.add_all(
+                [
+                    BankRequests(employee_id=employee.id, status=f"bank-{j}"),
+                    DBSChecks(employee_id=employee.id, status=f"dbs-{j}"),
+                    HomeOfficeRequests(employee_id=employee.id, status=f"ho-{j}"),
+                ]
+            )
+    db.commit()
+    db.expunge_all()
+
+
+class StatementRecorder:
+    """Capture every SELECT sent to the engine so it can be counted and replayed."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        event.listen(engine, "before_cursor_execute", self.record)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((statement, parameters))
+
+    def rows_returned(self):
+        event.remove(self.engine, "before_cursor_execute", self.record)
+        with self.engine.connect() as conn:
+            return sum(
+                len(conn.exec_driver_sql(statement, parameters).fetchall())
+                for statement, parameters in self.statements
+            )
+
+
+def loaded_requests(db):
+    return [
+        obj
+        for obj in db.identity_map.values()
+        if isinstance(obj, (BankRequests, DBSChecks, HomeOfficeRequests))
+    ]
+
+
+def test_read_employees_uses_set_based_status_loader(api_client, db_session, db_engine):
+    seed_employees(db_session, count=3, per_type=2)
+    recorder = StatementRecorder(db_engine)
+
+    response = api_client.get("/employees/")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body) == 3
+    assert body[0]["bank_request_statuses"] == ["bank-0", "bank-1"]
+    assert body[2]["home_office_request_statuses"] == ["ho-0", "ho-1"]
+    # One ETag version lookup, one query for the employees page, one for all their statuses
+    assert len(recorder.statements) == 3
+    # 4 table versions + 3 employee rows + 3 * 3 * 2 status rows, not the 3 * 2**3 cartesian product
+    assert recorder.rows_returned() == 4 + 3 + 18
+    assert loaded_requests(db_session) == []
+
+
+def test_read_employee_detail_query_count(api_client, db_session, db_engine):
+    seed_employees(db_session, count=2, per_type=3)
+    recorder = StatementRecorder(db_engine)
+
+    response = api_client.get("/employees/2")
+
+    assert response.status_code == 200
+    assert response.json()["dbs_check_statuses"] == ["dbs-0", "dbs-1", "dbs-2"]
+    assert len(recorder.statements) == 3
+    assert recorder.rows_returned() == 4 + 1 + 9
+    assert loaded_requests(db_session) == []
@@ -0,0 +1,82 @@
+from sqlalchemy import event
+
+from model import BankRequests, Employee
+from versions import versions_query
+from response_cache import response_cache
+
+
+def test_unchanged_list_returns_304_without_querying(api_client, db_session, db_engine, monkeypatch):
+    # Exercise the version check itself rather than a response-cache hit
+    monkeypatch.setattr(response_cache, "enabled", False)
+    db_session.add(BankRequests(employee_id=1, status="Pending"))
+    db_session.commit()
+
+    first = api_client.get("/bank_requests/")
+    etag = first.headers["ETag"]
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db_engine, "before_cursor_execute", record)
+    second = api_client.get("/bank_requests/", headers={"If-None-Match": etag})
+    event.remove(db_engine, "before_cursor_execute", record)
+
+    assert second.status_code == 304
+    assert second.headers["ETag"] == etag
+    assert second.content == b""
+    # Only the version lookup ran
+    assert len(statements) == 1 and "table_versions" in statements[0]
+
+
+def test_write_changes_etag(api_client, db_session):
+    db_session.add(BankRequests(employee_id=1, status="Pending"))
+    db_session.commit()
+    etag = api_client.get("/bank_requests/1").headers["ETag"]
+
+    api_client.put("/bank_requests/1", json={"employee_id": 1, "status": "Approved"})
+
+    response = api_client.get("/bank_requests/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["status"] == "Approved"
+    assert response.headers["ETag"] != etag
+
+
+def test_employee_etag_follows_request_tables(api_client, db_session):
+    db_session.add(Employee(user_id=1, first_name="A", last_name="B", email="a@rcl.ac.uk"))
+    db_session.commit()
+    etag = api_client.get("/employees/").headers["ETag"]
+    assert api_client.get("/employees/", headers={"If-None-Match": etag}).status_code == 304
+
+    api_client.post("/bank_requests/bulk_status", json={"status": "Approved", "ids": [1]})
+    assert api_client.get("/employees/", headers={"If-None-Match": etag}).status_code == 304
+
+    db_session.add(BankRequests(employee_id=1, status="Pending"))
+    db_session.commit()
+    assert api_client.get("/employees/", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_counters_are_bumped_once_at_commit_in_table_order(db_session, db_engine):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, *args):
+        # The change_log revision counter is not a table version (changelog.py)
+        if "table_versions" in statement and "change_log" not in str(parameters):
+            statements.append(parameters)
+
+    event.listen(db_engine, "before_cursor_execute", record)
+    try:
+        db_session.add(Employee(user_id=1, first_name="Ada", last_name="Lovelace", email="ada@rcl.ac.uk"))
+        db_session.flush()
+        db_session.add(BankRequests(employee_id=1, status="Pending"))
+        db_session.flush()
+        # Nothing locked while the transaction is still writing
+        assert statements == []
+        db_session.commit()
+    finally:
+        event.remove(db_engine, "before_cursor_execute", record)
+
+    assert len(statements) == 1
+    assert [row[0] for row in statements[0]] == ["bank_requests", "employees"]
+    versions = dict(db_session.execute(versions_query(["bank_requests", "employees"])).all())
+    assert versions == {"bank_requests": 1, "employees": 1}
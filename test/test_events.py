@@ -0,0 +1,285 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from main import app
+from database import get_db
+from auth.auth import create_access_token
+from auth.identity_cache import token_revocations
+from auth.stream_tickets import StreamGrant, redeem_ticket
+from events import ChangeBroker, change_broker
+from model import BankRequests, DBSChecks, Employee
+from routers.events import sse_messages
+
+
+def token(**claims):
+    return create_access_token({"role_id": None, "is_employee": True, **claims})
+
+
+def grant(expires_in=3600, authorised_at=None):
+    now = time.time()
+    return StreamGrant(7, None, None, True, authorised_at or now, now + expires_in)
+
+
+def ticket_for(client, access_token):
+    response = client.post("/events/ticket", headers={"Authorization": f"Bearer {access_token}"})
+    assert response.status_code == 200
+    return response.json()["ticket"]
+
+
+@pytest.fixture
+def client(db_session):
+    app.dependency_overrides[get_db] = lambda: db_session
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def change(id_, employee_id, status="Approved"):
+    return {"type": "bank_request", "op": "updated", "id": id_, "employee_id": employee_id, "status": status}
+
+
+def encoded(events):
+    return json.dumps({"events": events}, separators=(",", ":"))
+
+
+def received(subscriber):
+    messages = []
+    while not subscriber.queue.empty():
+        seq, data = subscriber.queue.get_nowait()
+        messages.append((seq, json.loads(data)["events"]))
+    return messages
+
+
+def test_broker_filters_by_audience_and_encodes_once():
+    async def scenario():
+        broker = ChangeBroker()
+        hr = broker.subscribe(None, everything=True)
+        admin = broker.subscribe(None, everything=True)
+        employee = broker.subscribe(5, everything=False)
+        stranger = broker.subscribe(None, everything=False)
+        broker.publish([change(1, 5), change(2, 6)])
+        await asyncio.sleep(0)
+
+        assert hr.queue.get_nowait() is admin.queue.get_nowait()
+        assert received(employee) == [(1, [change(1, 5)])]
+        assert stranger.queue.empty()
+
+    asyncio.run(scenario())
+
+
+def test_broker_delivers_batches_published_from_other_threads():
+    async def scenario():
+        broker = ChangeBroker()
+        subscriber = broker.subscribe(None, everything=True)
+        thread = threading.Thread(target=broker.publish, args=([change(1, 5)],))
+        thread.start()
+        thread.join()
+        assert await asyncio.wait_for(subscriber.queue.get(), 5) == (1, encoded([change(1, 5)]))
+
+    asyncio.run(scenario())
+
+
+def test_batches_published_concurrently_arrive_in_order():
+    async def scenario():
+        broker = ChangeBroker()
+        subscriber = broker.subscribe(None, everything=True)
+        loop = broker._loop
+        other = threading.Thread(target=broker.publish, args=([change(2, 5)],))
+
+        class InterleavingLoop:
+            """Lets another thread publish while batch 1 is being scheduled."""
+
+            def is_closed(self):
+                return False
+
+            def call_soon_threadsafe(self, callback, batch):
+                if batch[0] == 1:
+                    other.start()
+                    other.join(0.2)
+                loop.call_soon_threadsafe(callback, batch)
+
+        broker._loop = InterleavingLoop()
+        publisher = threading.Thread(target=broker.publish, args=([change(1, 5)],))
+        publisher.start()
+        while publisher.is_alive() or other.is_alive():
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0)
+        assert [seq for seq, _ in received(subscriber)] == [1, 2]
+
+    asyncio.run(scenario())
+
+
+def test_slow_subscriber_gets_a_resync_instead_of_the_backlog():
+    async def scenario():
+        broker = ChangeBroker(queue_size=2)
+        subscriber = broker.subscribe(None, everything=True)
+        for i in range(3):
+            broker.publish([change(i, 5)])
+        await asyncio.sleep(0)
+
+        assert received(subscriber) == [(3, [{"op": "resync"}])]
+        assert broker.stats()["resyncs"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_reconnecting_subscriber_replays_what_it_missed():
+    async def scenario():
+        broker = ChangeBroker(replay_size=2)
+        for i in range(1, 4):
+            broker.publish([change(i, 5 if i != 3 else 6)])
+
+        employee = broker.subscribe(5, everything=False, last_event_id=1)
+        assert received(employee) == [(2, [change(2, 5)])]
+        # Batch 1 is no longer kept
+        too_old = broker.subscribe(5, everything=False, last_event_id=0)
+        assert received(too_old) == [(3, [{"op": "resync"}])]
+
+        broker.publish([change(4, 5)])
+        await asyncio.sleep(0)
+        assert received(employee) == [(4, [change(4, 5)])]
+
+    asyncio.run(scenario())
+
+
+def test_broker_refuses_subscribers_over_the_limit_and_ends_streams_on_close():
+    async def scenario():
+        broker = ChangeBroker(max_subscribers=1)
+        subscriber = broker.subscribe(None, everything=True)
+        assert broker.subscribe(None, everything=True) is None
+
+        broker.close()
+        await asyncio.sleep(0)
+        assert subscriber.queue.get_nowait() is None
+        assert broker.stats()["subscribers"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_commits_publish_events_and_rollbacks_do_not(db_session):
+    db_session.add(BankRequests(employee_id=3, status="Pending", request_date=date(2025, 5, 1)))
+    db_session.commit()
+    request = db_session.get(BankRequests, 1)
+    request.status = "Approved"
+    db_session.commit()
+    db_session.add(DBSChecks(employee_id=3, status="Requested"))
+    db_session.flush()
+    db_session.rollback()
+    db_session.delete(db_session.get(BankRequests, 1))
+    db_session.commit()
+
+    async def replay():
+        return received(change_broker.subscribe(None, everything=True, last_event_id=0))
+
+    assert asyncio.run(replay()) == [
+        (1, [{"type": "bank_request", "op": "created", "id": 1, "employee_id": 3, "status": "Pending"}]),
+        (2, [change(1, 3)]),
+        (3, [{"type": "bank_request", "op": "deleted", "id": 1, "employee_id": 3}]),
+    ]
+
+
+def test_websocket_pushes_changes_to_hr_and_to_the_employee_concerned(client, db_session):
+    db_session.add(Employee(user_id=20, first_name="Emma", last_name="Lee", email="emma@rcl.ac.uk"))
+    db_session.add_all([
+        BankRequests(employee_id=2, status="Pending"),
+        BankRequests(employee_id=1, status="Pending"),
+    ])
+    db_session.commit()
+    hr = {"Authorization": f"Bearer {token(sub='harriet', uid=7, is_hr=True)}"}
+    emma = ticket_for(client, token(sub="emma", uid=20))
+
+    with client.websocket_connect("/events/ws", headers=hr) as hr_socket, client.websocket_connect(
+        f"/events/ws?ticket={emma}"
+    ) as emma_socket:
+        assert client.put("/bank_requests/1", json={"status": "Approved"}, headers=hr).status_code == 200
+        assert client.post(
+            "/bank_requests/bulk_status", json={"status": "Approved", "ids": [2]}, headers=hr
+        ).status_code == 200
+
+        # Batch 1 was the setup commit
+        assert hr_socket.receive_json() == {"id": 2, "events": [change(1, 2)]}
+        assert hr_socket.receive_json() == {"id": 3, "events": [change(2, 1)]}
+        # The first change was to someone else's request
+        assert emma_socket.receive_json() == {"id": 3, "events": [change(2, 1)]}
+
+
+def test_websocket_rejects_a_bad_ticket(client):
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect("/events/ws?ticket=nope"):
+            pass
+    assert closed.value.code == 1008
+
+
+def test_event_stream_requires_a_token_or_ticket(client):
+    assert client.get("/events/stream").status_code == 401
+    # Access tokens are not accepted in the URL
+    access_token = token(sub="emma", uid=20)
+    assert client.get(f"/events/stream?access_token={access_token}").status_code == 401
+
+
+def test_tickets_are_single_use_and_short_lived(client, db_session, monkeypatch):
+    db_session.add(Employee(user_id=20, first_name="Emma", last_name="Lee", email="emma@rcl.ac.uk"))
+    db_session.commit()
+    ticket = ticket_for(client, token(sub="emma", uid=20))
+
+    redeemed = redeem_ticket(db_session, ticket)
+    assert (redeemed.user_id, redeemed.employee_id, redeemed.everything) == (20, 1, False)
+    assert redeemed.token_expires_at > time.time() + 3000
+    assert redeem_ticket(db_session, ticket) is None
+
+    monkeypatch.setattr("auth.stream_tickets.STREAM_TICKET_SECONDS", -1)
+    assert redeem_ticket(db_session, ticket_for(client, token(sub="emma", uid=20))) is None
+
+
+def test_websocket_is_closed_when_its_caller_changes(client, db_session):
+    hr = {"Authorization": f"Bearer {token(sub='harriet', uid=7, is_hr=True)}"}
+    with client.websocket_connect("/events/ws", headers=hr) as hr_socket:
+        db_session.add(BankRequests(employee_id=2, status="Pending"))
+        db_session.commit()
+        assert hr_socket.receive_json()["id"] == 1
+
+        token_revocations.revoke_users([7], time.time() + 1)
+        db_session.add(BankRequests(employee_id=2, status="Pending"))
+        db_session.commit()
+        with pytest.raises(WebSocketDisconnect) as closed:
+            hr_socket.receive_json()
+    assert closed.value.code == 1008
+
+
+def test_event_stream_ends_when_its_token_expires_or_is_revoked():
+    async def scenario():
+        broker = ChangeBroker()
+        expiring = sse_messages(broker.subscribe(None, everything=True), grant(expires_in=0.05), heartbeat=0.01)
+        assert await anext(expiring) == ": keepalive\n\n"
+        await asyncio.sleep(0.05)
+        assert await anext(expiring) == "event: expired\ndata: {}\n\n"
+        with pytest.raises(StopAsyncIteration):
+            await anext(expiring)
+
+        revoked = sse_messages(broker.subscribe(None, everything=True), grant(authorised_at=time.time() - 10))
+        token_revocations.revoke_users([7])
+        broker.publish([change(1, 5)])
+        assert await anext(revoked) == "event: expired\ndata: {}\n\n"
+
+    asyncio.run(scenario())
+
+
+def test_event_stream_format():
+    async def scenario():
+        broker = ChangeBroker()
+        subscriber = broker.subscribe(None, everything=True)
+        messages = sse_messages(subscriber, grant(), heartbeat=0.01)
+        assert await anext(messages) == ": keepalive\n\n"
+        broker.publish([change(1, 5)])
+        assert await anext(messages) == f"id: 1\nevent: changes\ndata: {encoded([change(1, 5)])}\n\n"
+        broker.close()
+        with pytest.raises(StopAsyncIteration):
+            await anext(messages)
+
+    asyncio.run(scenario())
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from database import get_db
+from auth.auth import create_access_token
+from auth.identity_cache import IdentityCache, Principal, identity_cache
+from model import Role, User
+
+
+@pytest.fixture
+def roles(db_session):
+    hr = Role(role_name="hr", is_hr=True, is_admin=False, is_employee=True)
+    employee = Role(role_name="employee", is_hr=False, is_admin=False, is_employee=True)
+    db_session.add_all([hr, employee])
+    db_session.commit()
+    return hr, employee
+
+
+@pytest.fixture
+def token_client(db_session, roles):
+    db_session.add(User(username="carol", email="carol@rcl.ac.uk", password_hash="x", role_id=roles[0].id))
+    db_session.commit()
+    app.dependency_overrides[get_db] = lambda: db_session
+    client = TestClient(app)
+    client.headers["Authorization"] = "Bearer " + create_access_token({"sub": "carol"})
+    yield client
+    app.dependency_overrides.clear()
+
+
+def test_second_request_is_served_from_cache(token_client):
+    assert token_client.get("/bank_requests/").status_code == 200
+    assert token_client.get("/bank_requests/").status_code == 200
+
+    stats = identity_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+    assert stats["size"] == 1
+
+
+def test_role_change_invalidates_cached_principal(token_client, db_session, roles):
+    body = {"employee_id": 1, "status": "Pending"}
+    assert token_client.post("/bank_requests/", json=body).status_code == 200
+
+    user = db_session.query(User).filter(User.username == "carol").one()
+    user.role_id = roles[1].id
+    db_session.commit()
+
+    assert identity_cache.stats()["size"] == 0
+    assert token_client.post("/bank_requests/", json=body).status_code == 403
+
+
+def test_unknown_user_is_rejected(token_client):
+    token_client.headers["Authorization"] = "Bearer " + create_access_token({"sub": "nobody"})
+    assert token_client.get("/bank_requests/").status_code == 401
+
+
+def test_lru_eviction_and_ttl():
+    cache = IdentityCache(ttl_seconds=60, max_size=2)
+    for i in range(3):
+        cache.put(Principal(id=i, username=f"user{i}", role_id=None))
+
+    assert cache.get("user0") is None
+    assert cache.get("user2").id == 2
+    assert cache.stats()["evictions"] == 1
+
+    expiring = IdentityCache(ttl_seconds=0.01, max_size=2)
+    expiring.put(Principal(id=1, username="user1", role_id=None))
+    time.sleep(0.02)
+    assert expiring.get("user1") is None
@@ -0,0 +1,87 @@
+import re
+
+import pytest
+
+import routers.metrics
+from metrics import Histogram, route_metrics
+from model import BankRequests
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    route_metrics.reset()
+    yield
+    route_metrics.reset()
+
+
+def server_timing(response):
+    return {
+        name: float(duration)
+        for name, duration in re.findall(r"(\w+);dur=([\d.]+)", response.headers["Server-Timing"])
+    }
+
+
+def test_server_timing_header_breaks_down_the_request(api_client, db_session):
+    db_session.add(BankRequests(employee_id=1, status="Pending"))
+    db_session.commit()
+
+    response = api_client.get("/bank_requests/1")
+
+    assert response.status_code == 200
+    timing = server_timing(response)
+    assert set(timing) == {"total", "db", "auth", "serialize"}
+    assert timing["db"] > 0 and timing["serialize"] > 0
+    assert timing["total"] >= timing["db"]
+    assert re.search(r'db;dur=[\d.]+;desc="[1-9]\d* statements"', response.headers["Server-Timing"])
+
+
+def test_metrics_endpoint_reports_route_histograms(api_client, db_session, monkeypatch):
+    monkeypatch.setattr(routers.metrics, "METRICS_PUBLIC", True)
+    db_session.add(BankRequests(employee_id=1, status="Pending"))
+    db_session.commit()
+    api_client.get("/bank_requests/")
+    api_client.get("/bank_requests/1")
+    api_client.get("/bank_requests/2")
+    api_client.get("/no/such/path")
+
+    response = api_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    # Labelled by route template, not by the concrete path
+    assert 'http_responses_total{method="GET",route="/bank_requests/{request_id}",status="200"} 1' in body
+    assert 'http_responses_total{method="GET",route="/bank_requests/{request_id}",status="404"} 1' in body
+    assert 'route="unmatched",status="404"} 1' in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/bank_requests/"} 1' in body
+    assert 'http_request_db_statements_bucket{method="GET",route="/bank_requests/",le="+Inf"} 1' in body
+    assert 'http_request_serialize_seconds_sum{method="GET",route="/bank_requests/"}' in body
+
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(routers.metrics, "METRICS_TOKEN", "scrape-me")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer nope"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer scrape-me"}).status_code == 200
+
+
+def test_metrics_are_closed_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(routers.metrics, "METRICS_TOKEN", None)
+    assert client.get("/metrics").status_code == 403
+    monkeypatch.setattr(routers.metrics, "METRICS_PUBLIC", True)
+    assert client.get("/metrics").status_code == 200
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("h", "Help.", (1, 5))
+    for value in (0.5, 1, 3, 7):
+        histogram.observe(("GET", "/x"), value)
+    lines = []
+    histogram.render(("method", "route"), lines)
+    assert lines[2:] == [
+        'h_bucket{method="GET",route="/x",le="1"} 2',
+        'h_bucket{method="GET",route="/x",le="5"} 3',
+        'h_bucket{method="GET",route="/x",le="+Inf"} 4',
+        'h_sum{method="GET",route="/x"} 11.5',
+        'h_count{method="GET",route="/x"} 4',
+    ]
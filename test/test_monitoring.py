@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from database import TimedQueuePool, pool_options, pool_wait_stats
+
+
+def test_pool_options_skip_in_memory_sqlite(tmp_path):
+    assert pool_options("sqlite://") == {}
+    options = pool_options(f"sqlite:///{tmp_path / 'file.db'}")
+    assert options["poolclass"] is TimedQueuePool
+    assert options["pool_pre_ping"] is True
+
+
+def test_timed_pool_records_checkout_waits(tmp_path):
+    url = f"sqlite:///{tmp_path / 'file.db'}"
+    engine = create_engine(url, **pool_options(url))
+    before = pool_wait_stats.snapshot()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        assert engine.pool.checkedout() == 1
+    after = pool_wait_stats.snapshot()
+    assert after["checkouts"] == before["checkouts"] + 1
+    assert after["connects"] == before["connects"] + 1
+    engine.dispose()
+
+
+def test_timed_pool_counts_checkout_timeouts(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'file.db'}", poolclass=TimedQueuePool,
+        pool_size=1, max_overflow=0, pool_timeout=0.05,
+    )
+    before = pool_wait_stats.snapshot()["timeouts"]
+    with engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+    assert pool_wait_stats.snapshot()["timeouts"] == before + 1
+    assert pool_wait_stats.snapshot()["max_wait_ms"] >= 50
+    engine.dispose()
+
+
+def test_pool_gauges_endpoint(admin_client):
+    response = admin_client.get("/monitoring/pool")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["threadpool"]["limit"] > 0
+    assert "avg_wait_ms" in body["pool"]
+
+
+def test_monitoring_requires_admin(api_client):
+    assert api_client.get("/monitoring/pool").status_code == 403
@@ -0,0 +1,83 @@
+from datetime import date
+
+from model import Employee, BankRequests, DBSChecks, HomeOfficeRequests
+from pagination import NEXT_CURSOR_HEADER
+
+
+def seed_requests(db, model, count=5):
+    employee = Employee(user_id=1, first_name="Ada", last_name="Lovelace", email="ada@rcl.ac.uk")
+    other = Employee(user_id=2, first_name="Alan", last_name="Turing", email="alan@rcl.ac.uk")
+    db.add_all([employee, other])
+    db.commit()
+    for i in range(count):
+        db.add(
+            model(
+                employee_id=employee.id if i % 2 == 0 else other.id,
+                request_date=date(2025, 1, i + 1),
+                status="Pending" if i < 3 else "Approved",
+                details=f"request {i}",
+            )
+        )
+    db.commit()
+    return employee, other
+
+
+def test_bank_requests_keyset_pages(api_client, db_session):
+    seed_requests(db_session, BankRequests)
+
+    first = api_client.get("/bank_requests/", params={"limit": 2})
+    assert first.status_code == 200
+    assert [r["id"] for r in first.json()] == [1, 2]
+    assert first.headers[NEXT_CURSOR_HEADER] == "2"
+
+    second = api_client.get("/bank_requests/", params={"limit": 2, "after": 2})
+    assert [r["id"] for r in second.json()] == [3, 4]
+
+    last = api_client.get("/bank_requests/", params={"limit": 2, "after": 4})
+    assert [r["id"] for r in last.json()] == [5]
+    assert NEXT_CURSOR_HEADER not in last.headers
+
+
+def test_request_filters(api_client, db_session):
+    employee, _ = seed_requests(db_session, DBSChecks)
+
+    response = api_client.get(
+        "/dbs_checks/", params={"status": "Pending", "employee_id": employee.id}
+    )
+    assert [r["id"] for r in response.json()] == [1, 3]
+    assert all(r["status"] == "Pending" for r in response.json())
+
+    response = api_client.get(
+        "/dbs_checks/",
+        params={"request_date_from": "2025-01-02", "request_date_to": "2025-01-04"},
+    )
+    assert [r["request_date"] for r in response.json()] == [
+        "2025-01-02",
+        "2025-01-03",
+        "2025-01-04",
+    ]
+
+
+def test_home_office_requests_list(api_client, db_session):
+    seed_requests(db_session, HomeOfficeRequests, count=3)
+
+    response = api_client.get("/home_office_requests/", params={"status": "Approved"})
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_employees_keyset_pages(api_client, db_session):
+    seed_requests(db_session, BankRequests)
+
+    response = api_client.get("/employees/", params={"limit": 1})
+    assert [e["first_name"] for e in response.json()] == ["Ada"]
+    assert response.json()[0]["bank_request_statuses"] == ["Pending", "Pending", "Approved"]
+    assert response.headers[NEXT_CURSOR_HEADER] == "1"
+
+    response = api_client.get("/employees/", params={"limit": 1, "after": 1})
+    assert [e["first_name"] for e in response.json()] == ["Alan"]
+
+
+def test_page_size_is_bounded(api_client):
+    assert api_client.get("/bank_requests/", params={"limit": 0}).status_code == 422
+    assert api_client.get("/bank_requests/", params={"limit": 5000}).status_code == 422
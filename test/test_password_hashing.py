@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from database import get_db
+from auth.hashing import HashingOverloaded, PasswordHasher, password_hasher
+
+
+def test_process_pool_hash_and_verify():
+    hasher = PasswordHasher(workers=1, max_queue=4, kind="process")
+    try:
+        hashed = hasher.hash("s3cret!pw")
+        assert hasher.verify("s3cret!pw", hashed)
+        assert not hasher.verify("wrong!pw1", hashed)
+    finally:
+        hasher.shutdown()
+
+    stats = hasher.stats()
+    assert stats["completed"] == 3
+    assert stats["in_flight"] == 0
+    assert stats["avg_hash_ms"] > 0
+
+
+def test_full_queue_is_rejected():
+    hasher = PasswordHasher(workers=1, max_queue=1, kind="thread")
+    release = threading.Event()
+    executor = hasher._get_executor()
+    executor.submit(release.wait)  # occupy the only worker
+    try:
+        first = hasher._submit("hash", "s3cret!pw")
+        second = hasher._submit("hash", "s3cret!pw")
+        with pytest.raises(HashingOverloaded):
+            hasher._submit("hash", "s3cret!pw")
+    finally:
+        release.set()
+    first.result()
+    second.result()
+    assert hasher.stats()["rejected"] == 1
+    assert hasher.stats()["max_wait_ms"] > 0
+    hasher.shutdown()
+
+
+def test_registration_answers_503_when_hashing_is_overloaded(db_session, monkeypatch):
+    def overloaded(password):
+        raise HashingOverloaded()
+
+    monkeypatch.setattr(password_hasher, "hash", overloaded)
+    app.dependency_overrides[get_db] = lambda: db_session
+    try:
+        response = TestClient(app).post(
+            "/users/register",
+            json={
+                "username": "erin",
+                "email": "erin@rcl.ac.uk",
+                "password": "Str0ng-pass!",
+                "role_id": 1,
+                "first_name": "Erin",
+                "last_name": "Reyes",
+            },
+        )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,79 @@
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+
+import metrics
+from main import app
+from database import get_db
+from metrics import QueryBudgetExceeded, route_metrics
+from model import BankRequests, Employee, Role, User
+from routers import bank_request
+
+
+@pytest.fixture
+def tight_budget(monkeypatch):
+    # The detail route needs a version lookup and the row itself
+    monkeypatch.setattr(bank_request.read_bank_request, "query_budget", 1)
+    route_metrics.reset()
+    yield
+    route_metrics.reset()
+
+
+def test_over_budget_raises_with_the_statements(api_client, db_session, tight_budget):
+    db_session.add(BankRequests(employee_id=1, status="Pending"))
+    db_session.commit()
+
+    with pytest.raises(QueryBudgetExceeded) as excinfo:
+        api_client.get("/bank_requests/1")
+
+    message = str(excinfo.value)
+    assert message.startswith("GET /bank_requests/{request_id} ran 2 SQL statements; its budget is 1")
+    assert "FROM table_versions" in message and "FROM bank_requests" in message
+
+
+def test_over_budget_logs_in_log_mode(api_client, db_session, tight_budget, monkeypatch, caplog):
+    monkeypatch.setattr(metrics, "QUERY_BUDGET_MODE", "log")
+    db_session.add(BankRequests(employee_id=1, status="Pending"))
+    db_session.commit()
+
+    with caplog.at_level(logging.WARNING, logger="metrics"):
+        assert api_client.get("/bank_requests/1").status_code == 200
+
+    assert "ran 2 SQL statements; its budget is 1" in caplog.text
+    assert (
+        'http_requests_over_query_budget_total{method="GET",route="/bank_requests/{request_id}"} 1'
+        in route_metrics.render()
+    )
+
+
+def test_budget_check_can_be_switched_off(api_client, db_session, tight_budget, monkeypatch):
+    monkeypatch.setattr(metrics, "QUERY_BUDGET_MODE", "off")
+    db_session.add(BankRequests(employee_id=1, status="Pending"))
+    db_session.commit()
+    assert api_client.get("/bank_requests/1").status_code == 200
+
+
+def test_register_creates_user_and_employee_within_budget(db_session):
+    db_session.add(Role(role_name="employee", is_hr=False, is_admin=False, is_employee=True))
+    db_session.commit()
+    app.dependency_overrides[get_db] = lambda: db_session
+    try:
+        response = TestClient(app).post(
+            "/users/register",
+            json={
+                "username": "dana",
+                "email": "dana@rcl.ac.uk",
+                "password": "Str0ng-pass!",
+                "role_id": 1,
+                "first_name": "Dana",
+                "last_name": "Scully",
+            },
+        )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert response.json()["role"]["role_name"] == "employee"
+    user = db_session.query(User).filter(User.username == "dana").one()
+    assert db_session.query(Employee).filter(Employee.user_id == user.id).count() == 1
@@ -0,0 +1,123 @@
+"""Query-plan regression suite: hot queries must keep using index access.
+
+The database is seeded at a realistic volume and ANALYZEd, then each hot
+query is run through EXPLAIN QUERY PLAN. A plain "SCAN <table>" step (a full
+table scan) fails the test, so a model change that drops an index shows up here.
+"""
+import random
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import insert, select, text
+
+from functions_crud import _request_statuses_query, request_queue_query
+from model import BankRequests, DBSChecks, Employee, HomeOfficeRequests, Role, User
+from pagination import RequestFilters
+
+EMPLOYEES = 5000
+REQUESTS_PER_TYPE = 3
+STATUSES = ["Pending", "Approved", "Rejected", "Submitted", "Cleared"]
+REQUEST_MODELS = [BankRequests, DBSChecks, HomeOfficeRequests]
+
+
+@pytest.fixture(scope="module")
+def seeded(tmp_path_factory):
+    from sqlalchemy import create_engine
+
+    from database import create_schema
+
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}")
+    create_schema(engine)
+    rng = random.Random(7)
+    with engine.begin() as conn:
+        conn.execute(insert(Role), [{"id": 1, "role_name": "employee", "is_employee": True}])
+        conn.execute(
+            insert(User),
+            [
+                {"id": i, "username": f"user{i}", "email": f"user{i}@rcl.ac.uk", "password_hash": "x", "role_id": 1}
+                for i in range(1, EMPLOYEES + 1)
+            ],
+        )
+        conn.execute(
+            insert(Employee),
+            [
+                {"id": i, "user_id": i, "first_name": f"First{i}", "last_name": f"Last{i}",
+                 "email": f"user{i}@rcl.ac.uk", "department": f"Dept{i % 40}"}
+                for i in range(1, EMPLOYEES + 1)
+            ],
+        )
+        for model in REQUEST_MODELS:
+            conn.execute(
+                insert(model),
+                [
+                    {"employee_id": i, "status": rng.choice(STATUSES),
+                     "request_date": date(2024, 1, 1) + timedelta(days=rng.randrange(600))}
+                    for i in range(1, EMPLOYEES + 1)
+                    for _ in range(REQUESTS_PER_TYPE)
+                ],
+            )
+        conn.execute(text("ANALYZE"))
+    yield engine
+    engine.dispose()
+
+
+def plan(engine, stmt):
+    sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        return [row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+
+
+def assert_no_table_scan(steps, *tables):
+    scans = [
+        step for step in steps
+        if step.startswith("SCAN ") and step.split()[1] in tables and "USING" not in step
+    ]
+    assert not scans, f"full table scan in plan: {steps}"
+    assert any("USING" in step for step in steps), f"no index access in plan: {steps}"
+
+
+def test_employee_children_statuses_use_index(seeded):
+    steps = plan(seeded, _request_statuses_query(list(range(100, 150))))
+    for model in REQUEST_MODELS:
+        assert any(f"{model.__tablename__}_employee_id_status" in step for step in steps), steps
+    assert_no_table_scan(steps, *(m.__tablename__ for m in REQUEST_MODELS))
+
+
+@pytest.mark.parametrize("model", REQUEST_MODELS, ids=lambda m: m.__tablename__)
+def test_status_filter_page_uses_index(seeded, model):
+    filters = RequestFilters(status="Pending", employee_id=None, request_date_from=None, request_date_to=None)
+    stmt = select(model).where(*filters.clauses(model), model.id > 1000).order_by(model.id).limit(101)
+    steps = plan(seeded, stmt)
+    assert any(f"{model.__tablename__}_status_id" in step for step in steps), steps
+    assert_no_table_scan(steps, model.__tablename__)
+
+
+@pytest.mark.parametrize("model", REQUEST_MODELS, ids=lambda m: m.__tablename__)
+def test_request_date_range_uses_index(seeded, model):
+    filters = RequestFilters(
+        status=None, employee_id=None,
+        request_date_from=date(2024, 3, 1), request_date_to=date(2024, 3, 7),
+    )
+    steps = plan(seeded, select(model).where(*filters.clauses(model)))
+    assert_no_table_scan(steps, model.__tablename__)
+
+
+def test_username_lookup_uses_index(seeded):
+    steps = plan(seeded, select(User.id, User.role_id).where(User.username == "user4321"))
+    assert_no_table_scan(steps, "users")
+
+
+def test_employee_lookups_use_index(seeded):
+    assert_no_table_scan(plan(seeded, select(Employee).where(Employee.user_id == 17)), "employees")
+    assert_no_table_scan(
+        plan(seeded, select(Employee.id).where(Employee.department == "Dept3")), "employees"
+    )
+
+
+def test_request_queue_reads_every_branch_by_index(seeded):
+    filters = RequestFilters(status="Pending", employee_id=None, request_date_from=None, request_date_to=None)
+    stmt = request_queue_query(filters, 101, after=(date(2025, 1, 1), "dbs_check", 40))
+    steps = plan(seeded, stmt)
+    for model in REQUEST_MODELS:
+        assert any(f"{model.__tablename__}_status_request_date_id" in step for step in steps), steps
+    assert_no_table_scan(steps, *(m.__tablename__ for m in REQUEST_MODELS))
@@ -0,0 +1,61 @@
+from datetime import date
+
+from model import BankRequests, DBSChecks, HomeOfficeRequests
+
+
+def seed(db):
+    db.add_all(
+        [
+            BankRequests(employee_id=1, status="Pending", request_date=date(2025, 5, 3)),
+            BankRequests(employee_id=1, status="Approved", request_date=date(2025, 5, 1)),
+            DBSChecks(employee_id=2, status="Pending", request_date=date(2025, 5, 1)),
+            DBSChecks(employee_id=2, status="Pending", request_date=None),
+            HomeOfficeRequests(employee_id=3, status="Pending", request_date=date(2025, 5, 2)),
+            HomeOfficeRequests(employee_id=3, status="Pending", request_date=date(2025, 5, 1)),
+        ]
+    )
+    db.commit()
+
+
+def keys(items):
+    return [(item["request_type"], item["id"]) for item in items]
+
+
+def test_queue_merges_types_oldest_first(api_client, db_session):
+    seed(db_session)
+
+    response = api_client.get("/requests/queue", params={"status": "Pending"})
+
+    assert response.status_code == 200
+    assert keys(response.json()) == [
+        ("dbs_check", 1),
+        ("home_office_request", 2),
+        ("home_office_request", 1),
+        ("bank_request", 1),
+        ("dbs_check", 2),
+    ]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_queue_cursor_walks_every_row_once(api_client, db_session):
+    seed(db_session)
+
+    seen, params = [], {"limit": 2}
+    while True:
+        response = api_client.get("/requests/queue", params=params)
+        seen += keys(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        params = {"limit": 2, "after": cursor}
+
+    assert len(seen) == 6 and len(set(seen)) == 6
+    assert seen[-1] == ("dbs_check", 2)
+
+
+def test_queue_type_filter_and_bad_cursor(api_client, db_session):
+    seed(db_session)
+
+    response = api_client.get("/requests/queue", params={"request_type": "bank_request"})
+    assert keys(response.json()) == [("bank_request", 2), ("bank_request", 1)]
+    assert api_client.get("/requests/queue", params={"after": "not-a-cursor"}).status_code == 400
@@ -0,0 +1,73 @@
+from sqlalchemy import event
+
+from model import BankRequests, Employee
+from response_cache import MemoryBackend, response_cache
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self.record)
+
+    def record(self, *args):
+        self.count += 1
+
+    def stop(self):
+        event.remove(self.engine, "before_cursor_execute", self.record)
+        return self.count
+
+
+def test_repeat_get_is_served_from_cache(api_client, db_session, db_engine):
+    db_session.add(Employee(user_id=1, first_name="A", last_name="B", email="a@rcl.ac.uk"))
+    db_session.commit()
+    first = api_client.get("/employees/1")
+
+    counter = QueryCounter(db_engine)
+    second = api_client.get("/employees/1")
+
+    assert counter.stop() == 0
+    assert second.json() == first.json()
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert api_client.get("/employees/1", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+
+def test_writes_invalidate_precisely(api_client, db_session):
+    db_session.add_all(
+        [
+            Employee(user_id=1, first_name="A", last_name="B", email="a@rcl.ac.uk"),
+            Employee(user_id=2, first_name="C", last_name="D", email="c@rcl.ac.uk"),
+            BankRequests(employee_id=1, status="Pending"),
+        ]
+    )
+    db_session.commit()
+    for path in ["/employees/1", "/employees/2", "/bank_requests/", "/bank_requests/1"]:
+        api_client.get(path)
+
+    api_client.post("/bank_requests/bulk_status", json={"status": "Approved", "ids": [1]})
+
+    assert api_client.get("/employees/1").json()["bank_request_statuses"] == ["Approved"]
+    assert api_client.get("/bank_requests/").json()[0]["status"] == "Approved"
+    assert api_client.get("/bank_requests/1").json()["status"] == "Approved"
+    # Employee 2 was untouched and still answers from the cache
+    before = response_cache.stats()["hits"]
+    api_client.get("/employees/2")
+    assert response_cache.stats()["hits"] == before + 1
+
+
+def test_memory_backend_lru_ttl_and_stale_store():
+    backend = MemoryBackend(ttl_seconds=60, max_size=2)
+    for key in "abc":
+        backend.set(key, key, [f"tag-{key}"], backend.generation())
+    assert backend.get("a") is None and backend.get("c") == "c"
+    assert backend.stats()["evictions"] == 1
+
+    generation = backend.generation()
+    backend.invalidate_tags(["tag-b"])
+    backend.set("d", "d", ["tag-d"], generation)
+    assert backend.get("b") is None and backend.get("d") is None
+    assert backend.stats()["skipped_stores"] == 1
+
+    expired = MemoryBackend(ttl_seconds=-1)
+    expired.set("a", "a", [], expired.generation())
+    assert expired.get("a") is None
@@ -0,0 +1,39 @@
+import json
+from datetime import date
+from typing import List
+
+from pydantic import TypeAdapter
+
+from model import BankRequests, Employee
+from schemas import EmployeeOut
+from serialization import ListSerializer
+
+
+def test_fast_path_matches_response_model_output():
+    employee = Employee(
+        id=7, user_id=1, first_name="Ada", last_name="Lovelace", email="ada@rcl.ac.uk",
+        date_of_birth=date(1990, 12, 10),
+    )
+    statuses = {"bank_request_statuses": ["Pending"], "dbs_check_statuses": [], "home_office_request_statuses": []}
+
+    slow = TypeAdapter(List[EmployeeOut]).dump_json([EmployeeOut.from_orm_with_status(employee, statuses)])
+    row = {**{name: getattr(employee, name, None) for name in EmployeeOut.model_fields}, **statuses}
+
+    assert ListSerializer(EmployeeOut).dump([row]) == slow
+
+
+def test_list_endpoint_keeps_headers_and_body(api_client, db_session):
+    db_session.add_all(
+        [BankRequests(employee_id=1, status="Pending", request_date=date(2025, 5, i)) for i in range(1, 4)]
+    )
+    db_session.commit()
+
+    response = api_client.get("/bank_requests/", params={"limit": 2})
+
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["X-Next-Cursor"] == "2"
+    assert "ETag" in response.headers
+    assert json.loads(response.content) == [
+        {"employee_id": 1, "request_date": "2025-05-01", "status": "Pending", "details": None, "id": 1},
+        {"employee_id": 1, "request_date": "2025-05-02", "status": "Pending", "details": None, "id": 2},
+    ]
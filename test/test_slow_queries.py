@@ -0,0 +1,57 @@
+import logging
+
+import pytest
+from sqlalchemy import text
+
+from model import Employee
+from slow_queries import parameter_shape, slow_query_log
+
+
+@pytest.fixture
+def log_everything(monkeypatch):
+    monkeypatch.setattr(slow_query_log, "threshold_ms", 0)
+    slow_query_log.clear()
+    yield
+    slow_query_log.clear()
+
+
+def test_slow_statement_is_logged_with_shape_and_plan(db_session, log_everything, caplog):
+    with caplog.at_level(logging.WARNING, logger="slow_queries"):
+        db_session.query(Employee).filter(Employee.email == "secret@rcl.ac.uk").all()
+
+    entry = slow_query_log.entries()[-1]
+    assert "FROM employees" in entry["statement"]
+    # Types only: bound values never reach the log
+    assert "secret@rcl.ac.uk" not in str(entry) and "secret@rcl.ac.uk" not in caplog.text
+    assert "str" in entry["parameters"]
+    assert any("employees" in line for line in entry["plan"])
+    assert "Slow query" in caplog.text
+
+
+def test_plans_are_captured_once_per_statement(db_session, log_everything, monkeypatch):
+    calls = []
+    monkeypatch.setattr("slow_queries.explain", lambda *args: calls.append(args) or ["plan"])
+    for employee_id in (1, 2, 3):
+        db_session.execute(text("SELECT * FROM employees WHERE id = :id"), {"id": employee_id})
+
+    assert len(calls) == 1
+    assert [entry["plan"] for entry in slow_query_log.entries()[-3:]] == [["plan"]] * 3
+
+
+def test_fast_statements_are_not_logged(db_session):
+    slow_query_log.clear()
+    db_session.execute(text("SELECT 1"))
+    assert slow_query_log.entries() == []
+
+
+def test_parameter_shape():
+    assert parameter_shape({"id_1": 5, "name": "x"}) == {"id_1": "int", "name": "str"}
+    assert parameter_shape(("x", None)) == ["str", "NoneType"]
+    assert parameter_shape([(1,), (2,)], executemany=True) == {"rows": 2, "row": ["int"]}
+    assert parameter_shape({f"id_{i}": i for i in range(50)}) == {"count": 50, "types": {"int": 50}}
+
+
+def test_slow_queries_endpoint(admin_client):
+    response = admin_client.get("/monitoring/slow_queries")
+    assert response.status_code == 200
+    assert {"threshold_ms", "slow_statements", "recent"} <= response.json().keys()
@@ -0,0 +1,95 @@
+from datetime import date
+
+from sqlalchemy import event
+
+from model import BankRequests, DBSChecks, Employee
+from response_cache import response_cache
+
+
+def seed(db_session):
+    db_session.add(
+        Employee(
+            user_id=1, first_name="Ada", last_name="Lovelace", email="ada@rcl.ac.uk",
+            department="Computing", date_of_birth=date(1990, 12, 10),
+        )
+    )
+    db_session.add_all([
+        BankRequests(employee_id=1, status="Pending", request_date=date(2025, 5, 1), details="new account"),
+        DBSChecks(employee_id=1, status="Cleared"),
+    ])
+    db_session.commit()
+
+
+def recorded(db_engine, call):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db_engine, "before_cursor_execute", record)
+    try:
+        response = call()
+    finally:
+        event.remove(db_engine, "before_cursor_execute", record)
+    return response, statements
+
+
+def test_default_response_is_unchanged(api_client, db_session):
+    seed(db_session)
+    [employee] = api_client.get("/employees/").json()
+    assert employee == {
+        "first_name": "Ada",
+        "last_name": "Lovelace",
+        "email": "ada@rcl.ac.uk",
+        "phone_number": None,
+        "department": "Computing",
+        "position": None,
+        "date_of_birth": "1990-12-10",
+        "national_insurance_number": None,
+        "id": 1,
+        "bank_request_statuses": ["Pending"],
+        "dbs_check_statuses": ["Cleared"],
+        "home_office_request_statuses": [],
+    }
+    assert api_client.get("/employees/1").json() == employee
+
+
+def test_narrow_projection_queries_only_what_it_returns(api_client, db_session, db_engine, monkeypatch):
+    monkeypatch.setattr(response_cache, "enabled", False)
+    seed(db_session)
+
+    params = {"fields": "first_name,last_name", "include": ""}
+    response, statements = recorded(db_engine, lambda: api_client.get("/employees/", params=params))
+    assert response.json() == [{"first_name": "Ada", "last_name": "Lovelace", "id": 1}]
+    employee_query = next(s for s in statements if "FROM employees" in s)
+    assert "email" not in employee_query and "date_of_birth" not in employee_query
+    # Nothing asked of the request tables
+    assert not any("bank_requests" in s for s in statements)
+
+
+def test_include_picks_status_lists(api_client, db_session):
+    seed(db_session)
+    params = {"fields": "last_name", "include": "dbs_check_statuses"}
+    response = api_client.get("/employees/1", params=params)
+    assert response.json() == {"id": 1, "last_name": "Lovelace", "dbs_check_statuses": ["Cleared"]}
+    assert "ETag" in response.headers
+
+    search = api_client.get("/employees/search", params={"q": "ada", "fields": "email", "include": ""})
+    assert search.json() == [{"email": "ada@rcl.ac.uk", "id": 1}]
+
+
+def test_request_fields(api_client, db_session):
+    seed(db_session)
+    assert api_client.get("/bank_requests/", params={"fields": "status, request_date"}).json() == [
+        {"request_date": "2025-05-01", "status": "Pending", "id": 1}
+    ]
+    check = api_client.get("/dbs_checks/1", params={"fields": "status"})
+    assert check.json() == {"status": "Cleared", "id": 1}
+    assert api_client.get("/home_office_requests/1", params={"fields": "status"}).status_code == 404
+
+
+def test_unknown_names_are_rejected(api_client):
+    response = api_client.get("/employees/", params={"fields": "first_name,password_hash"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown field: password_hash"
+    assert api_client.get("/employees/", params={"include": "bank_requests"}).status_code == 400
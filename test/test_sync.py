@@ -0,0 +1,148 @@
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from main import app
+from database import get_db
+from auth.dependencies import get_current_user
+from auth.identity_cache import Principal
+from changelog import current_revision, latest_revision_query
+from model import BankRequests, DBSChecks, Employee
+
+
+def seed(db_session):
+    db_session.add(Employee(user_id=1, first_name="Ada", last_name="Lovelace", email="ada@rcl.ac.uk"))
+    db_session.commit()
+
+
+def sync(api_client, **params):
+    response = api_client.get("/sync/changes", params=params)
+    assert response.status_code == 200
+    return response
+
+
+def summary(response):
+    return [(c["revision"], c["type"], c["id"], c["deleted"]) for c in response.json()]
+
+
+def test_changes_since_a_revision_with_tombstones(api_client, db_session):
+    seed(db_session)
+    assert api_client.post("/bank_requests/", json={"employee_id": 1, "status": "Pending"}).status_code == 200
+    assert api_client.post("/bank_requests/", json={"employee_id": 1, "status": "Pending"}).status_code == 200
+
+    first = sync(api_client)
+    assert summary(first) == [
+        (1, "employee", 1, False),
+        (2, "bank_request", 1, False),
+        (3, "bank_request", 2, False),
+    ]
+    assert first.json()[1]["data"] == {
+        "id": 1, "employee_id": 1, "request_date": None, "status": "Pending", "details": None
+    }
+    assert first.json()[0]["data"]["last_name"] == "Lovelace"
+
+    assert api_client.put("/bank_requests/1", json={"status": "Approved"}).status_code == 200
+    db_session.delete(db_session.get(BankRequests, 2))
+    db_session.commit()
+
+    later = sync(api_client, since=3)
+    assert summary(later) == [(4, "bank_request", 1, False), (5, "bank_request", 2, True)]
+    assert later.json()[0]["data"]["status"] == "Approved"
+    assert later.json()[1]["data"] is None
+    assert sync(api_client, since=5).json() == []
+
+
+def test_each_row_appears_once_at_its_latest_revision(api_client, db_session):
+    seed(db_session)
+    db_session.add_all([DBSChecks(employee_id=1, status="Requested") for _ in range(3)])
+    db_session.commit()
+    # One transaction, one revision for all three rows
+    response = api_client.post("/dbs_checks/bulk_status", json={"status": "Cleared", "ids": [1, 2, 3]})
+    assert response.status_code == 200
+
+    assert summary(sync(api_client)) == [
+        (1, "employee", 1, False),
+        (3, "dbs_check", 1, False),
+        (3, "dbs_check", 2, False),
+        (3, "dbs_check", 3, False),
+    ]
+
+
+def test_pages_split_a_revision(api_client, db_session):
+    seed(db_session)
+    db_session.add_all([DBSChecks(employee_id=1, status="Requested") for _ in range(3)])
+    db_session.commit()
+
+    first = sync(api_client, since=1, limit=2)
+    assert [c["id"] for c in first.json()] == [1, 2]
+    second = sync(api_client, since=1, limit=2, after=first.headers["X-Next-Cursor"])
+    assert [c["id"] for c in second.json()] == [3]
+    assert "X-Next-Cursor" not in second.headers
+    assert api_client.get("/sync/changes", params={"after": "bm9wZQ"}).status_code == 400
+
+
+def test_bulk_import_and_rollbacks(api_client, db_session):
+    seed(db_session)
+    content = "employee_id,status\n1,Pending\n1,Pending\n"
+    response = api_client.post("/dbs_checks/import", files={"file": ("checks.csv", content, "text/csv")})
+    assert response.json()["inserted"] == 2
+    db_session.add(DBSChecks(employee_id=1, status="Requested"))
+    db_session.flush()
+    db_session.rollback()
+
+    assert summary(sync(api_client, since=1)) == [
+        (2, "dbs_check", 1, False),
+        (2, "dbs_check", 2, False),
+    ]
+
+
+def test_unchanged_revision_returns_304(api_client, db_session):
+    seed(db_session)
+    etag = sync(api_client).headers["ETag"]
+    assert api_client.get("/sync/changes", headers={"If-None-Match": etag}).status_code == 304
+
+    db_session.add(DBSChecks(employee_id=1, status="Requested"))
+    db_session.commit()
+    assert api_client.get("/sync/changes", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_sync_requires_hr(db_session):
+    employee = Principal(id=5, username="emp", role_id=None, is_employee=True)
+    app.dependency_overrides[get_db] = lambda: db_session
+    app.dependency_overrides[get_current_user] = lambda: employee
+    try:
+        assert TestClient(app).get("/sync/changes").status_code == 403
+    finally:
+        app.dependency_overrides.clear()
+
+
+class PostgresConnection:
+    dialect = postgresql.dialect()
+
+    def __init__(self):
+        self.statements = []
+
+    def scalar(self, stmt):
+        self.statements.append(str(stmt.compile(dialect=self.dialect)))
+        return 1234
+
+    def connection(self):
+        return self
+
+    def get_bind(self):
+        return self
+
+
+def test_postgresql_revisions_are_transaction_ids_below_the_snapshot_horizon():
+    conn = PostgresConnection()
+    session = SimpleNamespace(info={}, connection=conn.connection)
+    assert current_revision(session) == 1234
+    assert current_revision(session) == 1234
+    # No counter row to lock: the server assigns the id
+    assert len(conn.statements) == 1
+    assert "pg_current_xact_id()" in conn.statements[0]
+    assert "table_versions" not in conn.statements[0]
+
+    sql = str(latest_revision_query(conn).compile(dialect=conn.dialect))
+    assert "change_log.revision < CAST(CAST(pg_snapshot_xmin(pg_current_snapshot()) AS TEXT) AS BIGINT)" in sql
@@ -0,0 +1,102 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+from sqlalchemy import event, update
+
+from main import app
+from database import get_db
+from auth.auth import SECRET_KEY, ALGORITHM, get_password_hash
+from auth.identity_cache import identity_cache, token_revocations
+from model import Role, TokenRevocation, User
+
+
+@pytest.fixture
+def login_client(db_session):
+    hr = Role(role_name="hr", is_hr=True, is_admin=False, is_employee=True)
+    employee = Role(role_name="employee", is_hr=False, is_admin=False, is_employee=True)
+    db_session.add_all([hr, employee])
+    db_session.add(
+        User(username="dave", email="dave@rcl.ac.uk", password_hash=get_password_hash("s3cret!pw"), role=hr)
+    )
+    db_session.commit()
+    app.dependency_overrides[get_db] = lambda: db_session
+    client = TestClient(app)
+    response = client.post("/users/login", data={"username": "dave", "password": "s3cret!pw"})
+    assert response.status_code == 200
+    client.headers["Authorization"] = "Bearer " + response.json()["access_token"]
+    yield client
+    app.dependency_overrides.clear()
+
+
+def bearer_claims(client):
+    token = client.headers["Authorization"].split()[1]
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
+def test_login_signs_role_claims(login_client):
+    claims = bearer_claims(login_client)
+    assert claims["sub"] == "dave"
+    assert claims["scopes"] == ["hr"]
+    assert claims["is_hr"] is True
+    assert claims["is_admin"] is False
+    assert "uid" in claims and "iat" in claims
+
+
+def test_claims_authorise_without_auth_queries(login_client, db_engine):
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db_engine, "before_cursor_execute", record)
+    try:
+        response = login_client.post("/bank_requests/", json={"employee_id": 1})
+    finally:
+        event.remove(db_engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    assert not any("FROM users" in s or "FROM roles" in s for s in statements)
+
+
+def test_demotion_makes_claims_stale(login_client, db_session):
+    assert login_client.post("/bank_requests/", json={"employee_id": 1}).status_code == 200
+
+    user = db_session.query(User).filter(User.username == "dave").one()
+    user.role = db_session.query(Role).filter(Role.role_name == "employee").one()
+    db_session.commit()
+
+    response = login_client.post("/bank_requests/", json={"employee_id": 1})
+    assert response.status_code == 403
+
+
+def test_demotion_through_another_worker_is_seen_after_a_refresh(login_client, db_session):
+    assert login_client.post("/bank_requests/", json={"employee_id": 1}).status_code == 200
+
+    user = db_session.query(User).filter(User.username == "dave").one()
+    user.role = db_session.query(Role).filter(Role.role_name == "employee").one()
+    db_session.commit()
+    # This worker's in-memory marks never heard of the commit; the stored ones did
+    token_revocations.clear()
+    assert db_session.query(TokenRevocation).filter_by(kind="user", subject_id=user.id).count() == 1
+
+    response = login_client.post("/bank_requests/", json={"employee_id": 1})
+    assert response.status_code == 403
+    assert token_revocations.stats()["loads"] == 1
+
+
+def test_refresh_drops_cached_callers_changed_through_another_worker(login_client, db_session, monkeypatch):
+    user = db_session.query(User).filter(User.username == "dave").one()
+    employee_role = db_session.query(Role).filter(Role.role_name == "employee").one()
+    # An earlier mark makes this token's claims stale: the caller is loaded and cached
+    token_revocations.write(db_session.connection(), [user.id], revoked_at=time.time())
+    db_session.commit()
+    token_revocations.clear()
+    assert login_client.get("/employees/search", params={"q": "dave"}).status_code == 200
+    assert identity_cache.get("dave").is_hr
+
+    # Another worker demotes dave: only the database hears of it
+    db_session.execute(update(User).where(User.id == user.id).values(role_id=employee_role.id))
+    token_revocations.write(db_session.connection(), [user.id], revoked_at=time.time() + 1)
+    db_session.commit()
+    monkeypatch.setattr(token_revocations, "refresh_seconds", 0)
+
+    assert login_client.get("/employees/search", params={"q": "dave"}).status_code == 403
@@ -0,0 +1,116 @@
+"""Per-table version counters (model.TableVersion) and conditional GETs.
+
+Every transaction that writes to a table bumps its counter as it commits, so a
+response's ETag can be built from a primary-key lookup of the counters it
+depends on instead of from the serialised body. A matching If-None-Match is
+answered with 304 before the route runs its own queries.
+
+The tables a transaction writes are only noted while it runs; all of its
+counters are bumped in one statement, in table order, from before_commit. The
+counter rows are therefore locked for the commit alone rather than from the
+first write on, and two transactions always lock them in the same order.
+"""
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import dialect_insert, get_async_db, get_db
+from model import TableVersion
+
+
+def bump_versions(conn, tables):
+    """Increment the counters of `tables` inside the caller's transaction, now."""
+    rows = [{"table_name": table, "version": 1} for table in sorted(set(tables))]
+    if not rows:
+        return
+    stmt = dialect_insert(conn, TableVersion)
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["table_name"],
+            set_={"version": TableVersion.version + 1},
+        ),
+        rows,
+    )
+
+
+def bump_on_commit(session: Session, tables):
+    """Have the counters of `tables` bumped when the session commits (Core writes)."""
+    session.info.setdefault("written_tables", set()).update(tables)
+
+
+def versions_query(tables):
+    return select(TableVersion.table_name, TableVersion.version).where(
+        TableVersion.table_name.in_(tables)
+    )
+
+
+def make_etag(tables, versions) -> str:
+    return 'W/"' + ".".join(str(versions.get(table, 0)) for table in tables) + '"'
+
+
+def etag_matches(if_none_match, etag) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" are the same tag
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+class ConditionalGet:
+    """Dependency that sets the ETag for `tables` and raises 304 when it matches.
+
+    List it after the auth dependency so only authorised callers get a 304.
+    The counters are read before the route's queries, so a concurrent commit
+    can only make the ETag older than the body, never newer.
+    """
+
+    def __init__(self, *tables):
+        self.tables = tables
+
+    def check(self, request: Request, response: Response, versions):
+        etag = make_etag(self.tables, versions)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+    def __call__(self, request: Request, response: Response, db: Session = Depends(get_db)):
+        self.check(request, response, dict(db.execute(versions_query(self.tables)).all()))
+
+
+class ConditionalGetAsync(ConditionalGet):
+    async def __call__(
+        self, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)
+    ):
+        result = await db.execute(versions_query(self.tables))
+        self.check(request, response, dict(result.all()))
+
+
+# ORM writes: note each flushed table, bumped with the others at commit
+@event.listens_for(Session, "after_flush")
+def _note_flushed_tables(session, flush_context):
+    tables = {
+        inspect(obj).mapper.local_table.name
+        for obj in list(session.new) + list(session.deleted) + list(session.dirty)
+        if not isinstance(obj, TableVersion)
+        and (obj in session.new or obj in session.deleted or session.is_modified(obj))
+    }
+    if tables:
+        bump_on_commit(session, tables)
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_written_tables(session):
+    # commit() only flushes after this event: flush now so that flush's tables count
+    session.flush()
+    tables = session.info.pop("written_tables", None)
+    if tables:
+        bump_versions(session.connection(), tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_written_tables(session):
+    session.info.pop("written_tables", None)